@@ -4,6 +4,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session, create_engine, SQLModel
 from contextlib import asynccontextmanager
 import dependencies
+from serialization import FastJSONResponse
+from caching import GenerationETagMiddleware
 
 # --- Database Setup ---
 DATABASE_URL = "sqlite:///c3d_database.db"
@@ -34,15 +36,37 @@ def load_analyses():
 # --- FastAPI Lifespan ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables on startup
+    # Create tables on startup and add columns/indexes missing from older databases
     SQLModel.metadata.create_all(engine)
+    from models.base import upgrade_schema
+    upgrade_schema(engine)
+    
+    # Backfill derived index tables for databases created before they existed
+    from models.closure import ensure_closure
+    from models.label import backfill_labels, canonicalize_labels
+    from models.generation import ensure_generation
+    from models.label_index import label_index
+    from models.suggestion import load_subject_index
+    with Session(engine) as session:
+        ensure_generation(session)
+        ensure_closure(session)
+        backfill_labels(session)
+        canonicalize_labels(session)
+        label_index.load(session)
+        load_subject_index(session)
+
+    # Decode C3D files and run analyses in warm worker processes
+    from workers import start_workers, stop_workers
+    start_workers()
     yield
+    stop_workers()
 
 # --- FastAPI App ---
 app = FastAPI(
     title="C3D Database API",
     description="API for managing and searching C3D motion capture files",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse  # orjson when installed
 )
 
 # CORS middleware
@@ -54,14 +78,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Answer conditional GETs with 304 from the database write generation
+app.add_middleware(GenerationETagMiddleware, prefix="/api")
+
 # Include routers
-from routers import directory_scan, files, search, classifications, subjects, sessions, analyses, groups, files_list, plotting, trials
+from routers import directory_scan, files, search, classifications, subjects, sessions, analyses, groups, files_list, plotting, trials, labels, parameters, export, facets, suggest, data, downloads, cycles
 
 # Important: Include files_list router before files router to ensure it gets matched first
 app.include_router(directory_scan.router, prefix="/api")
+app.include_router(data.router, prefix="/api")  # Before files router, whose /files/{filepath:path} would match
+app.include_router(downloads.router, prefix="/api")  # Likewise
 app.include_router(files_list.router, prefix="/api")  # Add this before files router
 app.include_router(files.router, prefix="/api")
 app.include_router(search.router, prefix="/api")
+app.include_router(facets.router, prefix="/api")
 app.include_router(classifications.router, prefix="/api")
 app.include_router(subjects.router, prefix="/api")
 app.include_router(sessions.router, prefix="/api")
@@ -69,6 +99,11 @@ app.include_router(trials.router, prefix="/api")  # Add the trials router
 app.include_router(analyses.router, prefix="/api")
 app.include_router(groups.router, prefix="/api")
 app.include_router(plotting.router, prefix="/api")
+app.include_router(labels.router, prefix="/api")
+app.include_router(parameters.router, prefix="/api")
+app.include_router(export.router, prefix="/api")
+app.include_router(suggest.router, prefix="/api")
+app.include_router(cycles.router, prefix="/api")
 
 # Mount static files for the frontend
 app.mount("/", StaticFiles(directory="static", html=True), name="static")
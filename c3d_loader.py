@@ -0,0 +1,266 @@
+"""
+Decoded C3D trial data with an in-memory LRU cache.
+
+ezc3d decodes a whole file at once, so the decoded marker and analog arrays
+are kept in memory (bounded by total bytes) and requests for a subset of
+markers, channels or frames are served as slices of the cached arrays.
+Entries are keyed by file path and validated against the file's size and
+modification time, so a file rewritten on disk is decoded again.
+
+Concurrent misses for the same file are coalesced: the first request decodes
+while the others wait for its result (`SingleFlight`), and the number of
+decodes running at once is bounded by a semaphore, so a burst of requests
+for one trial costs one decode.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+import ezc3d
+import numpy as np
+from caching import file_fingerprint
+
+@dataclass
+class TrialData:
+    """Decoded marker and analog data of one C3D file."""
+    marker_labels: List[str]
+    points: np.ndarray  # float32, (frames, markers, 3); NaN where a marker is missing
+    point_rate: float
+    channel_labels: List[str]
+    analogs: np.ndarray  # float32, (analog samples, channels)
+    analog_rate: float
+    first_frame: int
+
+    @property
+    def frame_count(self) -> int:
+        return self.points.shape[0]
+
+    @property
+    def samples_per_frame(self) -> int:
+        """Analog samples recorded per point frame."""
+        if not self.point_rate or not self.analogs.shape[0]:
+            return 0
+        return max(1, round(self.analog_rate / self.point_rate))
+
+    @property
+    def nbytes(self) -> int:
+        return self.points.nbytes + self.analogs.nbytes
+
+    def marker_indices(self, names: Sequence[str]) -> List[int]:
+        """Column indices of the named markers; raises KeyError for unknown names."""
+        return _indices(self.marker_labels, names)
+
+    def channel_indices(self, names: Sequence[str]) -> List[int]:
+        """Column indices of the named channels; raises KeyError for unknown names."""
+        return _indices(self.channel_labels, names)
+
+    def frame_range(
+        self,
+        start_frame: Optional[int] = None,
+        end_frame: Optional[int] = None,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None
+    ) -> Tuple[int, int]:
+        """
+        Resolve a frame or time window to a [start, end) range of frame indices.
+
+        Frames are 0-based indices into the trial; times are seconds from the
+        first frame. The range is clipped to the trial.
+        """
+        if start_frame is None and start_time is not None:
+            start_frame = int(np.floor(start_time * self.point_rate))
+        if end_frame is None and end_time is not None:
+            end_frame = int(np.ceil(end_time * self.point_rate))
+        start = min(max(start_frame or 0, 0), self.frame_count)
+        end = self.frame_count if end_frame is None else min(max(end_frame, start), self.frame_count)
+        return start, end
+
+    def slice(
+        self,
+        markers: Optional[Sequence[str]] = None,
+        channels: Optional[Sequence[str]] = None,
+        start: int = 0,
+        end: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Select markers and channels over a frame range.
+
+        Returns:
+            tuple: (points (frames, markers, 3), analogs (samples, channels)),
+                   contiguous float32 copies of only the requested data
+        """
+        end = self.frame_count if end is None else end
+        marker_idx = self.marker_indices(markers) if markers is not None else slice(None)
+        channel_idx = self.channel_indices(channels) if channels is not None else slice(None)
+        points = np.ascontiguousarray(self.points[start:end, marker_idx, :])
+        ratio = self.samples_per_frame
+        analogs = np.ascontiguousarray(self.analogs[start * ratio:end * ratio, channel_idx])
+        return points, analogs
+
+def _indices(labels: List[str], names: Sequence[str]) -> List[int]:
+    positions = {label: index for index, label in enumerate(labels)}
+    missing = [name for name in names if name not in positions]
+    if missing:
+        raise KeyError(", ".join(missing))
+    return [positions[name] for name in names]
+
+def _labels(parameters, group: str) -> List[str]:
+    if group in parameters and "LABELS" in parameters[group]:
+        return [label.strip() for label in parameters[group]["LABELS"]["value"]]
+    return []
+
+def decode_trial(filepath: str) -> TrialData:
+    """Read a C3D file into float32 arrays laid out frame-major."""
+    c3d = ezc3d.c3d(filepath)
+    header = c3d["header"]
+    parameters = c3d["parameters"]
+
+    # ezc3d: points (4, markers, frames) with a homogeneous row; analogs (1, channels, samples)
+    points = np.asarray(c3d["data"]["points"][:3], dtype=np.float32).transpose(2, 1, 0)
+    analogs = np.asarray(c3d["data"]["analogs"], dtype=np.float32)
+    analogs = analogs[0].T if analogs.size else np.zeros((0, 0), dtype=np.float32)
+
+    return TrialData(
+        marker_labels=_labels(parameters, "POINT")[:points.shape[1]],
+        points=np.ascontiguousarray(points),
+        point_rate=float(header["points"]["frame_rate"]),
+        channel_labels=_labels(parameters, "ANALOG")[:analogs.shape[1]],
+        analogs=np.ascontiguousarray(analogs),
+        analog_rate=float(header["analogs"]["frame_rate"]),
+        first_frame=int(header["points"]["first_frame"])
+    )
+
+class _Call:
+    """One in-flight call whose result is shared by every waiter."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    While a call for a key is running, further calls with that key block
+    until it finishes and receive its result (or exception). Results are not
+    kept afterwards; pair this with a cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run `fn` for `key`, or wait for the call already running for it."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+# Upper bound on ezc3d decodes running at the same time
+MAX_CONCURRENT_DECODES = 4
+
+class TrialCache:
+    """Thread-safe LRU of decoded trials, bounded by the total size of their arrays."""
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, max_concurrent_decodes: int = MAX_CONCURRENT_DECODES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, TrialData]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._decode_slots = threading.BoundedSemaphore(max_concurrent_decodes)
+        # Decodes in-process by default; workers.start_workers moves decoding to worker processes
+        self.decoder: Callable[[str], TrialData] = decode_trial
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filepath: str) -> TrialData:
+        """
+        Return the decoded trial, decoding the file on a miss or when it changed on disk.
+
+        Concurrent misses for the same file version share a single decode.
+        """
+        fingerprint = file_fingerprint(filepath)
+        trial = self._cached(filepath, fingerprint)
+        if trial is not None:
+            return trial
+        return self._flights.do((filepath, fingerprint), lambda: self._load(filepath, fingerprint))
+
+    def _cached(self, filepath: str, fingerprint: str) -> Optional[TrialData]:
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if entry and entry[0] == fingerprint:
+                self._entries.move_to_end(filepath)
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def _load(self, filepath: str, fingerprint: str) -> TrialData:
+        # A flight for this file may have completed between our cache check and now
+        trial = self._cached(filepath, fingerprint)
+        if trial is not None:
+            return trial
+
+        with self._decode_slots:
+            trial = self.decoder(filepath)
+
+        with self._lock:
+            self.misses += 1
+            old = self._entries.pop(filepath, None)
+            if old:
+                self._bytes -= old[1].nbytes
+            if trial.nbytes <= self.max_bytes:
+                self._entries[filepath] = (fingerprint, trial)
+                self._bytes += trial.nbytes
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+        return trial
+
+    def stats(self) -> dict:
+        """Hit and size counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self._flights.coalesced,
+                "in_flight": self._flights.in_flight(),
+            }
+
+# Process-wide cache of decoded trials
+trial_cache = TrialCache()
+
+def load_trial(filepath: str) -> TrialData:
+    """Decoded data of a C3D file, from the cache when unchanged."""
+    return trial_cache.get(filepath)
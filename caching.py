@@ -0,0 +1,224 @@
+"""
+HTTP conditional caching.
+
+Database-derived GET responses carry an ETag built from the write generation
+counter (see models/generation.py) and the request path and query, so a
+client revalidating with If-None-Match gets `304 Not Modified` after a single
+counter lookup, without the endpoint or its queries running.
+
+Responses computed from C3D files on disk (plots) use a fingerprint of the
+file (size and modification time) instead, via `file_etag`.
+
+`QueryCache` memoizes query results in memory for one generation at a time.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+import dependencies
+from models.generation import read_generation
+
+# GET paths computed from files on disk; they validate with file fingerprints
+FILE_DERIVED_PATHS = {"/api/plot", "/api/plot/ensemble"}
+FILE_DERIVED_PATTERNS = (
+    re.compile(r"^/api/files/\d+/(data|download)$"),
+    re.compile(r"^/api/groups/\d+/download$"),
+    re.compile(r"^/api/files/archive$"),
+)
+
+# GET paths whose content changes without database writes
+UNCACHED_PATHS = FILE_DERIVED_PATHS | {"/api/search/cache/stats"}
+
+def make_etag(*parts) -> str:
+    """Build a weak ETag from arbitrary parts."""
+    digest = hashlib.blake2b("\x1f".join(str(part) for part in parts).encode(), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    """Check an If-Modified-Since header (second precision) against a timestamp."""
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return last_modified.replace(microsecond=0) <= since
+
+def http_date(value: datetime) -> str:
+    """Format a (naive UTC or aware) datetime as an HTTP date."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def file_fingerprint(filepath: str) -> str:
+    """Identify the current content of a file by its size and modification time."""
+    stat = os.stat(filepath)
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+def file_etag(filepath: str, *parts) -> str:
+    """ETag for a response computed from a file on disk and the given request parts."""
+    return make_etag(file_fingerprint(filepath), *parts)
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already holds this ETag."""
+    return etag_matches(request.headers.get("if-none-match"), etag)
+
+def current_generation():
+    """Read the current (generation, last modified) on a fresh connection."""
+    with dependencies.engine.connect() as connection:
+        return read_generation(connection)
+
+class GenerationETagMiddleware:
+    """
+    ASGI middleware answering conditional GETs under `prefix` from the generation counter.
+
+    Any committed write bumps the generation and so invalidates every ETag;
+    until then repeated requests cost one primary-key lookup.
+    """
+
+    def __init__(self, app, prefix: str = "/api", exclude=UNCACHED_PATHS, exclude_patterns=FILE_DERIVED_PATTERNS):
+        self.app = app
+        self.prefix = prefix
+        self.exclude = set(exclude)
+        self.exclude_patterns = tuple(exclude_patterns)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not scope["path"].startswith(self.prefix)
+            or scope["path"] in self.exclude
+            or any(pattern.match(scope["path"]) for pattern in self.exclude_patterns)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        generation, last_modified = await run_in_threadpool(current_generation)
+        etag = make_etag(generation, scope["path"], scope.get("query_string", b"").decode())
+        validators = {
+            "ETag": etag,
+            "Last-Modified": http_date(last_modified),
+            "Cache-Control": "no-cache",  # Always revalidate, never serve stale
+        }
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        if etag_matches(if_none_match, etag) or (
+            if_none_match is None
+            and not_modified_since(request_headers.get("if-modified-since"), last_modified)
+        ):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(k.lower().encode(), v.encode()) for k, v in validators.items()],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_validators(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                for key, value in validators.items():
+                    if key not in headers:
+                        headers[key] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
+
+def canonical_key(*parts) -> str:
+    """Serialize parameters into a stable cache key (dict order does not matter)."""
+    return json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results for the current database generation.
+
+    Entries are only valid for the generation they were computed under; the
+    first lookup after a write sees a new generation and drops every entry.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._hit_seconds = 0.0
+        self._miss_seconds = 0.0
+
+    def get_or_compute(self, generation: int, key: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for `key`, computing and storing it on a miss."""
+        start = time.perf_counter()
+        with self._lock:
+            if self._generation is not None and generation < self._generation:
+                # Reader on an older snapshot than the cache; do not roll the cache back
+                self.misses += 1
+                return compute()
+            if generation != self._generation:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._generation = generation
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                value = self._entries[key]
+                self.hits += 1
+                self._hit_seconds += time.perf_counter() - start
+                return value
+
+        # Compute outside the lock; concurrent misses for one key may both run
+        value = compute()
+
+        with self._lock:
+            self.misses += 1
+            self._miss_seconds += time.perf_counter() - start
+            if generation == self._generation:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        """Drop every entry (statistics are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit rate, latency and size counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "avg_hit_ms": 1000 * self._hit_seconds / self.hits if self.hits else 0.0,
+                "avg_miss_ms": 1000 * self._miss_seconds / self.misses if self.misses else 0.0,
+            }
@@ -0,0 +1,103 @@
+"""
+Time-normalized ensemble curves across trials.
+
+Each cycle (the interval between consecutive occurrences of an event, or the
+whole trial) is resampled to a fixed number of points (0-100 % of the
+cycle) with linear interpolation done for all cycles of a trial at once, and
+the resulting (cycles, points) matrix is reduced to mean, SD and percentile
+curves.
+"""
+import warnings
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from models.label import canonical_label
+
+# Samples per normalized cycle (0, 1, ..., 100 %)
+NORMALIZED_POINTS = 101
+
+def series_index(labels: Sequence[str], kind: str, name: str) -> Optional[int]:
+    """Index of a label in a trial, matched exactly or else by canonical name (LHEE ~ L_HEE)."""
+    if name in labels:
+        return list(labels).index(name)
+    canonical = canonical_label(kind, name)
+    return next((index for index, label in enumerate(labels) if canonical_label(kind, label) == canonical), None)
+
+def event_cycles(event_times: Iterable[float]) -> np.ndarray:
+    """(cycles, 2) start/end times between consecutive event occurrences."""
+    times = np.unique(np.asarray(list(event_times), dtype=np.float64))
+    return np.column_stack((times[:-1], times[1:]))
+
+def normalize_cycles(
+    series: np.ndarray,
+    rate: float,
+    cycles: np.ndarray,
+    points: int = NORMALIZED_POINTS
+) -> np.ndarray:
+    """
+    Resample each cycle of a 1-D series to `points` samples.
+
+    Args:
+        series: Samples at `rate` Hz, the first at time 0
+        cycles: (cycles, 2) start/end times in seconds; cycles not fully
+                inside the series are dropped
+
+    Returns:
+        np.ndarray: (kept cycles, points) float64; NaN where the series is NaN
+    """
+    if len(series) < 2 or not rate or not len(cycles):
+        return np.empty((0, points))
+    positions = np.asarray(cycles, dtype=np.float64) * rate
+    starts, ends = positions[:, 0], positions[:, 1]
+    valid = (starts >= 0) & (ends <= len(series) - 1) & (ends > starts)
+    starts, ends = starts[valid], ends[valid]
+
+    # Fractional sample position of every output point of every cycle
+    query = starts[:, None] + (ends - starts)[:, None] * np.linspace(0.0, 1.0, points)[None, :]
+    lower = np.minimum(np.floor(query).astype(np.intp), len(series) - 2)
+    fraction = query - lower
+    values = np.asarray(series, dtype=np.float64)
+    return values[lower] * (1.0 - fraction) + values[lower + 1] * fraction
+
+def summarize(curves: np.ndarray, percentiles: Sequence[float] = ()) -> Dict[str, object]:
+    """Mean, sample SD and percentile curves over cycles, ignoring NaN samples."""
+    with warnings.catch_warnings():
+        # Columns where every cycle is NaN stay NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return {
+            "mean": np.nanmean(curves, axis=0),
+            "sd": np.nanstd(curves, axis=0, ddof=1) if len(curves) > 1 else np.zeros(curves.shape[1]),
+            "percentiles": {
+                f"{p:g}": values
+                for p, values in zip(percentiles, np.nanpercentile(curves, list(percentiles), axis=0))
+            } if len(percentiles) else {},
+        }
+
+def ensemble_traces(summary: Dict[str, object], name: str) -> List[dict]:
+    """
+    Plotly traces: percentile bands, the ±1 SD band and the mean curve.
+
+    Percentiles are paired outermost first (lowest with highest) into bands;
+    the middle percentile of an odd count is drawn as its own line.
+    """
+    x = np.linspace(0.0, 100.0, len(summary["mean"]))
+    traces = []
+    percentiles = sorted(summary["percentiles"].items(), key=lambda item: float(item[0]))
+    half = len(percentiles) // 2
+    for (low_name, low), (high_name, high) in zip(percentiles[:half], reversed(percentiles[half:])):
+        traces.append({"type": "scatter", "x": x, "y": low, "mode": "lines", "line": {"width": 0},
+                       "showlegend": False, "hoverinfo": "skip"})
+        traces.append({"type": "scatter", "x": x, "y": high, "mode": "lines", "line": {"width": 0},
+                       "fill": "tonexty", "fillcolor": "rgba(31, 119, 180, 0.1)",
+                       "name": f"P{low_name}-P{high_name}"})
+    if len(percentiles) % 2:
+        middle_name, middle = percentiles[half]
+        traces.append({"type": "scatter", "x": x, "y": middle, "mode": "lines",
+                       "line": {"color": "rgb(31, 119, 180)", "dash": "dot"}, "name": f"P{middle_name}"})
+    mean, sd = summary["mean"], summary["sd"]
+    traces.append({"type": "scatter", "x": x, "y": mean - sd, "mode": "lines", "line": {"width": 0},
+                   "showlegend": False, "hoverinfo": "skip"})
+    traces.append({"type": "scatter", "x": x, "y": mean + sd, "mode": "lines", "line": {"width": 0},
+                   "fill": "tonexty", "fillcolor": "rgba(31, 119, 180, 0.25)", "name": "±1 SD"})
+    traces.append({"type": "scatter", "x": x, "y": mean, "mode": "lines",
+                   "line": {"color": "rgb(31, 119, 180)"}, "name": f"{name} mean"})
+    return traces
@@ -3,16 +3,19 @@ Example of user code interacting with the C3D Database API.
 
 This demonstrates how external scripts can:
 1. Query the API to find trials based on metadata
-2. Download and process C3D files with OpenSim 
+2. Download only the marker/analog data they need and process it with OpenSim 
 3. Store processing results back in the database
 
 Requirements:
 - requests
+- numpy
 - pandas
 - opensim (not used directly in this example, but would be in real code)
 """
+import io
 import requests
 import json
+import numpy as np
 import pandas as pd
 import os
 from pathlib import Path
@@ -24,7 +27,7 @@ API_URL = "http://localhost:8000/api"  # Adjust to your server URL
 def get_unprocessed_trials(subject_id, session_id=None):
     """Get trials that haven't been processed yet for a given subject."""
     params = {
-        "subject_id": subject_id,
+        "subject_id": subject_id,  # Resolved server-side across all of the subject's sessions
         "has_results": False  # Only get trials without results
     }
     
@@ -32,29 +35,39 @@ def get_unprocessed_trials(subject_id, session_id=None):
     if session_id:
         params["session_id"] = session_id
     
-    # Get all sessions for this subject first
-    sessions_resp = requests.get(f"{API_URL}/sessions/", params={"subject_id": subject_id})
-    if not sessions_resp.ok:
-        print(f"Error getting sessions: {sessions_resp.text}")
+    trials_resp = requests.get(f"{API_URL}/trials/", params=params)
+    if not trials_resp.ok:
+        print(f"Error getting trials: {trials_resp.text}")
         return []
     
-    sessions = sessions_resp.json()
-    
-    # Get trials for each session
-    trials = []
-    for session in sessions:
-        trials_resp = requests.get(
-            f"{API_URL}/trials/", 
-            params={"session_id": session["id"], "has_results": False}
-        )
-        if trials_resp.ok:
-            session_trials = trials_resp.json()
-            # Add session name to each trial for reference
-            for trial in session_trials:
-                trial["session_name"] = session["name"]
-            trials.extend(session_trials)
-    
-    return trials
+    return trials_resp.json()
+
+# Example: Fetch a slice of a trial's data without access to the server's filesystem
+def fetch_trial_data(file_id, markers=None, channels=None, start_time=None, end_time=None):
+    """
+    Download selected markers and analog channels as NumPy arrays.
+    
+    Returns a dict with `points` (frames, markers, 3), `analogs` (samples,
+    channels), `marker_labels`, `channel_labels`, `point_rate`, `analog_rate`
+    and `start_frame`, or None on error.
+    """
+    params = {"format": "npz"}
+    if markers is not None:
+        params["markers"] = ",".join(markers)
+    if channels is not None:
+        params["channels"] = ",".join(channels)
+    if start_time is not None:
+        params["start_time"] = start_time
+    if end_time is not None:
+        params["end_time"] = end_time
+    
+    data_resp = requests.get(f"{API_URL}/files/{file_id}/data", params=params)
+    if not data_resp.ok:
+        print(f"Error getting trial data: {data_resp.text}")
+        return None
+    
+    with np.load(io.BytesIO(data_resp.content)) as npz:
+        return {key: npz[key] for key in npz.files}
 
 # Example: Process a trial with OpenSim
 def process_trial_with_opensim(trial):
@@ -63,26 +76,23 @@ def process_trial_with_opensim(trial):
     
     This is a placeholder that simulates OpenSim processing. In a real
     application, you would:
-    1. Download the C3D file
+    1. Download the marker and force data
     2. Run OpenSim tools on it
     3. Store the results back in the database
     """
     print(f"Processing trial: {trial['name']} (ID: {trial['id']})")
     
-    # Step 1: Get the C3D file path
+    # Step 1: Download the trial's marker and analog data (a few KB-MB instead of the whole file)
     if not trial.get("c3d_file_id"):
         print(f"Trial has no associated C3D file")
         return False
     
-    c3d_resp = requests.get(f"{API_URL}/files/{trial['c3d_file_id']}")
-    if not c3d_resp.ok:
-        print(f"Error getting C3D file: {c3d_resp.text}")
+    data = fetch_trial_data(trial["c3d_file_id"])
+    if data is None:
         return False
     
-    c3d_file = c3d_resp.json()
-    c3d_path = c3d_file["filepath"]
-    
-    print(f"C3D file path: {c3d_path}")
+    print(f"Markers: {list(data['marker_labels'])}, frames: {data['points'].shape[0]} "
+          f"at {float(data['point_rate'])} Hz, analog channels: {list(data['channel_labels'])}")
     
     # Step 2: Simulate OpenSim processing (in real code, you'd use the opensim package)
     # Example: Extract joint angles from the C3D file using OpenSim
@@ -7,10 +7,11 @@ from .c3d_file import C3DFile, C3DFileCreate, C3DFileUpdate, C3DFileRead
 from .marker import Marker
 from .channel import AnalogChannel
 from .event import Event
+from .gait_cycle import GaitCycle, GaitCycleRead
 from .response import Response, ErrorResponse
 from .search import SearchResult
 from .analysis import Analysis, AnalysisResult
-from .group import TrialGroup, TrialGroupCreate, TrialGroupUpdate, TrialGroupRead
+from .group import TrialGroup, TrialGroupCreate, TrialGroupUpdate, TrialGroupRead, TrialGroupSetOperation, TrialGroupQuery
 
 # Import hierarchy models
 from .hierarchy import (
@@ -19,6 +20,11 @@ from .hierarchy import (
     Session, SessionCreate, SessionUpdate, SessionRead,
     Trial, TrialCreate, TrialUpdate, TrialRead
 )
+from .closure import HierarchyClosure
+from .label import Label, LabelRead
+from .label_index import LabelBitmapChunk
+from .parameter import ParameterGroup, Parameter, C3DFileParameterGroup, ParameterRead
+from .generation import DatabaseGeneration
 
 # Initialize SQLModel relationships to resolve forward references
 # This is called after all models are imported
@@ -26,8 +32,8 @@ setup_relationship_handlers()
 
 __all__ = [
     'C3DFile', 'C3DFileCreate', 'C3DFileUpdate', 'C3DFileRead',
-    'TrialGroup', 'TrialGroupCreate', 'TrialGroupUpdate', 'TrialGroupRead',
-    'Marker', 'AnalogChannel', 'Event',
+    'TrialGroup', 'TrialGroupCreate', 'TrialGroupUpdate', 'TrialGroupRead', 'TrialGroupSetOperation', 'TrialGroupQuery',
+    'Marker', 'AnalogChannel', 'Event', 'GaitCycle', 'GaitCycleRead',
     'Response', 'ErrorResponse',
     'SearchResult',
     'Analysis', 'AnalysisResult',
@@ -35,5 +41,9 @@ __all__ = [
     'Classification', 'ClassificationCreate', 'ClassificationUpdate', 'ClassificationRead',
     'Subject', 'SubjectCreate', 'SubjectUpdate', 'SubjectRead',
     'Session', 'SessionCreate', 'SessionUpdate', 'SessionRead',
-    'Trial', 'TrialCreate', 'TrialUpdate', 'TrialRead'
+    'Trial', 'TrialCreate', 'TrialUpdate', 'TrialRead',
+    'HierarchyClosure',
+    'Label', 'LabelRead', 'LabelBitmapChunk',
+    'ParameterGroup', 'Parameter', 'C3DFileParameterGroup', 'ParameterRead',
+    'DatabaseGeneration'
 ]
\ No newline at end of file
@@ -3,9 +3,12 @@ Analysis models for custom user-defined analyses.
 """
 from fastapi import HTTPException
 import ezc3d
+import numpy as np
 from typing import Any, TYPE_CHECKING
 from datetime import datetime
 from sqlmodel import SQLModel, Field, JSON, Column, Relationship
+from signal_stats import analog_saturation_limits, analog_summary, marker_quality
+from .parameter import convert_parameters
 
 if TYPE_CHECKING:
     from .c3d_file import C3DFile
@@ -96,39 +99,71 @@ class C3DDataExtractor(AnalysisBase):
                 if subject_names and len(subject_names) > 0:
                     subject_name = subject_names[0]
             
-            # Store additional metadata as a string
-            metadata = str(parameters)
+            # Convert the parameter tree into plain groups for the parameter store
+            parameter_groups = convert_parameters(parameters)
             
             # Get marker names
             marker_names = c3d.parameters["POINT"]["LABELS"]["value"]
             markers = [name for name in marker_names if name.strip()]
             
+            # Quality statistics for all markers at once, kept for the named ones
+            points = c3d["data"]["points"]
+            residuals = c3d["data"].get("meta_points", {}).get("residuals")
+            quality = marker_quality(points, residuals[0] if residuals is not None and residuals.size else None)
+            marker_stats = [
+                quality[index] if index < len(quality) else {}
+                for index, name in enumerate(marker_names) if name.strip()
+            ]
+            
             # Get analog channel names
+            channel_names = []
             channels = []
             if "ANALOG" in c3d.parameters and "LABELS" in c3d.parameters["ANALOG"]:
                 channel_names = c3d.parameters["ANALOG"]["LABELS"]["value"]
                 channels = [name for name in channel_names if name.strip()]
             
-            # Get events
+            # Summary statistics for all channels at once, kept for the named ones
+            analogs = c3d["data"]["analogs"]
+            analogs = analogs[0] if analogs.size else np.zeros((0, 0))
+            summary = analog_summary(analogs, analog_saturation_limits(parameters, len(analogs)))
+            channel_stats = [
+                summary[index] if index < len(summary) else {}
+                for index, name in enumerate(channel_names) if name.strip()
+            ]
+            
+            # Get events: EVENT:TIMES is (2, events) holding minutes and seconds
             events = []
-            if "EVENT" in c3d.parameters and "LABELS" in c3d.parameters["EVENT"]:
-                event_names = c3d.parameters["EVENT"]["LABELS"]["value"]
-                event_times = c3d.parameters["EVENT"]["TIMES"]["value"]
+            if "EVENT" in parameters and "LABELS" in parameters["EVENT"] and "TIMES" in parameters["EVENT"]:
+                event_names = parameters["EVENT"]["LABELS"]["value"]
+                times = np.asarray(parameters["EVENT"]["TIMES"]["value"], dtype=float).reshape(2, -1)
+                event_times = times[0] * 60 + times[1]
+                contexts = []
+                if "CONTEXTS" in parameters["EVENT"]:
+                    contexts = parameters["EVENT"]["CONTEXTS"]["value"]
+                first_frame = header['points']['first_frame']
                 
-                if len(event_times) > 2:
-                    event_times = event_times[2]  # Time values
-                    for i, event in enumerate(event_names):
-                        if i < len(event_times):
-                            events.append((event, event_times[i]))
+                for i, event in enumerate(event_names[:len(event_times)]):
+                    if not event.strip():
+                        continue
+                    event_time = float(event_times[i])
+                    events.append({
+                        "name": event.strip(),
+                        "time": event_time,
+                        "context": contexts[i].strip() if i < len(contexts) and contexts[i].strip() else None,
+                        # Frame 0 of the trial is captured at first_frame / rate
+                        "frame": int(round(event_time * sample_rate)) - first_frame if sample_rate > 0 else None
+                    })
             
             return {
                 "frame_count": frame_count,
                 "sample_rate": sample_rate,
                 "duration": duration,
                 "subject_name": subject_name,
-                "metadata": metadata,
+                "parameters": parameter_groups,
                 "markers": markers,
+                "marker_quality": marker_stats,
                 "channels": channels,
+                "channel_stats": channel_stats,
                 "events": events
             }
         except Exception as e:
@@ -1,10 +1,11 @@
 """
 Base models and utilities for the C3D database.
 """
-from typing import ForwardRef, Optional, List, Dict, Any
+import json
+from typing import ForwardRef, Optional, List, Dict, Any, Iterable
 from datetime import datetime
-from sqlmodel import Field, SQLModel, Column
-from sqlalchemy import JSON
+from sqlmodel import Field, SQLModel, Column, select
+from sqlalchemy import JSON, func, literal_column, inspect
 
 class BaseModel(SQLModel):
     """Base model with common fields and methods."""
@@ -37,6 +38,40 @@ class GroupFileLink(SQLModel, table=True):
         default=None, foreign_key="c3d_files.id", primary_key=True
     )
 
+def id_list_subquery(ids: Iterable[int]):
+    """
+    Select the given integer ids from a single JSON-encoded bind parameter.
+    
+    Use with `.in_()` instead of passing large id lists directly, which would
+    create one SQL variable per id and hit SQLite's variable limit.
+    """
+    return select(literal_column("value")).select_from(
+        func.json_each(json.dumps([int(i) for i in ids]))
+    )
+
+def upgrade_schema(engine) -> None:
+    """
+    Add columns and indexes introduced after a table was first created.
+    
+    `create_all` only creates missing tables, so databases from earlier
+    versions are upgraded in place here. Only additive changes are handled:
+    new columns must be nullable (SQLite's ADD COLUMN cannot add constraints).
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.exec_driver_sql(
+                        f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                    )
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
 # Dictionary to store forward references for model resolution
 _model_references: dict[str, ForwardRef] = {}
 _initialized = False
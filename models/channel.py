@@ -3,6 +3,7 @@ Analog Channel models for database storage and API responses.
 """
 from typing import TYPE_CHECKING
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 
 if TYPE_CHECKING:
     from .c3d_file import C3DFile
@@ -10,11 +11,27 @@ if TYPE_CHECKING:
 class ChannelBase(SQLModel):
     """Base model for analog channel data."""
     channel_name: str
+    # Summary statistics computed at ingest (see signal_stats.analog_summary)
+    minimum: float | None = None
+    maximum: float | None = None
+    mean: float | None = None
+    rms: float | None = None
+    saturation_count: int | None = None  # Samples at the ends of the ADC range
+    nan_count: int | None = None
 
 class AnalogChannel(ChannelBase, table=True):
     """Database model for analog channel metadata."""
+    __table_args__ = (
+        # Label -> files lookups for label filters
+        Index("ix_analogchannel_label_file", "label_id", "file_id"),
+        # Per-channel threshold screens such as Force.Fz1:maximum>800
+        Index("ix_analogchannel_label_maximum", "label_id", "maximum"),
+        Index("ix_analogchannel_label_minimum", "label_id", "minimum"),
+    )
+    
     id: int | None = Field(default=None, primary_key=True)
-    file_id: int = Field(foreign_key="c3d_files.id")
+    file_id: int = Field(foreign_key="c3d_files.id", index=True)
+    label_id: int | None = Field(default=None, foreign_key="label.id")
     c3d_files: "C3DFile" = Relationship(back_populates="analog_channels")
 
 class ChannelRead(ChannelBase):
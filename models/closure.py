@@ -0,0 +1,147 @@
+"""
+Closure table over the Classification > Subject > Session > Trial hierarchy.
+
+Every trial has one row per ancestor (including itself), so "all files under
+classification X" or "all trials for subject Y" is a single indexed lookup
+regardless of how deep the node sits in the hierarchy.
+"""
+from typing import Optional
+from sqlmodel import SQLModel, Field, Session, select, delete, func
+from sqlalchemy import Index, insert, literal
+
+from .hierarchy import Subject, Session as SessionModel, Trial
+
+# Depth of each node type above a trial
+ANCESTOR_DEPTHS = {
+    "trial": 0,
+    "session": 1,
+    "subject": 2,
+    "classification": 3,
+}
+
+class HierarchyClosure(SQLModel, table=True):
+    """Ancestor/descendant pairs between hierarchy nodes and the trials beneath them."""
+    __tablename__ = "hierarchy_closure"
+    __table_args__ = (
+        # Covering index for scope lookups: (type, id) -> file ids without touching the table
+        Index("ix_hierarchy_closure_scope", "ancestor_type", "ancestor_id", "c3d_file_id"),
+    )
+
+    ancestor_type: str = Field(primary_key=True)
+    ancestor_id: int = Field(primary_key=True)
+    trial_id: int = Field(foreign_key="trials.id", primary_key=True, index=True)
+    c3d_file_id: int = Field(foreign_key="c3d_files.id", index=True)
+    depth: int
+
+def index_trial(db: Session, trial: Trial) -> None:
+    """(Re)create the closure rows for a single trial. Caller commits."""
+    db.exec(delete(HierarchyClosure).where(HierarchyClosure.trial_id == trial.id))
+
+    ancestors = [("trial", trial.id), ("session", trial.session_id)]
+    db_session = db.get(SessionModel, trial.session_id)
+    if db_session:
+        ancestors.append(("subject", db_session.subject_id))
+        subject = db.get(Subject, db_session.subject_id)
+        if subject and subject.classification_id is not None:
+            ancestors.append(("classification", subject.classification_id))
+
+    for ancestor_type, ancestor_id in ancestors:
+        db.add(HierarchyClosure(
+            ancestor_type=ancestor_type,
+            ancestor_id=ancestor_id,
+            trial_id=trial.id,
+            c3d_file_id=trial.c3d_file_id,
+            depth=ANCESTOR_DEPTHS[ancestor_type]
+        ))
+
+def update_trial_file(db: Session, trial_id: int, c3d_file_id: int) -> None:
+    """Point every closure row of a trial at a new C3D file. Caller commits."""
+    rows = db.exec(select(HierarchyClosure).where(HierarchyClosure.trial_id == trial_id)).all()
+    for row in rows:
+        row.c3d_file_id = c3d_file_id
+        db.add(row)
+
+def remove_trial(db: Session, trial_id: int) -> None:
+    """Drop the closure rows of a deleted trial. Caller commits."""
+    db.exec(delete(HierarchyClosure).where(HierarchyClosure.trial_id == trial_id))
+
+def reparent_subject(db: Session, subject_id: int, classification_id: Optional[int]) -> None:
+    """Move every trial under a subject to a new classification in two set-based statements."""
+    subject_trials = select(HierarchyClosure.trial_id).where(
+        HierarchyClosure.ancestor_type == "subject",
+        HierarchyClosure.ancestor_id == subject_id
+    )
+    db.exec(delete(HierarchyClosure).where(
+        HierarchyClosure.ancestor_type == "classification",
+        HierarchyClosure.trial_id.in_(subject_trials)
+    ))
+    if classification_id is None:
+        return
+
+    db.exec(insert(HierarchyClosure).from_select(
+        ["ancestor_type", "ancestor_id", "trial_id", "c3d_file_id", "depth"],
+        select(
+            literal("classification"),
+            literal(classification_id),
+            HierarchyClosure.trial_id,
+            HierarchyClosure.c3d_file_id,
+            literal(ANCESTOR_DEPTHS["classification"])
+        ).where(
+            HierarchyClosure.ancestor_type == "subject",
+            HierarchyClosure.ancestor_id == subject_id
+        )
+    ))
+
+def rebuild_closure(db: Session) -> None:
+    """Rebuild the whole closure table from the hierarchy tables and commit."""
+    db.exec(delete(HierarchyClosure))
+
+    columns = ["ancestor_type", "ancestor_id", "trial_id", "c3d_file_id", "depth"]
+    sources = [
+        select(literal("trial"), Trial.id, Trial.id, Trial.c3d_file_id, literal(0)),
+        select(literal("session"), Trial.session_id, Trial.id, Trial.c3d_file_id, literal(1)),
+        select(literal("subject"), SessionModel.subject_id, Trial.id, Trial.c3d_file_id, literal(2))
+            .join(SessionModel, SessionModel.id == Trial.session_id),
+        select(literal("classification"), Subject.classification_id, Trial.id, Trial.c3d_file_id, literal(3))
+            .join(SessionModel, SessionModel.id == Trial.session_id)
+            .join(Subject, Subject.id == SessionModel.subject_id)
+            .where(Subject.classification_id.is_not(None)),
+    ]
+    for source in sources:
+        db.exec(insert(HierarchyClosure).from_select(columns, source))
+    db.commit()
+
+def ensure_closure(db: Session) -> None:
+    """Backfill the closure table for databases created before it existed."""
+    closure_rows = db.exec(select(func.count()).select_from(HierarchyClosure)).one()
+    if closure_rows:
+        return
+    trial_rows = db.exec(select(func.count()).select_from(Trial)).one()
+    if trial_rows:
+        rebuild_closure(db)
+
+def scoped_file_ids(
+    classification_id: Optional[int] = None,
+    subject_id: Optional[int] = None,
+    session_id: Optional[int] = None
+):
+    """
+    Build subqueries selecting the C3D file ids under each requested hierarchy node.
+
+    Returns:
+        list: One `select(c3d_file_id)` per scope, to be used with `.in_()`
+    """
+    scopes = []
+    for ancestor_type, ancestor_id in (
+        ("classification", classification_id),
+        ("subject", subject_id),
+        ("session", session_id),
+    ):
+        if ancestor_id is not None:
+            scopes.append(
+                select(HierarchyClosure.c3d_file_id).where(
+                    HierarchyClosure.ancestor_type == ancestor_type,
+                    HierarchyClosure.ancestor_id == ancestor_id
+                )
+            )
+    return scopes
@@ -3,6 +3,7 @@ Event models for database storage and API responses.
 """
 from typing import TYPE_CHECKING
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 
 if TYPE_CHECKING:
     from .c3d_file import C3DFile
@@ -10,12 +11,20 @@ if TYPE_CHECKING:
 class EventBase(SQLModel):
     """Base model for event data."""
     event_name: str
-    event_time: float
+    event_time: float  # Seconds from the start of capture
+    context: str | None = None  # EVENT:CONTEXTS, e.g. "Left" or "Right"
+    event_frame: int | None = None  # 0-based frame index within the trial
 
 class Event(EventBase, table=True):
     """Database model for event metadata."""
+    __table_args__ = (
+        # Label -> files lookups for label filters
+        Index("ix_event_label_file", "label_id", "file_id"),
+    )
+    
     id: int | None = Field(default=None, primary_key=True)
-    file_id: int = Field(foreign_key="c3d_files.id")
+    file_id: int = Field(foreign_key="c3d_files.id", index=True)
+    label_id: int | None = Field(default=None, foreign_key="label.id")
     c3d_files: "C3DFile" = Relationship(back_populates="events")
 
 class EventRead(EventBase):
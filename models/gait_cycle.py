@@ -0,0 +1,84 @@
+"""
+Gait cycle index computed from events at ingest.
+
+A cycle runs from one foot strike to the next foot strike of the same
+context (side). The first foot off of that side inside the cycle splits it
+into stance and swing. Cycle-level queries and ensemble plots select windows
+from this table instead of re-reading events or C3D files.
+"""
+from typing import Any, Dict, List, Optional
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from .label import canonical_label
+
+# Event names delimiting cycles; aliases from label_aliases.json also match
+FOOT_STRIKE = "Foot Strike"
+FOOT_OFF = "Foot Off"
+
+class GaitCycleBase(SQLModel):
+    """Base model for gait cycle data."""
+    side: str | None = None  # Case-folded event context, e.g. "left"
+    start_frame: int  # 0-based trial frame of the opening foot strike
+    end_frame: int  # 0-based trial frame of the closing foot strike
+    start_time: float  # Seconds from the start of capture
+    end_time: float
+    foot_off_frame: int | None = None
+    stance_fraction: float | None = None  # Share of the cycle before foot off
+    swing_fraction: float | None = None
+
+class GaitCycle(GaitCycleBase, table=True):
+    """Database model for one gait cycle of a file."""
+    __tablename__ = "gait_cycle"
+    __table_args__ = (
+        Index("ix_gait_cycle_side_file", "side", "file_id"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    file_id: int = Field(foreign_key="c3d_files.id", index=True)
+
+class GaitCycleRead(GaitCycleBase):
+    """API response model for gait cycle data."""
+    id: int
+    file_id: int
+
+def compute_gait_cycles(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Build gait cycles from extracted events.
+
+    Args:
+        events: Dicts with name, context, time and frame (see C3DDataExtractor)
+
+    Returns:
+        list: GaitCycle field dicts (without file_id), ordered by side and time
+    """
+    kinds = {canonical_label("event", FOOT_STRIKE): FOOT_STRIKE, canonical_label("event", FOOT_OFF): FOOT_OFF}
+    by_side: Dict[Optional[str], Dict[str, list]] = {}
+    for event in events:
+        kind = kinds.get(canonical_label("event", event["name"]))
+        if kind is None or event.get("frame") is None:
+            continue
+        side = event["context"].casefold() if event.get("context") else None
+        by_side.setdefault(side, {FOOT_STRIKE: [], FOOT_OFF: []})[kind].append(event)
+
+    cycles = []
+    for side, side_events in sorted(by_side.items(), key=lambda item: item[0] or ""):
+        strikes = sorted(side_events[FOOT_STRIKE], key=lambda event: event["time"])
+        offs = sorted(side_events[FOOT_OFF], key=lambda event: event["time"])
+        for start, end in zip(strikes, strikes[1:]):
+            if end["frame"] <= start["frame"]:
+                continue
+            foot_off = next((off for off in offs if start["time"] < off["time"] < end["time"]), None)
+            stance = None
+            if foot_off is not None:
+                stance = (foot_off["time"] - start["time"]) / (end["time"] - start["time"])
+            cycles.append({
+                "side": side,
+                "start_frame": start["frame"],
+                "end_frame": end["frame"],
+                "start_time": start["time"],
+                "end_time": end["time"],
+                "foot_off_frame": foot_off["frame"] if foot_off is not None else None,
+                "stance_fraction": stance,
+                "swing_fraction": 1.0 - stance if stance is not None else None,
+            })
+    return cycles
@@ -0,0 +1,76 @@
+"""
+Database-wide write generation counter.
+
+Every committed transaction that inserts, updates or deletes rows through a
+SQLModel/SQLAlchemy session bumps a single counter row in the same
+transaction. Readers use the counter to validate cached responses without
+re-running their queries.
+"""
+from datetime import datetime, timezone
+from typing import Tuple
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import SQLModel, Field, Session, select
+
+# Key in Session.info marking a transaction that wrote rows
+_WRITE_FLAG = "generation_dirty"
+
+class DatabaseGeneration(SQLModel, table=True):
+    """Single-row table holding the current write generation."""
+    __tablename__ = "database_generation"
+
+    id: int = Field(default=1, primary_key=True)
+    value: int = 0
+    date_modified: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+def ensure_generation(session: Session) -> None:
+    """Create the generation row if it does not exist yet and commit."""
+    if not session.get(DatabaseGeneration, 1):
+        session.add(DatabaseGeneration(id=1))
+        session.commit()
+
+def read_generation(connection) -> Tuple[int, datetime]:
+    """Return the current (generation, UTC time of last bump) using a Core connection."""
+    row = connection.execute(
+        select(DatabaseGeneration.value, DatabaseGeneration.date_modified)
+        .where(DatabaseGeneration.id == 1)
+    ).first()
+    if row is None:
+        return 0, datetime.fromtimestamp(0, timezone.utc)
+    value, modified = row
+    # SQLite returns naive datetimes; the stored values are UTC
+    if modified.tzinfo is None:
+        modified = modified.replace(tzinfo=timezone.utc)
+    return value, modified
+
+@event.listens_for(OrmSession, "after_flush")
+def _mark_flush(session, flush_context):
+    """Unit-of-work writes (add, modify, delete objects)."""
+    if session.new or session.dirty or session.deleted:
+        session.info[_WRITE_FLAG] = True
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _mark_statement(orm_execute_state):
+    """Bulk insert/update/delete statements executed through the session."""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WRITE_FLAG] = True
+
+@event.listens_for(OrmSession, "before_commit")
+def _bump_generation(session):
+    """Bump the counter inside the committing transaction if it wrote anything."""
+    # Pending objects are normally flushed after this hook runs; flush now so they count
+    session.flush()
+    if session.info.pop(_WRITE_FLAG, False):
+        session.connection().execute(
+            update(DatabaseGeneration)
+            .where(DatabaseGeneration.id == 1)
+            .values(
+                value=DatabaseGeneration.value + 1,
+                date_modified=datetime.now(timezone.utc)
+            )
+        )
+
+@event.listens_for(OrmSession, "after_rollback")
+def _clear_flag(session):
+    """Writes that were rolled back do not change the generation."""
+    session.info.pop(_WRITE_FLAG, None)
@@ -1,12 +1,14 @@
 """
 Group models for organizing C3D files into collections.
 """
-from typing import List, Optional, TYPE_CHECKING, Type
+from typing import Any, Dict, List, Literal, Optional, TYPE_CHECKING, Type
 from datetime import datetime
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, Column
+from sqlalchemy import JSON
 
 # Import from base models
 from .base import TrialGroupBase, GroupFileLink
+from .search import FileQuery
 
 # Use TYPE_CHECKING to avoid runtime imports
 if TYPE_CHECKING:
@@ -30,18 +32,37 @@ class TrialGroup(TrialGroupBase, table=True):
         from .c3d_file import C3DFile
         return C3DFile
 
+class TrialGroupQuery(SQLModel, table=True):
+    """Saved search query defining the membership of a smart group."""
+    __tablename__ = "trialgroup_query"
+    
+    group_id: int = Field(foreign_key="trialgroup.id", primary_key=True)
+    query: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON)) # Serialized FileQuery
+    date_materialized: datetime = Field(default_factory=datetime.now)
+
 class TrialGroupCreate(TrialGroupBase):
     """Model for creating a new trial group."""
     file_ids: List[int] = [] # Allow creating a group with initial files
+    query: Optional[FileQuery] = None # Makes this a smart group whose members are the query results
+
+class TrialGroupSetOperation(TrialGroupBase):
+    """Model for creating a new group from a set operation over existing groups."""
+    operation: Literal["union", "intersection", "difference"]
+    group_ids: List[int] # For "difference", the first group minus all the others
 
 class TrialGroupUpdate(SQLModel):
     """Model for updating an existing trial group."""
     name: Optional[str] = None
     description: Optional[str] = None
+    query: Optional[FileQuery] = None # Replaces the saved query of a smart group
     
 class TrialGroupRead(TrialGroupBase):
     """Model for reading group data, including ID and file count."""
     id: int
     date_created: datetime
     date_modified: datetime
-    file_count: int = 0 # Will be calculated in the router 
\ No newline at end of file
+    file_count: int = 0 # Will be calculated in the router 
+    total_duration: float = 0.0 # Seconds, summed over member files
+    total_bytes: int = 0 # Summed file_size of member files
+    subject_count: int = 0 # Distinct subjects among member files
+    query: Optional[Dict[str, Any]] = None # Saved query for smart groups
\ No newline at end of file
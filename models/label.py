@@ -0,0 +1,165 @@
+"""
+Interned label dictionary for markers, analog channels and events.
+
+Per-file rows reference labels by integer id, so label filters compare
+integers and the distinct vocabulary is read from a small table instead of
+scanning every per-file row.
+
+Each label also stores a canonical name so labs naming the same marker
+differently (`LHEE`, `L_HEE`, `Subject1:LHEE`) match as one label: subject
+prefixes are stripped from marker names, aliases from `label_aliases.json`
+are applied and the result is case-folded.
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
+from sqlmodel import SQLModel, Field, Session, select, update
+from sqlalchemy import Index, UniqueConstraint
+
+LABEL_KINDS = ("marker", "channel", "event")
+
+# Alias map: {kind: {canonical name: [alias, ...]}}; edit and restart to apply
+LABEL_ALIASES_FILE = "label_aliases.json"
+
+class Label(SQLModel, table=True):
+    """Database model for a distinct marker, channel or event label."""
+    __tablename__ = "label"
+    __table_args__ = (
+        UniqueConstraint("kind", "name", name="uq_label_kind_name"),
+        Index("ix_label_kind_normalized_name", "kind", "normalized_name"),
+        Index("ix_label_kind_canonical_name", "kind", "canonical_name"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    kind: str  # "marker", "channel" or "event"
+    name: str  # Label exactly as stored in the C3D file
+    normalized_name: str  # Trimmed, case-folded form used for matching
+    canonical_name: str | None = None  # Prefix-stripped, aliased, case-folded form shared across labs
+
+class LabelRead(SQLModel):
+    """API response model for label data."""
+    id: int
+    kind: str
+    name: str
+    normalized_name: str
+    canonical_name: str | None = None
+
+def normalize_label(name: str) -> str:
+    """Normalize a raw label for matching."""
+    return name.strip().casefold()
+
+@lru_cache(maxsize=1)
+def label_aliases() -> Dict[str, Dict[str, str]]:
+    """
+    Load the alias map as {kind: {normalized alias: normalized canonical name}}.
+    
+    Returns an empty map when the file does not exist.
+    """
+    if not os.path.exists(LABEL_ALIASES_FILE):
+        return {}
+    with open(LABEL_ALIASES_FILE, encoding="utf-8") as f:
+        config = json.load(f)
+    aliases: Dict[str, Dict[str, str]] = {}
+    for kind, canonical_names in config.items():
+        if kind not in LABEL_KINDS:
+            raise ValueError(f"Unknown label kind '{kind}' in {LABEL_ALIASES_FILE}")
+        kind_aliases = aliases.setdefault(kind, {})
+        for canonical, names in canonical_names.items():
+            for name in names:
+                kind_aliases[normalize_label(name)] = normalize_label(canonical)
+    return aliases
+
+def canonical_label(kind: str, name: str) -> str:
+    """Canonical form of a raw label: subject prefix stripped (markers), aliased and case-folded."""
+    if kind == "marker":
+        # Vicon-style "Subject1:LHEE"
+        name = name.rsplit(":", 1)[-1]
+    normalized = normalize_label(name)
+    return label_aliases().get(kind, {}).get(normalized, normalized)
+
+def display_label(usage: Iterable[Tuple[str, int]]) -> str:
+    """
+    Name shown for a group of labels sharing a canonical name.
+
+    Args:
+        usage: (raw name, file count) of each label in the group
+
+    Returns:
+        str: The raw name used by the most files, ties broken alphabetically
+    """
+    return min(usage, key=lambda item: (-item[1], item[0]))[0]
+
+class LabelCache:
+    """
+    In-memory map of (kind, name) to label id used while ingesting files.
+
+    Labels missing from the database are inserted on first use; call `clear()`
+    after a rollback so ids from the discarded transaction are not reused.
+    """
+
+    def __init__(self):
+        self._ids: Dict[Tuple[str, str], int] = {}
+
+    def resolve(self, session: Session, kind: str, name: str) -> int:
+        """Return the id for a label, creating it if needed."""
+        key = (kind, name)
+        label_id = self._ids.get(key)
+        if label_id is not None:
+            return label_id
+
+        label = session.exec(
+            select(Label).where(Label.kind == kind, Label.name == name)
+        ).first()
+        if not label:
+            label = Label(
+                kind=kind,
+                name=name,
+                normalized_name=normalize_label(name),
+                canonical_name=canonical_label(kind, name)
+            )
+            session.add(label)
+            session.flush()  # Assign the label id
+
+        self._ids[key] = label.id
+        return label.id
+
+    def clear(self) -> None:
+        """Forget all cached ids."""
+        self._ids.clear()
+
+def label_tables():
+    """Map each label kind to its per-file model and raw name column."""
+    from .marker import Marker
+    from .channel import AnalogChannel
+    from .event import Event
+    return {
+        "marker": (Marker, Marker.marker_name),
+        "channel": (AnalogChannel, AnalogChannel.channel_name),
+        "event": (Event, Event.event_name),
+    }
+
+def canonicalize_labels(session: Session) -> None:
+    """Recompute canonical names (after the alias map changed or for older databases) and commit."""
+    for label in session.exec(select(Label)).all():
+        canonical = canonical_label(label.kind, label.name)
+        if label.canonical_name != canonical:
+            label.canonical_name = canonical
+            session.add(label)
+    session.commit()
+
+def backfill_labels(session: Session) -> None:
+    """Intern labels for per-file rows written before the label table existed and commit."""
+    cache = LabelCache()
+    for kind, (model, name_column) in label_tables().items():
+        names = session.exec(
+            select(name_column).where(model.label_id.is_(None)).distinct()
+        ).all()
+        for name in names:
+            label_id = cache.resolve(session, kind, name)
+            session.exec(
+                update(model)
+                .where(name_column == name, model.label_id.is_(None))
+                .values(label_id=label_id)
+            )
+    session.commit()
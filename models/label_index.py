@@ -0,0 +1,451 @@
+"""
+Bitmap index of label presence per file.
+
+Each interned label (see label.py) maps to a NumPy bitset over file ids: bit
+`i` is set when file `i` has at least one marker, channel or event with that
+label. Multi-label predicates ("all of LHEE, RHEE and Force.Fz1", "none of
+...") become bitwise AND/OR over a few kilobytes per label instead of one
+EXISTS join per label, and label facet counts are popcounts.
+
+The bitsets are split into fixed-size chunks of CHUNK_FILES file ids,
+persisted in the `label_bitmap_chunk` table and loaded at startup. Writers
+stage label changes on their session (`stage_file_labels`,
+`stage_file_removal`); the staged changes are written in the committing
+transaction and applied to the in-memory index once the commit succeeds, so
+the index always reflects committed data. A commit only reads and rewrites
+the chunks holding the files it touched, so ingesting a file costs the same
+however many files are already indexed.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import SQLModel, Field, Session, select
+from .label import Label, LABEL_KINDS, label_tables, canonical_label, display_label
+from .suggestion import PrefixIndex
+
+# Keys in Session.info for staged and committed label changes
+_PENDING = "label_index_pending"
+_COMMITTED = "label_index_committed"
+
+# File ids per persisted bitset chunk, and the chunk size in bytes
+CHUNK_FILES = 8192
+CHUNK_BYTES = CHUNK_FILES // 8
+
+# Number of set bits in each byte value
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+class LabelBitmapChunk(SQLModel, table=True):
+    """Database model for one chunk of the packed set of files containing a label."""
+    __tablename__ = "label_bitmap_chunk"
+
+    label_id: int = Field(foreign_key="label.id", primary_key=True)
+    chunk: int = Field(primary_key=True)  # Covers file ids chunk * CHUNK_FILES onwards
+    file_count: int = 0
+    bits: bytes = b""  # CHUNK_BYTES of little-endian packed bits
+
+def pack_ids(file_ids: Iterable[int]) -> np.ndarray:
+    """Pack file ids into a bitset."""
+    ids = np.fromiter(file_ids, dtype=np.int64)
+    if ids.size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    present = np.zeros(int(ids.max()) + 1, dtype=bool)
+    present[ids] = True
+    return np.packbits(present, bitorder="little")
+
+def unpack_ids(bits: np.ndarray) -> np.ndarray:
+    """File ids whose bit is set."""
+    return np.flatnonzero(np.unpackbits(bits, bitorder="little"))
+
+def popcount(bits: np.ndarray, axis: Optional[int] = None):
+    """Number of set bits (per row with `axis=-1`)."""
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        counts = np.bitwise_count(bits)
+    else:
+        counts = _POPCOUNT[bits]
+    total = counts.sum(axis=axis, dtype=np.int64)
+    return int(total) if axis is None else total
+
+def _fit(bits: np.ndarray, size: int) -> np.ndarray:
+    """Truncate or zero-pad a bitset to `size` bytes."""
+    if bits.size >= size:
+        return bits[:size]
+    return np.concatenate([bits, np.zeros(size - bits.size, dtype=np.uint8)])
+
+def bits_and(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Intersection of two bitsets."""
+    size = min(a.size, b.size)
+    return a[:size] & b[:size]
+
+def bits_or(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Union of two bitsets."""
+    size = max(a.size, b.size)
+    return _fit(a, size) | _fit(b, size)
+
+def bits_and_not(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Files in `a` but not in `b`."""
+    return a & ~_fit(b, a.size)
+
+def apply_changes(bits: np.ndarray, added: Iterable[int], removed: Iterable[int]) -> np.ndarray:
+    """Return a copy of a bitset with file ids set and cleared."""
+    added = np.fromiter(added, dtype=np.int64)
+    removed = np.fromiter(removed, dtype=np.int64)
+    size = max(bits.size, (int(added.max()) // 8 + 1) if added.size else 0)
+    result = _fit(bits, size).copy()
+    if added.size:
+        np.bitwise_or.at(result, added // 8, (1 << (added % 8)).astype(np.uint8))
+    removed = removed[removed // 8 < size]
+    if removed.size:
+        np.bitwise_and.at(result, removed // 8, ~(1 << (removed % 8)).astype(np.uint8))
+    return result
+
+def split_chunks(file_ids: Iterable[int]) -> Dict[int, np.ndarray]:
+    """Group file ids by chunk, as offsets within their chunk."""
+    ids = np.fromiter(file_ids, dtype=np.int64)
+    chunks = ids // CHUNK_FILES
+    return {int(chunk): ids[chunks == chunk] - chunk * CHUNK_FILES for chunk in np.unique(chunks)}
+
+def apply_chunk_changes(
+    chunks: Dict[int, np.ndarray],
+    added: Iterable[int],
+    removed: Iterable[int]
+) -> Dict[int, np.ndarray]:
+    """
+    Set and clear file ids in a chunked bitset.
+
+    Returns:
+        dict: New arrays for the touched chunks only; other chunks are unchanged
+    """
+    added_by_chunk, removed_by_chunk = split_chunks(added), split_chunks(removed)
+    empty = np.zeros(0, dtype=np.int64)
+    return {
+        chunk: apply_changes(
+            _fit(chunks.get(chunk, np.zeros(0, dtype=np.uint8)), CHUNK_BYTES),
+            added_by_chunk.get(chunk, empty),
+            removed_by_chunk.get(chunk, empty)
+        )
+        for chunk in set(added_by_chunk) | set(removed_by_chunk)
+    }
+
+def join_chunks(chunks: Dict[int, np.ndarray]) -> np.ndarray:
+    """One contiguous bitset from its chunks; missing chunks are zero."""
+    if not chunks:
+        return np.zeros(0, dtype=np.uint8)
+    bits = np.zeros((max(chunks) + 1) * CHUNK_BYTES, dtype=np.uint8)
+    for chunk, chunk_bits in chunks.items():
+        bits[chunk * CHUNK_BYTES:chunk * CHUNK_BYTES + chunk_bits.size] = chunk_bits
+    return bits
+
+def split_label_term(term: str) -> Tuple[Tuple[str, ...], str]:
+    """Split an optional kind prefix (`marker:LHEE`) from a label term."""
+    prefix, sep, rest = term.partition(":")
+    if sep and prefix.strip().lower() in LABEL_KINDS:
+        return (prefix.strip().lower(),), rest
+    return LABEL_KINDS, term
+
+class LabelBitmapIndex:
+    """
+    In-memory label bitsets with label name lookup.
+
+    Each label's bitset is held as a dict of chunks. Changes replace the
+    touched chunks and the label's dict, never modifying either in place, so
+    readers can use them without locking while committed changes are applied.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        # Bumped after every load or applied change; cached results that used
+        # the bitsets include it in their key, because a database generation
+        # is visible before its label changes are applied here
+        self.version = 0
+        self._lock = threading.Lock()
+        self._chunks: Dict[int, Dict[int, np.ndarray]] = {}  # label id -> chunk -> bits
+        self._joined: Dict[int, Tuple[Dict[int, np.ndarray], np.ndarray]] = {}  # label id -> (chunks, joined bits)
+        self._counts: Dict[int, int] = {}  # label id -> file count
+        self._labels: Dict[int, Tuple[str, str, str]] = {}  # id -> (kind, name, canonical name)
+        self._by_canonical: Dict[Tuple[str, str], List[int]] = {}  # (kind, canonical name) -> ids
+        self._display: Dict[Tuple[str, str], str] = {}  # (kind, canonical name) -> name in the vocabulary
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}  # kind -> stacked group bitsets
+        self.vocabularies = {kind: PrefixIndex() for kind in LABEL_KINDS}  # Label groups by file count
+
+    def load(self, session: Session) -> None:
+        """Load the persisted bitsets, rebuilding them if the database predates them."""
+        labels = session.exec(select(Label.id, Label.kind, Label.name, Label.canonical_name)).all()
+        if labels and session.exec(select(LabelBitmapChunk.label_id).limit(1)).first() is None:
+            # Databases indexed before the chunked bitmap table existed
+            rebuild_label_bitmaps(session)
+        rows = session.exec(select(LabelBitmapChunk.label_id, LabelBitmapChunk.chunk, LabelBitmapChunk.bits)).all()
+
+        chunks: Dict[int, Dict[int, np.ndarray]] = {}
+        for label_id, chunk, bits in rows:
+            chunks.setdefault(label_id, {})[chunk] = np.frombuffer(bits, dtype=np.uint8)
+
+        with self._lock:
+            self._labels = {}
+            self._by_canonical = {}
+            self._add_labels({label_id: (kind, name, canonical) for label_id, kind, name, canonical in labels})
+            self._chunks = chunks
+            self._joined = {}
+            self._counts = {
+                label_id: sum(popcount(bits) for bits in label_chunks.values())
+                for label_id, label_chunks in chunks.items()
+            }
+            self._matrices = {}
+            self._display = {}
+            self.vocabularies = {kind: PrefixIndex() for kind in LABEL_KINDS}
+            self._update_vocabularies(self._labels)
+            self.loaded = True
+            self.version += 1
+
+    def _add_labels(self, labels: Dict[int, Tuple[str, str, str]]) -> None:
+        for label_id, label in labels.items():
+            if label_id not in self._labels:
+                self._by_canonical.setdefault((label[0], label[2]), []).append(label_id)
+            self._labels[label_id] = label
+
+    def apply(self, labels: Dict[int, Tuple[str, str, str]], changes: Dict[int, Dict[int, np.ndarray]]) -> None:
+        """Apply committed chunks (label id -> chunk -> new bits)."""
+        with self._lock:
+            self._add_labels(labels)
+            for label_id, new_chunks in changes.items():
+                current = self._chunks.get(label_id, {})
+                self._counts[label_id] = self._counts.get(label_id, 0) + sum(
+                    popcount(bits) - popcount(current.get(chunk, np.zeros(0, dtype=np.uint8)))
+                    for chunk, bits in new_chunks.items()
+                )
+                self._chunks[label_id] = {**current, **new_chunks}
+            self._matrices = {}
+            self._update_vocabularies(changes)
+            self.version += 1
+
+    def _update_vocabularies(self, label_ids: Iterable[int]) -> None:
+        """Recount the canonical groups of the given labels, listing each once under its display name."""
+        counts: Dict[str, Dict[str, int]] = {kind: {} for kind in LABEL_KINDS}
+        for group in {(self._labels[label_id][0], self._labels[label_id][2]) for label_id in label_ids}:
+            kind = group[0]
+            group_ids = self._by_canonical[group]
+            name = self._display_name(group_ids)
+            previous = self._display.get(group)
+            if previous is not None and previous != name:
+                counts[kind][previous] = 0
+            counts[kind][name] = self._group_count(group_ids)
+            self._display[group] = name
+        for kind, kind_counts in counts.items():
+            self.vocabularies[kind].set_counts(kind_counts)
+
+    def _display_name(self, label_ids: List[int]) -> str:
+        return display_label((self._labels[label_id][1], self._counts.get(label_id, 0)) for label_id in label_ids)
+
+    def _group_count(self, label_ids: List[int]) -> int:
+        """Number of files containing any of the labels, counted chunk by chunk."""
+        if len(label_ids) == 1:
+            return self._counts.get(label_ids[0], 0)
+        merged: Dict[int, np.ndarray] = {}
+        for label_id in label_ids:
+            for chunk, bits in self._chunks.get(label_id, {}).items():
+                merged[chunk] = bits_or(merged[chunk], bits) if chunk in merged else bits
+        return sum(popcount(bits) for bits in merged.values())
+
+    def bits(self, label_id: int) -> np.ndarray:
+        """Contiguous bitset of a label, joined from its chunks on first use after a change."""
+        chunks = self._chunks.get(label_id)
+        if chunks is None:
+            return np.zeros(0, dtype=np.uint8)
+        joined = self._joined.get(label_id)
+        if joined is None or joined[0] is not chunks:
+            joined = (chunks, join_chunks(chunks))
+            self._joined[label_id] = joined
+        return joined[1]
+
+    def label_ids(self, term: str) -> List[int]:
+        """
+        Resolve a label term to label ids.
+
+        Terms match the canonical label name of any kind, or of one kind when
+        prefixed with it (`marker:LHEE`), so aliases of a label all match.
+        """
+        kinds, term = split_label_term(term)
+        return [
+            label_id
+            for kind in kinds
+            for label_id in self._by_canonical.get((kind, canonical_label(kind, term)), [])
+        ]
+
+    def group_bits(self, label_ids: Iterable[int]) -> np.ndarray:
+        """Files containing any of the labels."""
+        result = np.zeros(0, dtype=np.uint8)
+        for label_id in label_ids:
+            result = bits_or(result, self.bits(label_id))
+        return result
+
+    def term_bits(self, term: str) -> np.ndarray:
+        """Files containing any label matching the term."""
+        return self.group_bits(self.label_ids(term))
+
+    def select(
+        self,
+        all_terms: List[str],
+        any_terms: List[str],
+        none_terms: List[str]
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Evaluate label predicates.
+
+        Returns:
+            tuple: (file ids that may match or None if unrestricted,
+                    file ids that must not match or None)
+        """
+        included = None
+        for term in all_terms:
+            bits = self.term_bits(term)
+            included = bits if included is None else bits_and(included, bits)
+        if any_terms:
+            union = np.zeros(0, dtype=np.uint8)
+            for term in any_terms:
+                union = bits_or(union, self.term_bits(term))
+            included = union if included is None else bits_and(included, union)
+
+        excluded = None
+        for term in none_terms:
+            bits = self.term_bits(term)
+            excluded = bits if excluded is None else bits_or(excluded, bits)
+
+        if included is not None:
+            if excluded is not None:
+                included = bits_and_not(included, excluded)
+            return unpack_ids(included), None
+        return None, unpack_ids(excluded) if excluded is not None else None
+
+    def _matrix(self, kind: str) -> Tuple[List[str], np.ndarray]:
+        """
+        Bitsets of every canonical label group of a kind stacked into one array,
+        with the group display names (cached until the next change).
+        """
+        matrices = self._matrices
+        if kind not in matrices:
+            groups = [
+                label_ids for (label_kind, _), label_ids in list(self._by_canonical.items())
+                if label_kind == kind and any(label_id in self._chunks for label_id in label_ids)
+            ]
+            bits = [self.group_bits(label_ids) for label_ids in groups]
+            stacked = np.zeros((len(groups), max((row.size for row in bits), default=0)), dtype=np.uint8)
+            for row, group_bits in enumerate(bits):
+                stacked[row, :group_bits.size] = group_bits
+            matrices[kind] = ([self._display_name(label_ids) for label_ids in groups], stacked)
+        return matrices[kind]
+
+    def facet_counts(self, kind: str, file_ids: Optional[Iterable[int]], limit: int) -> List[dict]:
+        """
+        Count files per canonical label of a kind, optionally within a set of
+        file ids; aliases are counted together, as label filters match them.
+        """
+        names, stacked = self._matrix(kind)
+        if file_ids is not None:
+            stacked = stacked & _fit(pack_ids(file_ids), stacked.shape[1])
+        counts = popcount(stacked, axis=-1)
+        ranked = sorted(
+            ((int(count), name) for name, count in zip(names, counts) if count),
+            key=lambda item: (-item[0], item[1])
+        )
+        return [{"value": name, "count": count} for count, name in ranked[:limit]]
+
+# Process-wide index, loaded in the application lifespan
+label_index = LabelBitmapIndex()
+
+def rebuild_label_bitmaps(session: Session) -> None:
+    """Recompute every bitset chunk from the per-file label rows and commit."""
+    files_by_label: Dict[int, set] = {}
+    for model, _ in label_tables().values():
+        for label_id, file_id in session.exec(
+            select(model.label_id, model.file_id).where(model.label_id.is_not(None)).distinct()
+        ):
+            files_by_label.setdefault(label_id, set()).add(file_id)
+
+    connection = session.connection()
+    connection.execute(LabelBitmapChunk.__table__.delete())
+    rows = [
+        {"label_id": label_id, "chunk": chunk, "file_count": len(offsets),
+         "bits": _fit(pack_ids(offsets), CHUNK_BYTES).tobytes()}
+        for label_id, file_ids in files_by_label.items()
+        for chunk, offsets in split_chunks(file_ids).items()
+    ]
+    if rows:
+        connection.execute(insert(LabelBitmapChunk), rows)
+    session.commit()
+
+def stage_file_labels(session: Session, file_id: int, label_ids: Iterable[int]) -> None:
+    """Record that a file contains the given labels; applied when the session commits."""
+    pending = session.info.setdefault(_PENDING, [])
+    pending.extend((label_id, file_id, True) for label_id in set(label_ids))
+
+def stage_file_removal(session: Session, file_id: int) -> None:
+    """Record that a file no longer contains any label; call before deleting its label rows."""
+    label_ids = set()
+    for model, _ in label_tables().values():
+        label_ids.update(session.exec(
+            select(model.label_id).where(model.file_id == file_id, model.label_id.is_not(None))
+        ).all())
+    pending = session.info.setdefault(_PENDING, [])
+    pending.extend((label_id, file_id, False) for label_id in label_ids)
+
+@event.listens_for(OrmSession, "before_commit")
+def _persist_staged(session):
+    """Write staged label changes to the persisted bitsets in the committing transaction."""
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+
+    changes: Dict[int, Tuple[set, set]] = {}
+    for label_id, file_id, present in pending:
+        added, removed = changes.setdefault(label_id, (set(), set()))
+        (added if present else removed).add(file_id)
+        (removed if present else added).discard(file_id)
+
+    # Read the committed chunks inside this (write-locked) transaction so
+    # concurrent writers never overwrite each other's changes; only the
+    # chunks holding the changed files are read and rewritten
+    touched = {chunk for added, removed in changes.values() for chunk in split_chunks(added | removed)}
+    connection = session.connection()
+    stored: Dict[int, Dict[int, np.ndarray]] = {}
+    for label_id, chunk, bits in connection.execute(
+        select(LabelBitmapChunk.label_id, LabelBitmapChunk.chunk, LabelBitmapChunk.bits)
+        .where(LabelBitmapChunk.label_id.in_(changes), LabelBitmapChunk.chunk.in_(touched))
+    ):
+        stored.setdefault(label_id, {})[chunk] = np.frombuffer(bits, dtype=np.uint8)
+
+    new_chunks: Dict[int, Dict[int, np.ndarray]] = {}
+    for label_id, (added, removed) in changes.items():
+        label_stored = stored.get(label_id, {})
+        new_chunks[label_id] = apply_chunk_changes(label_stored, added, removed)
+        for chunk, bits in new_chunks[label_id].items():
+            values = {"file_count": popcount(bits), "bits": bits.tobytes()}
+            if chunk in label_stored:
+                connection.execute(
+                    update(LabelBitmapChunk)
+                    .where(LabelBitmapChunk.label_id == label_id, LabelBitmapChunk.chunk == chunk)
+                    .values(**values)
+                )
+            else:
+                connection.execute(insert(LabelBitmapChunk).values(label_id=label_id, chunk=chunk, **values))
+
+    labels = {
+        label_id: (kind, name, canonical)
+        for label_id, kind, name, canonical in connection.execute(
+            select(Label.id, Label.kind, Label.name, Label.canonical_name).where(Label.id.in_(changes))
+        )
+    }
+    session.info[_COMMITTED] = (labels, new_chunks)
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_committed(session):
+    """Apply committed label changes to the in-memory index."""
+    committed = session.info.pop(_COMMITTED, None)
+    if committed and label_index.loaded:
+        label_index.apply(*committed)
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_staged(session):
+    """Rolled-back label changes never reach the index."""
+    session.info.pop(_PENDING, None)
+    session.info.pop(_COMMITTED, None)
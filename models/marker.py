@@ -3,6 +3,7 @@ Marker models for database storage and API responses.
 """
 from typing import TYPE_CHECKING
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 
 if TYPE_CHECKING:
     from .c3d_file import C3DFile
@@ -10,13 +11,27 @@ if TYPE_CHECKING:
 class MarkerBase(SQLModel):
     """Base model for marker data."""
     marker_name: str
+    # Quality statistics computed at ingest (see signal_stats.marker_quality)
+    coverage: float | None = None  # Percent of frames with a valid position
+    gap_count: int | None = None
+    longest_gap: int | None = None  # Frames
+    mean_residual: float | None = None
 
 class Marker(MarkerBase, table=True):
     """Database model for marker metadata."""
+    __table_args__ = (
+        # Label -> files lookups for label filters
+        Index("ix_marker_label_file", "label_id", "file_id"),
+        # Per-marker coverage filters such as RHEE:coverage>=98
+        Index("ix_marker_label_coverage", "label_id", "coverage"),
+    )
+    
     id: int | None = Field(default=None, primary_key=True)
-    file_id: int = Field(foreign_key="c3d_files.id")
+    file_id: int = Field(foreign_key="c3d_files.id", index=True)
+    label_id: int | None = Field(default=None, foreign_key="label.id")
     c3d_files: "C3DFile" = Relationship(back_populates="markers")
 
 class MarkerRead(MarkerBase):
     """API response model for marker data."""
-    pass
\ No newline at end of file
+    pass
+
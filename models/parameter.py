@@ -0,0 +1,242 @@
+"""
+Structured, deduplicated storage for C3D parameters.
+
+Each C3D parameter group (POINT, ANALOG, FORCE_PLATFORM, ...) is stored once
+per distinct content: files reference groups through a link table, so
+identical groups such as a shared force plate calibration are kept a single
+time. Scalar values are also copied into typed, indexed columns so filters
+like `ANALOG:RATE=1000` are index lookups instead of JSON scans.
+"""
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from sqlmodel import SQLModel, Field, Session, Column, JSON, select, delete
+from sqlalchemy import Index
+
+class ParameterGroup(SQLModel, table=True):
+    """Database model for a distinct C3D parameter group."""
+    __tablename__ = "parameter_group"
+
+    id: int | None = Field(default=None, primary_key=True)
+    group_name: str = Field(index=True)
+    description: str = ""
+    content_hash: str = Field(unique=True)  # SHA-256 of the canonical group content
+
+class Parameter(SQLModel, table=True):
+    """Database model for a single typed C3D parameter within a group."""
+    __tablename__ = "parameter"
+    __table_args__ = (
+        Index("ix_parameter_name_num", "name", "value_num"),
+        Index("ix_parameter_name_text", "name", "value_text"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    parameter_group_id: int = Field(foreign_key="parameter_group.id", index=True)
+    name: str
+    dtype: str  # "int", "float", "bool" or "str"
+    description: str = ""
+    value: Any = Field(default=None, sa_column=Column(JSON))  # Full value, nested lists for arrays
+    value_num: Optional[float] = None  # Set for single-element numeric values
+    value_text: Optional[str] = None  # Set for single-element string values
+
+class C3DFileParameterGroup(SQLModel, table=True):
+    """Link table between C3D files and the parameter groups they contain."""
+    __tablename__ = "c3d_file_parameter_group"
+    __table_args__ = (
+        Index("ix_c3d_file_parameter_group_group_file", "parameter_group_id", "file_id"),
+    )
+
+    file_id: int = Field(foreign_key="c3d_files.id", primary_key=True)
+    parameter_group_id: int = Field(foreign_key="parameter_group.id", primary_key=True)
+
+class ParameterRead(SQLModel):
+    """API response model for a parameter and the group it belongs to."""
+    group_name: str
+    name: str
+    dtype: str
+    description: str
+    value: Any
+
+# Comparison operators accepted in parameter filters, longest first
+PARAMETER_OPERATORS = (">=", "<=", "!=", "=", ">", "<")
+_PARAMETER_FILTER = re.compile(
+    r"^\s*([^:\s]+)\s*:\s*([^=<>!\s]+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$"
+)
+
+def convert_parameters(parameters) -> Dict[str, Dict[str, Any]]:
+    """
+    Convert an ezc3d parameter tree into plain, JSON-serializable groups.
+
+    Returns:
+        dict: group name -> {"description": str, "parameters": {name: (dtype, description, value)}}
+    """
+    groups = {}
+    for group_name, group_data in parameters.items():
+        if group_name.startswith("__") or not isinstance(group_data, dict):
+            continue
+        group_meta = group_data.get("__METADATA__", {})
+        params = {}
+        for param_name, param_data in group_data.items():
+            if param_name.startswith("__") or "value" not in param_data:
+                continue
+            value = param_data["value"]
+            if hasattr(value, "tolist"):
+                kind = value.dtype.kind
+                dtype = "int" if kind in "iu" else "float" if kind == "f" else "bool" if kind == "b" else "str"
+                value = value.tolist()
+            else:
+                dtype = "str"
+                value = [str(v).strip() for v in value]
+            params[param_name] = (dtype, param_data.get("description", ""), value)
+        groups[group_name] = {
+            "description": group_meta.get("DESCRIPTION", ""),
+            "parameters": params,
+        }
+    return groups
+
+def content_hash(group_name: str, group: Dict[str, Any]) -> str:
+    """Hash a converted parameter group so identical groups share one row."""
+    canonical = json.dumps(
+        [group_name, group["description"], sorted(group["parameters"].items())],
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _scalar(dtype: str, value: Any) -> Tuple[Optional[float], Optional[str]]:
+    """Return the (numeric, text) scalar columns for a single-element value."""
+    if isinstance(value, list):
+        if len(value) != 1:
+            return None, None
+        value = value[0]
+    if isinstance(value, list):
+        return None, None
+    if dtype == "str":
+        return None, str(value)
+    try:
+        return float(value), None
+    except (TypeError, ValueError):
+        return None, None
+
+class ParameterStore:
+    """
+    In-memory map of group content hash to parameter group id used while ingesting files.
+
+    Groups missing from the database are inserted on first use; call `clear()`
+    after a rollback so ids from the discarded transaction are not reused.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+
+    def resolve(self, session: Session, group_name: str, group: Dict[str, Any]) -> int:
+        """Return the id of a parameter group with this content, creating it if needed."""
+        digest = content_hash(group_name, group)
+        group_id = self._ids.get(digest)
+        if group_id is not None:
+            return group_id
+
+        db_group = session.exec(
+            select(ParameterGroup).where(ParameterGroup.content_hash == digest)
+        ).first()
+        if not db_group:
+            db_group = ParameterGroup(
+                group_name=group_name,
+                description=group["description"],
+                content_hash=digest
+            )
+            session.add(db_group)
+            session.flush()  # Assign the group id
+            for name, (dtype, description, value) in group["parameters"].items():
+                value_num, value_text = _scalar(dtype, value)
+                session.add(Parameter(
+                    parameter_group_id=db_group.id,
+                    name=name,
+                    dtype=dtype,
+                    description=description,
+                    value=value,
+                    value_num=value_num,
+                    value_text=value_text
+                ))
+
+        self._ids[digest] = db_group.id
+        return db_group.id
+
+    def link_file(self, session: Session, file_id: int, groups: Dict[str, Dict[str, Any]]) -> None:
+        """Attach the converted parameter groups of a file. Caller commits."""
+        group_ids = {self.resolve(session, name, group) for name, group in groups.items()}
+        for group_id in group_ids:
+            session.add(C3DFileParameterGroup(file_id=file_id, parameter_group_id=group_id))
+
+    def clear(self) -> None:
+        """Forget all cached ids."""
+        self._ids.clear()
+
+def remove_file_parameters(session: Session, file_id: int) -> None:
+    """Unlink a file's parameter groups and drop groups no other file uses. Caller commits."""
+    session.exec(delete(C3DFileParameterGroup).where(C3DFileParameterGroup.file_id == file_id))
+    orphaned = select(ParameterGroup.id).where(
+        ParameterGroup.id.not_in(select(C3DFileParameterGroup.parameter_group_id))
+    )
+    session.exec(delete(Parameter).where(Parameter.parameter_group_id.in_(orphaned)))
+    session.exec(delete(ParameterGroup).where(ParameterGroup.id.in_(orphaned)))
+
+def file_parameters(session: Session, file_id: int) -> List[Tuple[str, Parameter]]:
+    """Load every (group name, parameter) pair of a file."""
+    return session.exec(
+        select(ParameterGroup.group_name, Parameter)
+        .join(Parameter, Parameter.parameter_group_id == ParameterGroup.id)
+        .join(C3DFileParameterGroup, C3DFileParameterGroup.parameter_group_id == ParameterGroup.id)
+        .where(C3DFileParameterGroup.file_id == file_id)
+        .order_by(ParameterGroup.group_name, Parameter.name)
+    ).all()
+
+def parse_parameter_filter(expression: str) -> Tuple[str, str, str, str]:
+    """
+    Split a filter such as `ANALOG:RATE=1000` into (group, name, operator, value).
+
+    Raises:
+        ValueError: If the expression is not of the form GROUP:NAME<op>VALUE
+    """
+    match = _PARAMETER_FILTER.match(expression)
+    if not match:
+        raise ValueError(
+            f"Invalid parameter filter '{expression}', expected GROUP:NAME<op>VALUE "
+            f"with one of {', '.join(PARAMETER_OPERATORS)}"
+        )
+    group_name, name, operator, value = match.groups()
+    return group_name.upper(), name.upper(), operator, value
+
+def matching_parameter_file_ids(expression: str):
+    """
+    Select the ids of files whose parameter matches a filter expression.
+
+    Numeric values compare against the indexed numeric column; anything else
+    compares as text (only `=` and `!=`). Only single-element parameters match.
+    """
+    group_name, name, operator, value = parse_parameter_filter(expression)
+    try:
+        column, operand = Parameter.value_num, float(value)
+    except ValueError:
+        if operator not in ("=", "!="):
+            raise ValueError(f"Operator '{operator}' requires a numeric value in '{expression}'")
+        column, operand = Parameter.value_text, value
+
+    comparisons = {
+        "=": column == operand,
+        "!=": column != operand,
+        ">": column > operand,
+        "<": column < operand,
+        ">=": column >= operand,
+        "<=": column <= operand,
+    }
+    return (
+        select(C3DFileParameterGroup.file_id)
+        .join(ParameterGroup, ParameterGroup.id == C3DFileParameterGroup.parameter_group_id)
+        .join(Parameter, Parameter.parameter_group_id == ParameterGroup.id)
+        .where(
+            ParameterGroup.group_name == group_name,
+            Parameter.name == name,
+            comparisons[operator]
+        )
+    )
@@ -1,7 +1,105 @@
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from functools import cached_property
 import numpy as np
 import plotly.graph_objects as go
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Sequence
+from sqlmodel import SQLModel, Field
+
+class PlotRequest(SQLModel):
+    """One plot of a batch: a plot class name and its parameters."""
+    plot_name: str
+    parameters: Dict[str, Any] = Field(default_factory=dict)
+
+class PlotBatchRequest(SQLModel):
+    """Request model for rendering several plots for several files at once."""
+    file_ids: List[int]
+    plots: List[PlotRequest]
+
+class SeriesMap(Mapping):
+    """
+    Read-only map from a label to a NumPy view of its series.
+
+    The label-to-index map is built once; a series is sliced from the
+    decoded array only when a plot asks for it, without copying.
+    """
+
+    def __init__(self, labels: Sequence[str], view):
+        self._index = {label: index for index, label in enumerate(labels)}
+        self._view = view
+
+    def __getitem__(self, label: str):
+        return self._view(self._index[label])
+
+    def __contains__(self, label) -> bool:
+        return label in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+class PlotData(Mapping):
+    """
+    Plot input for one decoded trial, as documented on `BasePlot.plot`.
+
+    `marker_data[name]` maps 'x', 'y' and 'z' to views of the (frames,
+    markers, 3) point array and `channel_data[name]` is a view of the
+    (samples, channels) analog array. Time vectors are computed on first use.
+    """
+    KEYS = ('time_points', 'analog_time_points', 'marker_data', 'channel_data', 'frame_rate', 'analog_rate')
+
+    def __init__(
+        self,
+        points: np.ndarray,
+        marker_labels: Sequence[str],
+        frame_rate: float,
+        analogs: np.ndarray,
+        channel_labels: Sequence[str],
+        analog_rate: float
+    ):
+        self.points = points
+        self.analogs = analogs
+        self.frame_rate = frame_rate
+        self.analog_rate = analog_rate
+        self.marker_data = SeriesMap(marker_labels, self._marker)
+        self.channel_data = SeriesMap(channel_labels, lambda index: self.analogs[:, index])
+
+    @classmethod
+    def from_trial(cls, trial) -> "PlotData":
+        """Wrap a `c3d_loader.TrialData` without copying its arrays."""
+        return cls(
+            trial.points, trial.marker_labels, trial.point_rate,
+            trial.analogs, trial.channel_labels, trial.analog_rate
+        )
+
+    def _marker(self, index: int) -> Dict[str, np.ndarray]:
+        return {axis: self.points[:, index, column] for column, axis in enumerate('xyz')}
+
+    @cached_property
+    def time_points(self) -> np.ndarray:
+        """Time of each point frame in seconds."""
+        return _time_vector(self.points.shape[0], self.frame_rate)
+
+    @cached_property
+    def analog_time_points(self) -> np.ndarray:
+        """Time of each analog sample in seconds."""
+        return _time_vector(self.analogs.shape[0], self.analog_rate)
+
+    def __getitem__(self, key: str):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+def _time_vector(count: int, rate: float) -> np.ndarray:
+    return np.arange(count) / rate if rate else np.zeros(0)
 
 class BasePlot(ABC):
     """Base class for all plotting implementations."""
@@ -18,10 +116,11 @@ class BasePlot(ABC):
         """Generate plot data from C3D file data.
         
         Args:
-            c3d_data: Dictionary containing the C3D file data with keys:
-                - time_points: List of time points
-                - marker_data: Dictionary of marker data
-                - channel_data: Dictionary of channel data
+            c3d_data: Mapping (a `PlotData`) containing the C3D file data with keys:
+                - time_points: Time of each point frame (NumPy array)
+                - analog_time_points: Time of each analog sample (NumPy array)
+                - marker_data: Marker name -> {'x', 'y', 'z'} NumPy views
+                - channel_data: Channel name -> NumPy view
                 - frame_rate: Frame rate of the data
                 - analog_rate: Analog data rate
         
@@ -93,7 +192,7 @@ class AnalogChannelPlot(BasePlot):
         trace_list = []
         
         selected_channels = self.parameters.get('channels', [])
-        time_points = c3d_data.get('time_points', [])
+        time_points = c3d_data.get('analog_time_points', c3d_data.get('time_points', []))
         
         for channel_name in selected_channels:
             if channel_name in c3d_data['channel_data']:
@@ -32,6 +32,15 @@ class FileQuery(BaseModel):
     event_regex: bool = False
     analysis_name: str | None = None
     analysis_params: dict[str, Any] | None = None
+    classification_id: int | None = None
+    subject_id: int | None = None
+    session_id: int | None = None
+    parameter: str | None = None  # C3D parameter filter, e.g. "ANALOG:RATE=1000"
+    marker_quality: str | None = None  # Comma-separated marker statistic filters, e.g. "RHEE:coverage>=98"
+    channel_stats: str | None = None  # Comma-separated analog channel statistic filters, e.g. "Force.Fz1:maximum>800"
+    labels_all: str | None = None  # Comma-separated labels every file must contain
+    labels_any: str | None = None  # ... at least one of which a file must contain
+    labels_none: str | None = None  # ... none of which a file may contain
 
 class SearchQuery(BaseModel):
     """Model for advanced search queries."""
@@ -53,6 +62,59 @@ class SearchQuery(BaseModel):
     # Analysis filters
     analysis_name: str | None = None
     analysis_params: dict[str, Any] | None = None
+    
+    # Hierarchy scopes (resolved through the closure table)
+    classification_id: int | None = None
+    subject_id: int | None = None
+    session_id: int | None = None
+    
+    # C3D parameter filter, e.g. "ANALOG:RATE=1000"
+    parameter: str | None = None
+    
+    # Marker quality filters, comma-separated (e.g. "RHEE:coverage>=98,LHEE:longest_gap<=10")
+    marker_quality: str | None = None
+    
+    # Analog channel statistic filters, comma-separated (e.g. "Force.Fz1:maximum>800,EMG1:saturation_count>0")
+    channel_stats: str | None = None
+    
+    # Label presence sets, comma-separated (e.g. "LHEE,RHEE,channel:Force.Fz1")
+    labels_all: str | None = None
+    labels_any: str | None = None
+    labels_none: str | None = None
+    
+    def to_file_query(self) -> FileQuery:
+        """Flatten the regex fields into the equivalent FileQuery."""
+        return FileQuery(
+            filename=self.filename.value,
+            filename_regex=self.filename.use_regex,
+            classification=self.classification.value,
+            classification_regex=self.classification.use_regex,
+            subject=self.subject.value,
+            subject_regex=self.subject.use_regex,
+            session_name=self.session_name.value,
+            session_regex=self.session_name.use_regex,
+            min_duration=self.min_duration,
+            max_duration=self.max_duration,
+            min_frame_count=self.min_frame_count,
+            max_frame_count=self.max_frame_count,
+            marker=self.marker.value,
+            marker_regex=self.marker.use_regex,
+            channel=self.channel.value,
+            channel_regex=self.channel.use_regex,
+            event=self.event.value,
+            event_regex=self.event.use_regex,
+            analysis_name=self.analysis_name,
+            analysis_params=self.analysis_params,
+            classification_id=self.classification_id,
+            subject_id=self.subject_id,
+            session_id=self.session_id,
+            parameter=self.parameter,
+            marker_quality=self.marker_quality,
+            channel_stats=self.channel_stats,
+            labels_all=self.labels_all,
+            labels_any=self.labels_any,
+            labels_none=self.labels_none
+        )
 
 class SearchResult(BaseModel):
     """Model for search results."""
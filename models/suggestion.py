@@ -0,0 +1,115 @@
+"""
+Prefix completion over label and subject vocabularies.
+
+`PrefixIndex` keeps the distinct names of one vocabulary sorted by their
+normalized form, so a prefix maps to a contiguous slice found with two
+binary searches; the slice is ranked by how many files use each name.
+
+Label vocabularies are maintained by the label bitmap index (label_index.py).
+Subject names are counted here: inserted, deleted and renamed C3D files are
+tracked at flush time and applied to the index once the session commits.
+"""
+import heapq
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select, func
+from .label import normalize_label
+
+# Key in Session.info for subject count changes awaiting commit
+_SUBJECT_CHANGES = "suggestion_subject_changes"
+
+class PrefixIndex:
+    """Sorted vocabulary with a file count per name, for prefix completion."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: List[Tuple[str, str]] = []  # (normalized name, name), sorted
+        self._counts: Dict[str, int] = {}
+
+    def set_counts(self, counts: Dict[str, int]) -> None:
+        """Set the count of each name; names with a count of zero are removed."""
+        with self._lock:
+            self._set_counts(counts)
+
+    def add_counts(self, deltas: Dict[str, int]) -> None:
+        """Add to the count of each name."""
+        with self._lock:
+            self._set_counts({name: self._counts.get(name, 0) + delta for name, delta in deltas.items()})
+
+    def _set_counts(self, counts: Dict[str, int]) -> None:
+        for name, count in counts.items():
+            key = (normalize_label(name), name)
+            if count > 0:
+                if name not in self._counts:
+                    insort(self._keys, key)
+                self._counts[name] = count
+            elif name in self._counts:
+                del self._counts[name]
+                del self._keys[bisect_left(self._keys, key)]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Most frequent names starting with `prefix` (case-insensitive)."""
+        prefix = normalize_label(prefix)
+        with self._lock:
+            start = bisect_left(self._keys, (prefix,))
+            end = bisect_left(self._keys, (prefix + "\U0010ffff",))
+            ranked = heapq.nsmallest(
+                limit,
+                ((-self._counts[name], name) for _, name in self._keys[start:end])
+            )
+        return [{"value": name, "count": -count} for count, name in ranked]
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+# Process-wide subject vocabulary, loaded in the application lifespan
+subject_index = PrefixIndex()
+
+def load_subject_index(session: Session) -> None:
+    """Count files per subject name."""
+    from .c3d_file import C3DFile
+    subject_index.set_counts(dict(session.exec(
+        select(C3DFile.subject_name, func.count())
+        .where(C3DFile.subject_name.is_not(None), C3DFile.subject_name != "")
+        .group_by(C3DFile.subject_name)
+    ).all()))
+
+@event.listens_for(OrmSession, "after_flush")
+def _track_subjects(session, flush_context):
+    """Record subject name changes of flushed C3D files."""
+    from .c3d_file import C3DFile
+    changes = session.info.setdefault(_SUBJECT_CHANGES, {})
+
+    def count(name, delta):
+        if name:
+            changes[name] = changes.get(name, 0) + delta
+
+    for obj in session.new:
+        if isinstance(obj, C3DFile):
+            count(obj.subject_name, 1)
+    for obj in session.deleted:
+        if isinstance(obj, C3DFile):
+            count(obj.subject_name, -1)
+    for obj in session.dirty:
+        if isinstance(obj, C3DFile):
+            history = inspect(obj).attrs.subject_name.history
+            if history.has_changes():
+                for name in history.deleted:
+                    count(name, -1)
+                for name in history.added:
+                    count(name, 1)
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_subjects(session):
+    """Apply committed subject count changes to the index."""
+    changes = session.info.pop(_SUBJECT_CHANGES, None)
+    if changes:
+        subject_index.add_counts(changes)
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_subjects(session):
+    """Rolled-back changes never reach the index."""
+    session.info.pop(_SUBJECT_CHANGES, None)
@@ -1,21 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlmodel import Session
 from typing import Any
+from concurrent.futures import CancelledError
 from models.analysis import Analysis
 from models.c3d_file import C3DFile  # Add missing import
 from app import load_analyses, get_db_session
-import ezc3d
+from workers import client_disconnected, run_analysis_in_worker
 
 router = APIRouter()
 
 @router.post("/files/{file_id}/analyze/{analysis_name}")
 def run_analysis(
+    request: Request,
     file_id: int,
     analysis_name: str,
     parameters: dict[str, Any],
     session: Session = Depends(get_db_session)
 ):
-    """Run a specific analysis on a file"""
+    """
+    Run a specific analysis on a file.
+
+    The analysis runs in a worker process; it is abandoned with 504 after
+    ANALYSIS_TIMEOUT seconds or when the client disconnects.
+    """
     
     # Get available analyses
     analyses = load_analyses()
@@ -32,9 +39,13 @@ def run_analysis(
         analysis_class = analyses[analysis_name]
         analysis = analysis_class(parameters=parameters)
         
-        # Load C3D file and run analysis
-        c3d = ezc3d.c3d(file.filepath)
-        result = analysis.analyze(c3d)
+        # Load C3D file and run analysis off the request thread
+        result = run_analysis_in_worker(
+            analysis_class,
+            parameters,
+            file.filepath,
+            is_cancelled=client_disconnected(request)
+        )
         
         # Store results
         db_result = Analysis(
@@ -53,6 +64,10 @@ def run_analysis(
         
         return result
         
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=f"Analysis timed out: {str(e)}")
+    except CancelledError:
+        raise HTTPException(status_code=499, detail="Client disconnected")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Analysis failed: {str(e)}")
 
@@ -0,0 +1,62 @@
+"""
+Router for the gait cycle index.
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from pydantic import TypeAdapter
+from sqlmodel import Session, select
+from dependencies import get_db_session
+from models.base import GroupFileLink
+from models.gait_cycle import GaitCycle, GaitCycleRead
+from serialization import validated_response
+
+router = APIRouter(
+    prefix="/cycles",
+    tags=["cycles"],
+)
+
+CYCLE_LIST_ADAPTER = TypeAdapter(List[GaitCycleRead])
+
+def cycle_filters(
+    file_id: Optional[int] = None,
+    group_id: Optional[int] = None,
+    side: Optional[str] = None,
+    min_stance: Optional[float] = None,
+    max_stance: Optional[float] = None
+) -> list:
+    """Criteria selecting gait cycles by file, group, side and stance fraction."""
+    filters = []
+    if file_id is not None:
+        filters.append(GaitCycle.file_id == file_id)
+    if group_id is not None:
+        filters.append(GaitCycle.file_id.in_(
+            select(GroupFileLink.file_id).where(GroupFileLink.group_id == group_id)
+        ))
+    if side:
+        filters.append(GaitCycle.side == side.strip().casefold())
+    if min_stance is not None:
+        filters.append(GaitCycle.stance_fraction >= min_stance)
+    if max_stance is not None:
+        filters.append(GaitCycle.stance_fraction <= max_stance)
+    return filters
+
+@router.get("/", response_model=List[GaitCycleRead])
+def get_cycles(
+    file_id: Optional[int] = None,
+    group_id: Optional[int] = None,
+    side: Optional[str] = Query(None, description="Event context, e.g. Left or Right"),
+    min_stance: Optional[float] = Query(None, ge=0, le=1, description="Minimum stance fraction"),
+    max_stance: Optional[float] = Query(None, ge=0, le=1, description="Maximum stance fraction"),
+    skip: int = 0,
+    limit: int = Query(1000, ge=1, le=100000),
+    session: Session = Depends(get_db_session)
+):
+    """List gait cycles (foot strike to foot strike of one side) indexed at ingest."""
+    cycles = session.exec(
+        select(GaitCycle)
+        .where(*cycle_filters(file_id, group_id, side, min_stance, max_stance))
+        .order_by(GaitCycle.file_id, GaitCycle.side, GaitCycle.start_frame)
+        .offset(skip)
+        .limit(limit)
+    ).all()
+    return validated_response(CYCLE_LIST_ADAPTER, cycles)
@@ -0,0 +1,115 @@
+"""
+Router for binary time-series slices of C3D files.
+
+Remote clients download only the markers, channels and frames they need,
+as NumPy `.npz` or raw little-endian float32 with a JSON header, instead of
+the whole C3D file.
+"""
+import io
+import json
+import os
+import struct
+from typing import Optional
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlmodel import Session
+from app import get_db_session
+from caching import file_etag, is_not_modified
+from c3d_loader import load_trial
+from models.c3d_file import C3DFile
+from routers.search import split_names
+
+router = APIRouter(
+    tags=["data"],
+)
+
+DATA_FORMATS = ("npz", "f32")
+
+@router.get("/files/{file_id:int}/data")
+def get_file_data(
+    request: Request,
+    file_id: int,
+    markers: Optional[str] = Query(None, description="Comma-separated marker labels (default all, empty for none)"),
+    channels: Optional[str] = Query(None, description="Comma-separated analog channel labels (default all, empty for none)"),
+    start_frame: Optional[int] = Query(None, ge=0, description="First frame (0-based, inclusive)"),
+    end_frame: Optional[int] = Query(None, ge=0, description="Last frame (exclusive)"),
+    start_time: Optional[float] = Query(None, ge=0, description="Start time in seconds (if start_frame is not given)"),
+    end_time: Optional[float] = Query(None, ge=0, description="End time in seconds (if end_frame is not given)"),
+    format: str = Query("npz", description="npz or f32"),
+    session: Session = Depends(get_db_session)
+):
+    """
+    Return selected markers and analog channels over a frame or time range.
+
+    `npz` holds `points` (frames, markers, 3), `analogs` (samples, channels),
+    `marker_labels`, `channel_labels`, `point_rate`, `analog_rate` and
+    `start_frame`. `f32` is a 4-byte little-endian header length, a JSON
+    header with the same metadata and shapes, then the points and analogs as
+    contiguous little-endian float32.
+    """
+    if format not in DATA_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Available formats: {', '.join(DATA_FORMATS)}")
+
+    file = session.get(C3DFile, file_id)
+    if not file:
+        raise HTTPException(status_code=404, detail=f"File with id {file_id} not found")
+    if not os.path.exists(file.filepath):
+        raise HTTPException(status_code=404, detail=f"File not found at {file.filepath}")
+
+    # The payload only depends on the file content and the selection
+    etag = file_etag(file.filepath, request.url.query)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    try:
+        trial = load_trial(file.filepath)
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=f"Timed out reading C3D file: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading C3D file: {str(e)}")
+
+    start, end = trial.frame_range(start_frame, end_frame, start_time, end_time)
+    marker_names = split_names(markers) if markers is not None else list(trial.marker_labels)
+    channel_names = split_names(channels) if channels is not None else list(trial.channel_labels)
+    try:
+        points, analogs = trial.slice(marker_names, channel_names, start, end)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown markers or channels: {e.args[0]}")
+
+    metadata = {
+        "marker_labels": marker_names,
+        "channel_labels": channel_names,
+        "point_rate": trial.point_rate,
+        "analog_rate": trial.analog_rate,
+        "start_frame": start,
+    }
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if format == "npz":
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            points=points,
+            analogs=analogs,
+            marker_labels=np.array(marker_names, dtype=str),
+            channel_labels=np.array(channel_names, dtype=str),
+            point_rate=np.float64(trial.point_rate),
+            analog_rate=np.float64(trial.analog_rate),
+            start_frame=np.int64(start)
+        )
+        headers["Content-Disposition"] = f'attachment; filename="{os.path.splitext(file.filename)[0]}.npz"'
+        return Response(buffer.getvalue(), media_type="application/octet-stream", headers=headers)
+
+    header = json.dumps({
+        **metadata,
+        "dtype": "<f4",
+        "points_shape": list(points.shape),
+        "analogs_shape": list(analogs.shape),
+    }).encode()
+    body = b"".join([
+        struct.pack("<I", len(header)),
+        header,
+        points.astype("<f4", copy=False).tobytes(),
+        analogs.astype("<f4", copy=False).tobytes(),
+    ])
+    return Response(body, media_type="application/octet-stream", headers=headers)
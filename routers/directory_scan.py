@@ -8,6 +8,7 @@ from models.c3d_file import C3DFile
 from models.marker import Marker
 from models.channel import AnalogChannel
 from models.event import Event
+from models.gait_cycle import GaitCycle, compute_gait_cycles
 from app import DATABASE_URL
 from models.analysis import C3DDataExtractor, Analysis
 # Import hierarchy models
@@ -17,6 +18,11 @@ from models.hierarchy import (
     Session as SessionModel, SessionCreate,
     Trial, TrialCreate
 )
+from models.closure import index_trial
+from models.label import LabelCache
+from models.label_index import stage_file_labels
+from models.parameter import ParameterStore
+from routers.groups import refresh_smart_groups
 
 router = APIRouter()
 
@@ -43,8 +49,14 @@ def scan_directory_background(root_directory: str):
     # Create a new session specifically for the background task
     with Session(background_engine) as session:
         indexed_files = []
+        indexed_file_ids = []
         skipped_files = []
         
+        # Interned label ids, shared across all files in this scan
+        label_cache = LabelCache()
+        # Deduplicated parameter group ids, shared across all files in this scan
+        parameter_store = ParameterStore()
+        
         # File processing timeout (10 seconds per file)
         file_timeout = 10  
         
@@ -112,31 +124,6 @@ def scan_directory_background(root_directory: str):
                         elif len(path_parts) == 1 and path_parts[0] != '.':
                             classification_name = path_parts[0]
                         
-                        # --- Convert ezc3d Parameters to Dict --- 
-                        metadata_dict = {}
-                        if "metadata" in c3d_data and hasattr(c3d_data["metadata"], 'groups'):
-                            try:
-                                for group_name, group_data in c3d_data["metadata"].groups():
-                                    metadata_dict[group_name] = {}
-                                    if hasattr(group_data, 'parameters'):
-                                        for param_name, param_data in group_data.parameters():
-                                            # Attempt to get serializable value, handle potential issues
-                                            try:
-                                                value = param_data.values
-                                                # Basic check for numpy arrays or other non-serializable types
-                                                if hasattr(value, 'tolist'): 
-                                                    value = value.tolist()
-                                                elif isinstance(value, (int, float, str, bool, list, dict, type(None))):
-                                                    pass # Already serializable
-                                                else:
-                                                    value = str(value) # Fallback to string representation
-                                                metadata_dict[group_name][param_name] = value
-                                            except Exception as param_err:
-                                                metadata_dict[group_name][param_name] = f"Error serializing"
-                            except Exception:
-                                 pass
-                        # --- End Conversion ---
-
                         # Create database entry with id as primary key and filepath as unique identifier
                         db_file = C3DFile(
                             filename=file,
@@ -151,7 +138,6 @@ def scan_directory_background(root_directory: str):
                             subject_name=subject_name,
                             classification=classification_name,
                             session_name=session_name,
-                            file_metadata=metadata_dict, # Use the converted dict
                             has_marker_data=bool(c3d_data["markers"]),
                             has_analog_data=bool(c3d_data["channels"]),
                             has_event_data=bool(c3d_data["events"])
@@ -164,30 +150,55 @@ def scan_directory_background(root_directory: str):
                             session.refresh(db_file)  # Refresh to get the assigned id
                             
                             # Add markers using the file id
-                            for marker_name in c3d_data["markers"]:
+                            for marker_name, quality in zip(c3d_data["markers"], c3d_data["marker_quality"]):
                                 marker = Marker(
                                     file_id=db_file.id,  # Use id instead of filepath
-                                    marker_name=marker_name
+                                    marker_name=marker_name,
+                                    label_id=label_cache.resolve(session, "marker", marker_name),
+                                    **quality
                                 )
                                 session.add(marker)
                             
                             # Add channels using the file id
-                            for channel_name in c3d_data["channels"]:
+                            for channel_name, stats in zip(c3d_data["channels"], c3d_data["channel_stats"]):
                                 channel = AnalogChannel(
                                     file_id=db_file.id,  # Use id instead of filepath
-                                    channel_name=channel_name
+                                    channel_name=channel_name,
+                                    label_id=label_cache.resolve(session, "channel", channel_name),
+                                    **stats
                                 )
                                 session.add(channel)
                             
                             # Add events using the file id
-                            for event_name, event_time in c3d_data["events"]:
+                            for event_data in c3d_data["events"]:
                                 event = Event(
                                     file_id=db_file.id,  # Use id instead of filepath
-                                    event_name=event_name,
-                                    event_time=event_time
+                                    event_name=event_data["name"],
+                                    event_time=event_data["time"],
+                                    context=event_data["context"],
+                                    event_frame=event_data["frame"],
+                                    label_id=label_cache.resolve(session, "event", event_data["name"])
                                 )
                                 session.add(event)
                             
+                            # Index foot strike to foot strike cycles per side
+                            for cycle in compute_gait_cycles(c3d_data["events"]):
+                                session.add(GaitCycle(file_id=db_file.id, **cycle))
+                            
+                            # Set the file's bits in the label bitmap index when this commits
+                            stage_file_labels(session, db_file.id, [
+                                label_cache.resolve(session, kind, name)
+                                for kind, names in (
+                                    ("marker", c3d_data["markers"]),
+                                    ("channel", c3d_data["channels"]),
+                                    ("event", [event_data["name"] for event_data in c3d_data["events"]]),
+                                )
+                                for name in names
+                            ])
+                            
+                            # Link the file to its (deduplicated) parameter groups
+                            parameter_store.link_file(session, db_file.id, c3d_data["parameters"])
+                            
                             # Now create or get the classification > subject > session > trial hierarchy
                             
                             # 1. Find or create Classification
@@ -247,6 +258,8 @@ def scan_directory_background(root_directory: str):
                                 results={}
                             )
                             session.add(trial)
+                            session.flush()  # Assign the trial id for the closure rows
+                            index_trial(session, trial)
                             
                             # Apply selected analyses to the C3D file
                             selected_analyses = session.exec(select(Analysis).where(Analysis.file_id == db_file.id)).all()
@@ -268,15 +281,22 @@ def scan_directory_background(root_directory: str):
                             session.commit()
                             
                             indexed_files.append(file)
+                            indexed_file_ids.append(db_file.id)
                             files_processed += 1
                             
                         except Exception as e:
                             # Handle unique constraint violations (file already exists)
                             session.rollback()
+                            label_cache.clear()  # Labels created in the rolled-back transaction are gone
+                            parameter_store.clear()
                             skipped_files.append(file)
                         
                     except Exception as e:
                         # Skip problematic files but continue
                         skipped_files.append(file)
         
+        # Check only the newly indexed files against each smart group's saved query
+        refresh_smart_groups(session, indexed_file_ids)
+        session.commit()
+        
         print(f"Indexed {len(indexed_files)} files, skipped {len(skipped_files)} files")
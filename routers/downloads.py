@@ -0,0 +1,140 @@
+"""
+Router for downloading original C3D files.
+
+Single files are served with `FileResponse`, which supports `Range` requests
+(resumable and parallel downloads) and streams the file in fixed-size chunks.
+Groups and search results are streamed as an uncompressed zip built on the
+fly: each member is copied from disk in chunks straight into the response,
+so no temporary archive is written and server memory stays flat however
+large the cohort.
+"""
+import os
+import zipfile
+from typing import Iterable, Iterator, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlmodel import Session, select
+from app import get_db_session
+from caching import is_not_modified
+from models.base import GroupFileLink
+from models.c3d_file import C3DFile
+from models.group import TrialGroup
+from models.search import FileQuery
+from routers.export import iter_file_batches
+from routers.search import build_file_filters, file_query_params
+from serialization import ChunkSink
+
+router = APIRouter(
+    tags=["downloads"],
+)
+
+# Bytes read from disk per write into a zip member
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# Columns needed to place a file in an archive
+ARCHIVE_COLUMNS = ["id", "filepath", "filename", "classification", "subject_name", "session_name"]
+
+@router.api_route("/files/{file_id:int}/download", methods=["GET", "HEAD"])
+def download_file(
+    request: Request,
+    file_id: int,
+    session: Session = Depends(get_db_session)
+):
+    """
+    Download the original C3D file.
+
+    Supports `Range`/`If-Range` for resuming and `If-None-Match` against an
+    ETag derived from the file's size and modification time.
+    """
+    file = session.get(C3DFile, file_id)
+    if not file:
+        raise HTTPException(status_code=404, detail=f"File with id {file_id} not found")
+    if not os.path.exists(file.filepath):
+        raise HTTPException(status_code=404, detail=f"File not found at {file.filepath}")
+
+    # FileResponse derives a strong ETag from the file's stat, which it also uses for If-Range
+    response = FileResponse(
+        file.filepath,
+        filename=file.filename,
+        media_type="application/octet-stream",
+        stat_result=os.stat(file.filepath),
+        headers={"Cache-Control": "no-cache"}
+    )
+    etag = response.headers["etag"]
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return response
+
+@router.get("/groups/{group_id:int}/download")
+def download_group(group_id: int, session: Session = Depends(get_db_session)):
+    """Stream every file in a group as a zip archive."""
+    group = session.get(TrialGroup, group_id)
+    if not group:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
+
+    filters = [C3DFile.id.in_(select(GroupFileLink.file_id).where(GroupFileLink.group_id == group_id))]
+    return archive_response(filters, f"{group.name}.zip")
+
+@router.get("/files/archive")
+def download_search_results(
+    query: FileQuery = Depends(file_query_params),
+    archive_name: str = Query("c3d_files", description="Name of the downloaded zip, without extension")
+):
+    """Stream every file matching the search filters as a zip archive."""
+    filters = build_file_filters(query)
+    return archive_response(filters, f"{archive_name}.zip")
+
+def archive_response(filters: list, archive_name: str) -> StreamingResponse:
+    """Zip the files matching `filters` into a streaming response."""
+    archive_name = archive_name.replace('"', "").replace("/", "_")
+    return StreamingResponse(
+        iter_zip(iter_archive_members(filters)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{archive_name}"'}
+    )
+
+def iter_archive_members(filters: list) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (archive path, file path) for each matching file.
+
+    Files are laid out as classification/subject/session/filename; a name
+    already used in the archive is prefixed with the file id.
+    """
+    used = set()
+    for rows in iter_file_batches(filters, ARCHIVE_COLUMNS, []):
+        for row in rows:
+            folders = [row[name] or "unknown" for name in ("classification", "subject_name", "session_name")]
+            arcname = "/".join(folders + [row["filename"]])
+            if arcname in used:
+                arcname = "/".join(folders + [f"{row['id']}_{row['filename']}"])
+            used.add(arcname)
+            yield arcname, row["filepath"]
+
+def iter_zip(members: Iterable[Tuple[str, str]]) -> Iterator[bytes]:
+    """
+    Write a stored (uncompressed) zip of `members` and yield it chunk by chunk.
+
+    C3D files barely compress, so members are stored and the response is
+    bounded by disk throughput. Files missing on disk are skipped and listed
+    in `missing_files.txt` at the end of the archive.
+    """
+    sink = ChunkSink()
+    missing = []
+    # An unseekable sink makes zipfile write data descriptors after each member
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for arcname, filepath in members:
+            try:
+                source = open(filepath, "rb")
+            except OSError:
+                missing.append(filepath)
+                continue
+            with source:
+                info = zipfile.ZipInfo.from_file(filepath, arcname)
+                with archive.open(info, mode="w", force_zip64=True) as member:
+                    while chunk := source.read(ZIP_CHUNK_SIZE):
+                        member.write(chunk)
+                        yield sink.drain()
+            yield sink.drain()
+        if missing:
+            archive.writestr("missing_files.txt", "\n".join(missing) + "\n")
+    yield sink.drain()
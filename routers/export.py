@@ -0,0 +1,155 @@
+"""
+Router for streaming exports of search results.
+
+Exports run the search as a single server-side cursor ordered by file id and
+stream rows in batches, so memory use stays flat and output starts
+immediately regardless of how many files match. There is no count query and
+no pagination.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Iterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, select
+import dependencies
+from serialization import ChunkSink
+from models.c3d_file import C3DFile
+from models.search import FileQuery
+from routers.search import build_file_filters, file_query_params, parse_fieldset, attach_relations, FILE_COLUMNS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+)
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+# Rows fetched from the cursor (and relations loaded) per batch
+EXPORT_BATCH_SIZE = 1000
+
+@router.get("/files")
+def export_files(
+    format: str = Query("ndjson", description="Output format: ndjson, csv or arrow (requires pyarrow)"),
+    fields: Optional[str] = Query(None, description="Comma-separated file columns to export"),
+    include: Optional[str] = Query(None, description="Comma-separated relations to add: markers, channels, events"),
+    query: FileQuery = Depends(file_query_params)
+):
+    """
+    Stream every file matching the search filters as NDJSON, CSV or Arrow IPC.
+
+    Nested values (file_metadata and included relations) are written as
+    objects in NDJSON and as JSON-encoded strings in CSV and Arrow.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format '{format}'")
+    if format == "arrow" and pyarrow is None:
+        raise HTTPException(status_code=400, detail="Arrow export requires pyarrow to be installed")
+
+    columns, relations = parse_fieldset(fields, include)
+    filters = build_file_filters(query)
+
+    batches = iter_file_batches(filters, columns, relations)
+    encoders = {"ndjson": encode_ndjson, "csv": encode_csv, "arrow": encode_arrow}
+    media_type, extension = EXPORT_FORMATS[format]
+
+    return StreamingResponse(
+        encoders[format](batches, columns + relations),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="c3d_files.{extension}"'}
+    )
+
+def iter_file_batches(filters: list, columns: list[str], relations: list[str]) -> Iterator[list[dict]]:
+    """
+    Yield matching file rows in batches from one server-side cursor.
+
+    The session is opened here rather than injected, because request
+    dependencies are closed before a streaming response body is sent.
+    """
+    with Session(dependencies.engine) as session:
+        result = session.connection().execute(
+            select(*[FILE_COLUMNS[name].label(name) for name in columns])
+            .where(*filters)
+            .order_by(C3DFile.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for partition in result.mappings().partitions():
+            rows = [dict(row) for row in partition]
+            attach_relations(session, rows, relations)
+            yield rows
+
+def _json_default(value: Any) -> Any:
+    """Serialize values the standard json module does not handle."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _flat_value(value: Any) -> Any:
+    """Flatten a value for a tabular cell; nested values become JSON strings."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def encode_ndjson(batches: Iterator[list[dict]], names: list[str]) -> Iterator[bytes]:
+    """Encode each row as one JSON document per line."""
+    for rows in batches:
+        if orjson is not None:
+            yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+        else:
+            yield "".join(json.dumps(row, default=_json_default) + "\n" for row in rows).encode()
+
+def encode_csv(batches: Iterator[list[dict]], names: list[str]) -> Iterator[bytes]:
+    """Encode rows as CSV with a header line."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in batches:
+        writer.writerows([_flat_value(row[name]) for name in names] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+# Arrow column types; other columns (text, timestamps, nested values) are strings
+ARROW_NUMERIC_COLUMNS = {
+    "id": "int64",
+    "file_size": "int64",
+    "frame_count": "int64",
+    "sample_rate": "float64",
+    "duration": "float64",
+}
+
+def encode_arrow(batches: Iterator[list[dict]], names: list[str]) -> Iterator[bytes]:
+    """Encode rows as an Arrow IPC stream, one record batch per cursor batch."""
+    schema = pyarrow.schema([
+        (name, pyarrow.type_for_alias(ARROW_NUMERIC_COLUMNS.get(name, "string")))
+        for name in names
+    ])
+    sink = ChunkSink()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+    for rows in batches:
+        columns = [[_flat_value(row[name]) for row in rows] for name in names]
+        writer.write_batch(pyarrow.record_batch(columns, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
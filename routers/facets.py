@@ -0,0 +1,164 @@
+"""
+Router for faceted search counts.
+
+For the files matching the current filters, counts how many fall under each
+classification, subject, session, marker/channel/event label, sample rate and
+duration bucket, so the filter UI can show counts before a filter is applied.
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select, func, case, and_
+from dependencies import get_db_session
+from models.c3d_file import C3DFile
+from models.label import Label, label_tables, display_label
+from models.label_index import label_index
+from models.search import FileQuery
+from models.generation import read_generation
+from caching import canonical_key
+from serialization import json_response
+from routers.search import build_file_filters, file_query_params, search_cache, FILE_COLUMNS
+
+router = APIRouter(
+    prefix="/search",
+    tags=["search"],
+)
+
+# File columns counted with a GROUP BY over the matching files
+COLUMN_FACETS = {
+    "classification": C3DFile.classification,
+    "subject": C3DFile.subject_name,
+    "session": C3DFile.session_name,
+    "sample_rate": C3DFile.sample_rate,
+}
+
+# Label facets count distinct matching files per canonical label (aliases together)
+LABEL_FACETS = {"marker": "marker", "channel": "channel", "event": "event"}
+
+# Duration buckets in seconds as (label, lower bound inclusive, upper bound exclusive)
+DURATION_BUCKETS = (
+    ("< 1 s", None, 1),
+    ("1-5 s", 1, 5),
+    ("5-10 s", 5, 10),
+    ("10-30 s", 10, 30),
+    ("30-60 s", 30, 60),
+    ("1-5 min", 60, 300),
+    (">= 5 min", 300, None),
+)
+
+FACETS = tuple(COLUMN_FACETS) + tuple(LABEL_FACETS) + ("duration",)
+
+@router.get("/facets")
+def get_search_facets(
+    facets: Optional[str] = Query(None, description=f"Comma-separated facets (default all): {', '.join(FACETS)}"),
+    facet_limit: int = Query(50, ge=1, le=1000, description="Maximum values returned per facet"),
+    query: FileQuery = Depends(file_query_params),
+    session: Session = Depends(get_db_session)
+):
+    """
+    Count matching files per facet value under the current search filters.
+
+    Values are ordered by descending count. Results are cached per database
+    generation alongside the search results.
+    """
+    requested = [name.strip() for name in facets.split(",") if name.strip()] if facets else list(FACETS)
+    unknown = [name for name in requested if name not in FACETS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown facets: {', '.join(unknown)}. Available facets: {', '.join(FACETS)}"
+        )
+
+    # Label facets and label filters read the bitmap index (see search_files)
+    index_version = label_index.version
+    filters = build_file_filters(query)
+
+    generation, _ = read_generation(session.connection())
+    return json_response(search_cache.get_or_compute(
+        generation,
+        canonical_key("facets", query.model_dump(exclude_defaults=True), requested, facet_limit, index_version),
+        lambda: compute_facets(session, filters, requested, facet_limit)
+    ))
+
+def compute_facets(session: Session, filters: list, facets: list[str], facet_limit: int) -> dict:
+    """Run one grouped query per requested facet."""
+    total = session.exec(select(func.count(C3DFile.id)).where(*filters)).one()
+    results = {}
+
+    # Label facets are popcounts on the bitmap index, within the matching ids
+    use_bitmaps = label_index.loaded and any(name in LABEL_FACETS for name in facets)
+    matching_ids = session.exec(select(C3DFile.id).where(*filters)).all() if use_bitmaps and filters else None
+
+    for name in facets:
+        if name in COLUMN_FACETS:
+            results[name] = column_facet(session, COLUMN_FACETS[name], filters, facet_limit)
+        elif name in LABEL_FACETS and use_bitmaps:
+            results[name] = label_index.facet_counts(LABEL_FACETS[name], matching_ids, facet_limit)
+        elif name in LABEL_FACETS:
+            results[name] = label_facet(session, LABEL_FACETS[name], filters, facet_limit)
+        elif name == "duration":
+            results[name] = duration_facet(session, filters)
+
+    return {"total": total, "facets": results}
+
+def column_facet(session: Session, column, filters: list, facet_limit: int) -> list[dict]:
+    """Count matching files per distinct value of a file column."""
+    count = func.count()
+    rows = session.exec(
+        select(column, count)
+        .where(*filters)
+        .group_by(column)
+        .order_by(count.desc(), column)
+        .limit(facet_limit)
+    ).all()
+    return [{"value": value, "count": n} for value, n in rows]
+
+def label_facet(session: Session, kind: str, filters: list, facet_limit: int) -> list[dict]:
+    """
+    Count matching files per canonical label in SQL (used when the bitmap index
+    is not loaded); aliases are counted together, as label filters match them.
+    """
+    model, _ = label_tables()[kind]
+    count = func.count(func.distinct(model.file_id))
+    query = (
+        select(Label.canonical_name, count)
+        .join(Label, Label.id == model.label_id)
+        .group_by(Label.canonical_name)
+        .order_by(count.desc(), Label.canonical_name)
+        .limit(facet_limit)
+    )
+    if filters:
+        query = query.where(model.file_id.in_(select(C3DFile.id).where(*filters)))
+    rows = session.exec(query).all()
+
+    # Show each group under the raw name used by the most files, as the bitmap index does
+    usage: dict[str, list] = {}
+    for canonical, name, n in session.exec(
+        select(Label.canonical_name, Label.name, func.count(func.distinct(model.file_id)))
+        .join(Label, Label.id == model.label_id)
+        .where(Label.canonical_name.in_([canonical for canonical, _ in rows]))
+        .group_by(Label.id)
+    ).all():
+        usage.setdefault(canonical, []).append((name, n))
+    ranked = sorted(
+        ((n, display_label(usage[canonical])) for canonical, n in rows),
+        key=lambda item: (-item[0], item[1])
+    )
+    return [{"value": value, "count": n} for n, value in ranked]
+
+def duration_facet(session: Session, filters: list) -> list[dict]:
+    """Count matching files per fixed duration bucket."""
+    duration = FILE_COLUMNS["duration"]
+    conditions = []
+    for label, lower, upper in DURATION_BUCKETS:
+        bounds = []
+        if lower is not None:
+            bounds.append(duration >= lower)
+        if upper is not None:
+            bounds.append(duration < upper)
+        conditions.append((and_(*bounds), label))
+    bucket = case(*conditions)
+    counts = dict(session.exec(select(bucket, func.count()).where(*filters).group_by(bucket)).all())
+    return [
+        {"value": label, "min": lower, "max": upper, "count": counts.get(label, 0)}
+        for label, lower, upper in DURATION_BUCKETS
+    ]
@@ -4,19 +4,26 @@ from typing import List
 from datetime import datetime
 
 # Import models
-from models.group import TrialGroup, TrialGroupCreate, TrialGroupUpdate, TrialGroupRead, GroupFileLink
+from models.group import (
+    TrialGroup, TrialGroupCreate, TrialGroupUpdate, TrialGroupRead, TrialGroupSetOperation, TrialGroupQuery,
+    GroupFileLink
+)
+from models.base import id_list_subquery
 from models.c3d_file import C3DFile
+from models.search import FileQuery
 from models.response import FileRead # Assuming you have a FileRead model for file details
-from models.marker import MarkerRead
-from models.channel import ChannelRead
-from models.event import EventRead
 
 # Import database session dependency
 from app import get_db_session
+from serialization import json_response
 
-# For counting files
+# For group aggregates and set-based membership statements
+from sqlalchemy import insert, literal, union, intersect, except_
 from sqlalchemy.sql import func
 
+# Search criteria builder and row projection, shared with the search router
+from routers.search import build_file_filters, fetch_file_rows, FILE_COLUMNS, FILE_RELATIONS
+
 router = APIRouter()
 
 def get_group_or_404(group_id: int, session: Session) -> TrialGroup:
@@ -33,67 +40,199 @@ def get_file_or_404(file_id: int, session: Session) -> C3DFile:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"File with id {file_id} not found")
     return file
 
+def touch_group(group: TrialGroup, session: Session) -> None:
+    """Mark a group as modified after its membership changed."""
+    group.date_modified = datetime.now()
+    session.add(group)
+
+def add_matching_files(session: Session, group_id: int, *criteria) -> int:
+    """
+    Link every file matching the criteria to a group with one INSERT OR IGNORE ... SELECT.
+    
+    Returns:
+        int: Number of newly linked files (existing links are ignored)
+    """
+    statement = insert(GroupFileLink).prefix_with("OR IGNORE").from_select(
+        ["group_id", "file_id"],
+        select(literal(group_id), C3DFile.id).where(*criteria)
+    )
+    return session.exec(statement).rowcount
+
+def remove_matching_files(session: Session, group_id: int, *criteria) -> int:
+    """
+    Unlink every file matching the criteria from a group with one DELETE.
+    
+    Returns:
+        int: Number of removed links
+    """
+    statement = delete(GroupFileLink).where(
+        GroupFileLink.group_id == group_id,
+        GroupFileLink.file_id.in_(select(C3DFile.id).where(*criteria))
+    )
+    return session.exec(statement).rowcount
+
+def materialize_smart_group(session: Session, group_query: TrialGroupQuery) -> int:
+    """
+    Replace a smart group's members with the current results of its saved query.
+    
+    Returns:
+        int: Number of member files after materialization
+    """
+    session.exec(delete(GroupFileLink).where(GroupFileLink.group_id == group_query.group_id))
+    filters = build_file_filters(FileQuery(**group_query.query))
+    member_count = add_matching_files(session, group_query.group_id, *filters)
+    group_query.date_materialized = datetime.now()
+    session.add(group_query)
+    return member_count
+
+def refresh_smart_groups(session: Session, file_ids: List[int]) -> None:
+    """
+    Incrementally update smart group membership for newly indexed or changed files.
+    
+    Only the given files are re-checked against each saved query, so the cost
+    scales with the number of changed files rather than the archive size.
+    Caller commits.
+    """
+    if not file_ids:
+        return
+    changed_files = C3DFile.id.in_(id_list_subquery(file_ids))
+    for group_query in session.exec(select(TrialGroupQuery)).all():
+        filters = build_file_filters(FileQuery(**group_query.query))
+        removed = remove_matching_files(session, group_query.group_id, changed_files)
+        added = add_matching_files(session, group_query.group_id, changed_files, *filters)
+        if removed or added:
+            group = session.get(TrialGroup, group_query.group_id)
+            if group:
+                touch_group(group, session)
+
+def group_summary_query():
+    """
+    Build a single grouped query returning each group with its member aggregates.
+    
+    Rows are (TrialGroup, file_count, total_duration, total_bytes, subject_count, query).
+    """
+    return (
+        select(
+            TrialGroup,
+            func.count(C3DFile.id),
+            func.coalesce(func.sum(C3DFile.frame_count / C3DFile.sample_rate), 0.0),
+            func.coalesce(func.sum(C3DFile.file_size), 0),
+            func.count(func.distinct(C3DFile.subject_name)),
+            TrialGroupQuery.query
+        )
+        .outerjoin(GroupFileLink, GroupFileLink.group_id == TrialGroup.id)
+        .outerjoin(C3DFile, C3DFile.id == GroupFileLink.file_id)
+        .outerjoin(TrialGroupQuery, TrialGroupQuery.group_id == TrialGroup.id)
+        .group_by(TrialGroup.id)
+    )
+
+def to_group_read(row) -> TrialGroupRead:
+    """Convert a row from group_summary_query into the API response model."""
+    group, file_count, total_duration, total_bytes, subject_count, query = row
+    return TrialGroupRead(
+        id=group.id,
+        name=group.name,
+        description=group.description,
+        date_created=group.date_created,
+        date_modified=group.date_modified,
+        file_count=file_count,
+        total_duration=total_duration,
+        total_bytes=total_bytes,
+        subject_count=subject_count,
+        query=query
+    )
+
+def get_group_read(group_id: int, session: Session) -> TrialGroupRead:
+    """Helper function to get a group with its aggregates by ID or raise 404."""
+    row = session.exec(group_summary_query().where(TrialGroup.id == group_id)).first()
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
+    return to_group_read(row)
+
 @router.get("/groups/", response_model=List[TrialGroupRead], tags=["Groups"])
 def get_groups(
     session: Session = Depends(get_db_session),
     skip: int = 0,
     limit: int = 100
 ):
-    """Get all trial groups with file count."""
-    groups = session.exec(select(TrialGroup).offset(skip).limit(limit)).all()
-    
-    result = []
-    for group in groups:
-        # Count files in this group efficiently
-        file_count = session.exec(
-            select(func.count(GroupFileLink.file_id))
-            .where(GroupFileLink.group_id == group.id)
-        ).one()
-        
-        result.append(
-            TrialGroupRead(
-                id=group.id,
-                name=group.name,
-                description=group.description,
-                date_created=group.date_created,
-                date_modified=group.date_modified,
-                file_count=file_count
-            )
-        )
-    
-    return result
+    """Get all trial groups with file count and member aggregates in a single query."""
+    rows = session.exec(
+        group_summary_query().order_by(TrialGroup.id).offset(skip).limit(limit)
+    ).all()
+    return [to_group_read(row) for row in rows]
 
 @router.post("/groups/", response_model=TrialGroupRead, status_code=status.HTTP_201_CREATED, tags=["Groups"])
 def create_group(
     group_data: TrialGroupCreate,
     session: Session = Depends(get_db_session)
 ):
-    """Create a new trial group, optionally adding initial files."""
+    """Create a new trial group, optionally adding initial files or a saved query (smart group)."""
+    # Ensure all initial files exist (one query) before creating anything
+    requested_ids = set(group_data.file_ids)
+    if requested_ids:
+        found_ids = set(session.exec(
+            select(C3DFile.id).where(C3DFile.id.in_(id_list_subquery(requested_ids)))
+        ).all())
+        missing_ids = sorted(requested_ids - found_ids)
+        if missing_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Files not found: {missing_ids}"
+            )
+    
     db_group = TrialGroup(
         name=group_data.name, 
         description=group_data.description
     )
     session.add(db_group)
+    session.flush() # Get the generated ID
+    
+    if group_data.query is not None:
+        group_query = TrialGroupQuery(
+            group_id=db_group.id,
+            query=group_data.query.model_dump(exclude_defaults=True)
+        )
+        materialize_smart_group(session, group_query)
+    elif requested_ids:
+        add_matching_files(session, db_group.id, C3DFile.id.in_(id_list_subquery(requested_ids)))
     session.commit()
-    session.refresh(db_group) # Get the generated ID
-    
-    file_count = 0
-    if group_data.file_ids:
-        for file_id in group_data.file_ids:
-            file = get_file_or_404(file_id, session) # Ensure file exists
-            link = GroupFileLink(group_id=db_group.id, file_id=file_id)
-            session.add(link)
-            file_count += 1
-        session.commit()
     
-    return TrialGroupRead(
-        id=db_group.id,
-        name=db_group.name,
-        description=db_group.description,
-        date_created=db_group.date_created,
-        date_modified=db_group.date_modified,
-        file_count=file_count
-    )
+    return get_group_read(db_group.id, session)
+
+@router.post("/groups/combine", response_model=TrialGroupRead, status_code=status.HTTP_201_CREATED, tags=["Groups"])
+def combine_groups(
+    operation: TrialGroupSetOperation,
+    session: Session = Depends(get_db_session)
+):
+    """Create a new group from the union, intersection or difference of existing groups, computed in SQL."""
+    if not operation.group_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one group ID is required")
+    
+    found_ids = set(session.exec(
+        select(TrialGroup.id).where(TrialGroup.id.in_(operation.group_ids))
+    ).all())
+    missing_ids = sorted(set(operation.group_ids) - found_ids)
+    if missing_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Groups not found: {missing_ids}")
+    
+    members = [
+        select(GroupFileLink.file_id).where(GroupFileLink.group_id == group_id)
+        for group_id in operation.group_ids
+    ]
+    if len(members) == 1:
+        member_ids = members[0]
+    else:
+        set_operation = {"union": union, "intersection": intersect, "difference": except_}[operation.operation]
+        member_ids = set_operation(*members)
+    
+    db_group = TrialGroup(name=operation.name, description=operation.description)
+    session.add(db_group)
+    session.flush() # Get the generated ID
+    
+    add_matching_files(session, db_group.id, C3DFile.id.in_(member_ids))
+    session.commit()
+    
+    return get_group_read(db_group.id, session)
 
 @router.get("/groups/{group_id}", response_model=TrialGroupRead, tags=["Groups"])
 def get_group(
@@ -101,21 +240,7 @@ def get_group(
     session: Session = Depends(get_db_session)
 ):
     """Get a specific trial group by ID."""
-    group = get_group_or_404(group_id, session)
-    
-    file_count = session.exec(
-        select(func.count(GroupFileLink.file_id))
-        .where(GroupFileLink.group_id == group_id)
-    ).one()
-    
-    return TrialGroupRead(
-        id=group.id,
-        name=group.name,
-        description=group.description,
-        date_created=group.date_created,
-        date_modified=group.date_modified,
-        file_count=file_count
-    )
+    return get_group_read(group_id, session)
 
 @router.put("/groups/{group_id}", response_model=TrialGroupRead, tags=["Groups"])
 def update_group(
@@ -123,11 +248,19 @@ def update_group(
     group_update: TrialGroupUpdate,
     session: Session = Depends(get_db_session)
 ):
-    """Update a trial group's name or description."""
+    """Update a trial group's name, description or saved query."""
     db_group = get_group_or_404(group_id, session)
     
     update_data = group_update.dict(exclude_unset=True)
     updated = False
+    
+    # A new query turns the group into a smart group and rematerializes its members
+    if update_data.pop("query", None) is not None:
+        group_query = session.get(TrialGroupQuery, group_id) or TrialGroupQuery(group_id=group_id)
+        group_query.query = group_update.query.model_dump(exclude_defaults=True)
+        materialize_smart_group(session, group_query)
+        updated = True
+    
     for key, value in update_data.items():
         setattr(db_group, key, value)
         updated = True
@@ -138,19 +271,7 @@ def update_group(
         session.commit()
         session.refresh(db_group)
     
-    file_count = session.exec(
-        select(func.count(GroupFileLink.file_id))
-        .where(GroupFileLink.group_id == group_id)
-    ).one()
-
-    return TrialGroupRead(
-        id=db_group.id,
-        name=db_group.name,
-        description=db_group.description,
-        date_created=db_group.date_created,
-        date_modified=db_group.date_modified,
-        file_count=file_count
-    )
+    return get_group_read(group_id, session)
 
 @router.delete("/groups/{group_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Groups"])
 def delete_group(
@@ -160,8 +281,9 @@ def delete_group(
     """Delete a trial group (does not delete the files, only the group and associations)."""
     db_group = get_group_or_404(group_id, session)
     
-    # Delete associations first
+    # Delete associations and any saved query first
     session.exec(delete(GroupFileLink).where(GroupFileLink.group_id == group_id))
+    session.exec(delete(TrialGroupQuery).where(TrialGroupQuery.group_id == group_id))
     
     # Delete the group
     session.delete(db_group)
@@ -169,6 +291,23 @@ def delete_group(
     
     return None # Return None for 204 No Content
 
+@router.post("/groups/{group_id}/refresh", response_model=TrialGroupRead, tags=["Groups"])
+def refresh_group(
+    group_id: int,
+    session: Session = Depends(get_db_session)
+):
+    """Fully re-run a smart group's saved query (ingestion keeps it current incrementally)."""
+    db_group = get_group_or_404(group_id, session)
+    group_query = session.get(TrialGroupQuery, group_id)
+    if not group_query:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Group has no saved query")
+    
+    materialize_smart_group(session, group_query)
+    touch_group(db_group, session)
+    session.commit()
+    
+    return get_group_read(group_id, session)
+
 # --- Group File Management Endpoints ---
 
 @router.get("/groups/{group_id}/files", response_model=List[FileRead], tags=["Groups"])
@@ -176,44 +315,17 @@ def get_group_files(
     group_id: int,
     session: Session = Depends(get_db_session)
 ):
-    """Get all files associated with a specific group."""
-    group = get_group_or_404(group_id, session) # Ensure group exists
-    
-    # Query files linked to this group
-    files = session.exec(
-        select(C3DFile)
-        .join(GroupFileLink)
-        .where(GroupFileLink.group_id == group_id)
-    ).all()
+    """Get all files associated with a specific group, with markers, channels and events."""
+    get_group_or_404(group_id, session) # Ensure group exists
     
-    # Prepare the response using FileRead model
-    response_files = []
-    for file in files:
-        # Efficiently load related data if needed for FileRead
-        markers = file.markers # Assuming relationship loading works
-        channels = file.analog_channels
-        events = file.events
-        
-        response_files.append(
-            FileRead(
-                id=file.id,
-                filename=file.filename,
-                filepath=file.filepath,
-                file_size=file.file_size,
-                date_added=file.date_added,
-                duration=file.frame_count / file.sample_rate if file.sample_rate else 0.0,
-                frame_count=file.frame_count,
-                sample_rate=file.sample_rate,
-                subject_name=file.subject_name,
-                classification=file.classification,
-                session_name=file.session_name,
-                file_metadata=file.file_metadata,
-                markers=[MarkerRead(marker_name=m.marker_name) for m in markers],
-                channels=[ChannelRead(channel_name=c.channel_name) for c in channels],
-                events=[EventRead(event_name=e.event_name, event_time=e.event_time) for e in events]
-            )
-        )
-    return response_files
+    # Project rows straight to dicts; related rows are loaded once per table
+    files = fetch_file_rows(
+        session,
+        [C3DFile.id.in_(select(GroupFileLink.file_id).where(GroupFileLink.group_id == group_id))],
+        list(FILE_COLUMNS),
+        list(FILE_RELATIONS)
+    )
+    return json_response(files)
 
 @router.post("/groups/{group_id}/files", status_code=status.HTTP_200_OK, tags=["Groups"])
 def add_files_to_group(
@@ -221,37 +333,24 @@ def add_files_to_group(
     file_ids: List[int], # Expect a list of file IDs in the request body
     session: Session = Depends(get_db_session)
 ):
-    """Add multiple files to a trial group."""
+    """Add multiple files to a trial group in one set-based statement."""
     group = get_group_or_404(group_id, session)
     
-    added_count = 0
-    skipped_count = 0
-    not_found_ids = []
-
-    # Get existing links for this group to avoid duplicates efficiently
-    existing_file_ids = set(session.exec(
-        select(GroupFileLink.file_id).where(GroupFileLink.group_id == group_id)
+    # Resolve which of the requested files exist with a single query
+    requested_ids = set(file_ids)
+    found_ids = set(session.exec(
+        select(C3DFile.id).where(C3DFile.id.in_(id_list_subquery(requested_ids)))
     ).all())
-
-    for file_id in file_ids:
-        if file_id in existing_file_ids:
-            skipped_count += 1
-            continue
-            
-        file = session.get(C3DFile, file_id) # Check if file exists
-        if not file:
-            not_found_ids.append(file_id)
-            continue
-            
-        # Create new link
-        link = GroupFileLink(group_id=group_id, file_id=file_id)
-        session.add(link)
-        added_count += 1
+    not_found_ids = sorted(requested_ids - found_ids)
+    
+    added_count = 0
+    if found_ids:
+        added_count = add_matching_files(session, group_id, C3DFile.id.in_(id_list_subquery(found_ids)))
+    skipped_count = len(found_ids) - added_count
     
     if added_count > 0:
-        group.date_modified = datetime.now()
-        session.add(group)
-        session.commit()
+        touch_group(group, session)
+    session.commit()
     
     response_detail = f"Added {added_count} files to group '{group.name}'. Skipped {skipped_count} duplicates."
     if not_found_ids:
@@ -262,6 +361,54 @@ def add_files_to_group(
 
     return {"detail": response_detail, "added_count": added_count, "skipped_count": skipped_count, "not_found_ids": not_found_ids}
 
+@router.delete("/groups/{group_id}/files", status_code=status.HTTP_200_OK, tags=["Groups"])
+def remove_files_from_group(
+    group_id: int,
+    file_ids: List[int], # Expect a list of file IDs in the request body
+    session: Session = Depends(get_db_session)
+):
+    """Remove multiple files from a trial group in one statement."""
+    group = get_group_or_404(group_id, session)
+    
+    removed_count = remove_matching_files(session, group_id, C3DFile.id.in_(id_list_subquery(set(file_ids))))
+    if removed_count > 0:
+        touch_group(group, session)
+    session.commit()
+    
+    return {"detail": f"Removed {removed_count} files from group '{group.name}'.", "removed_count": removed_count}
+
+@router.post("/groups/{group_id}/files/by-query", status_code=status.HTTP_200_OK, tags=["Groups"])
+def add_query_results_to_group(
+    group_id: int,
+    query: FileQuery,
+    session: Session = Depends(get_db_session)
+):
+    """Add every file matching a search query to a group, evaluated server-side with INSERT ... SELECT."""
+    group = get_group_or_404(group_id, session)
+    
+    added_count = add_matching_files(session, group_id, *build_file_filters(query))
+    if added_count > 0:
+        touch_group(group, session)
+    session.commit()
+    
+    return {"detail": f"Added {added_count} files to group '{group.name}'.", "added_count": added_count}
+
+@router.delete("/groups/{group_id}/files/by-query", status_code=status.HTTP_200_OK, tags=["Groups"])
+def remove_query_results_from_group(
+    group_id: int,
+    query: FileQuery,
+    session: Session = Depends(get_db_session)
+):
+    """Remove every file matching a search query from a group in one statement."""
+    group = get_group_or_404(group_id, session)
+    
+    removed_count = remove_matching_files(session, group_id, *build_file_filters(query))
+    if removed_count > 0:
+        touch_group(group, session)
+    session.commit()
+    
+    return {"detail": f"Removed {removed_count} files from group '{group.name}'.", "removed_count": removed_count}
+
 @router.delete("/groups/{group_id}/files/{file_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Groups"])
 def remove_file_from_group(
     group_id: int,
@@ -285,8 +432,7 @@ def remove_file_from_group(
         )
     
     session.delete(link)
-    group.date_modified = datetime.now() # Update modification time
-    session.add(group)
+    touch_group(group, session) # Update modification time
     session.commit()
     
     return None # Return None for 204 No Content 
\ No newline at end of file
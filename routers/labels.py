@@ -0,0 +1,47 @@
+"""
+Router for the interned marker, channel and event label dictionary.
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select, or_
+from dependencies import get_db_session
+from models.label import Label, LabelRead, LABEL_KINDS, normalize_label, canonical_label
+from pydantic import TypeAdapter
+from serialization import validated_response
+
+router = APIRouter(
+    prefix="/labels",
+    tags=["labels"],
+)
+
+# Built once; validates and serializes whole label lists in pydantic-core
+LABEL_LIST_ADAPTER = TypeAdapter(List[LabelRead])
+
+@router.get("/", response_model=List[LabelRead])
+def get_labels(
+    kind: Optional[str] = Query(None, description="Label kind: marker, channel or event"),
+    name: Optional[str] = Query(None, description="Filter by name (case-insensitive substring)"),
+    canonical: Optional[str] = Query(None, description="Labels sharing this label's canonical name (aliases)"),
+    skip: int = 0,
+    limit: int = Query(1000, ge=1, le=100000),
+    db: Session = Depends(get_db_session)
+):
+    """Get the distinct labels across all indexed files."""
+    query = select(Label)
+    
+    if kind:
+        if kind not in LABEL_KINDS:
+            raise HTTPException(status_code=400, detail=f"Unknown label kind '{kind}'")
+        query = query.where(Label.kind == kind)
+    if name:
+        query = query.where(Label.normalized_name.contains(normalize_label(name)))
+    if canonical:
+        kinds = [kind] if kind else LABEL_KINDS
+        query = query.where(or_(*[
+            (Label.kind == label_kind) & (Label.canonical_name == canonical_label(label_kind, canonical))
+            for label_kind in kinds
+        ]))
+    
+    labels = db.exec(query.order_by(Label.kind, Label.name).offset(skip).limit(limit)).all()
+    
+    return validated_response(LABEL_LIST_ADAPTER, labels)
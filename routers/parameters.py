@@ -0,0 +1,72 @@
+"""
+Router for structured C3D parameters stored in the deduplicated parameter store.
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select, func
+from dependencies import get_db_session
+from models.c3d_file import C3DFile
+from models.parameter import (
+    Parameter, ParameterGroup, C3DFileParameterGroup, ParameterRead, file_parameters
+)
+
+router = APIRouter(
+    prefix="/parameters",
+    tags=["parameters"],
+)
+
+@router.get("/")
+def get_parameter_names(
+    group: Optional[str] = Query(None, description="Filter by parameter group, e.g. ANALOG"),
+    name: Optional[str] = Query(None, description="Filter by parameter name, e.g. RATE"),
+    skip: int = 0,
+    limit: int = Query(1000, ge=1, le=100000),
+    db: Session = Depends(get_db_session)
+):
+    """Get the distinct GROUP:NAME parameters with the number of files containing each."""
+    query = (
+        select(
+            ParameterGroup.group_name,
+            Parameter.name,
+            Parameter.dtype,
+            func.count(func.distinct(C3DFileParameterGroup.file_id))
+        )
+        .join(Parameter, Parameter.parameter_group_id == ParameterGroup.id)
+        .join(C3DFileParameterGroup, C3DFileParameterGroup.parameter_group_id == ParameterGroup.id)
+        .group_by(ParameterGroup.group_name, Parameter.name, Parameter.dtype)
+    )
+    if group:
+        query = query.where(ParameterGroup.group_name == group.upper())
+    if name:
+        query = query.where(Parameter.name == name.upper())
+    
+    rows = db.exec(
+        query.order_by(ParameterGroup.group_name, Parameter.name).offset(skip).limit(limit)
+    ).all()
+    
+    return [
+        {"group_name": group_name, "name": param_name, "dtype": dtype, "file_count": file_count}
+        for group_name, param_name, dtype, file_count in rows
+    ]
+
+@router.get("/files/{file_id}", response_model=List[ParameterRead])
+def get_file_parameters(
+    file_id: int,
+    group: Optional[str] = Query(None, description="Only return parameters of this group"),
+    db: Session = Depends(get_db_session)
+):
+    """Get every C3D parameter of a file."""
+    if not db.get(C3DFile, file_id):
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return [
+        ParameterRead(
+            group_name=group_name,
+            name=parameter.name,
+            dtype=parameter.dtype,
+            description=parameter.description,
+            value=parameter.value
+        )
+        for group_name, parameter in file_parameters(db, file_id)
+        if not group or group_name == group.upper()
+    ]
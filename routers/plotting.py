@@ -1,12 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from sqlmodel import Session, select
 from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
 from models.c3d_file import C3DFile
 from models.marker import Marker
 from models.channel import AnalogChannel
 from models.analysis import Analysis
+from models.plot import PlotBatchRequest, PlotData
+from models.group import TrialGroup
+from models.base import GroupFileLink
+from models.event import Event
+from models.label import Label, canonical_label
+from models.gait_cycle import GaitCycle
 from app import get_db_session
-import ezc3d
+from caching import file_etag, is_not_modified
+from c3d_loader import MAX_CONCURRENT_DECODES, SingleFlight, load_trial
+from serialization import encode_arrays, json_response
+from ensemble import ensemble_traces, event_cycles, normalize_cycles, series_index, summarize
+from routers.search import split_names
+from routers.cycles import cycle_filters
+import dependencies
 import numpy as np
 import urllib.parse
 import json
@@ -32,22 +45,49 @@ def get_file_or_404(file_id: int, session: Session) -> C3DFile:
         raise HTTPException(status_code=404, detail=f"File with id {file_id} not found")
     return file
 
+def find_plot_class(plot_name: str):
+    """Plot class registered in plots.available_plots under `plot_name`, or None."""
+    from plots import available_plots
+    return next((p for p in available_plots if p.__name__ == plot_name), None)
+
+def render_plot(plot_class, parameters: Dict[str, Any], plot_data: PlotData) -> Dict[str, Any]:
+    """Run one plot class on prepared plot data."""
+    try:
+        plot_instance = plot_class()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating plot instance: {str(e)}")
+    
+    if hasattr(plot_instance, 'set_parameters'):
+        plot_instance.set_parameters(parameters)
+    
+    if not hasattr(plot_instance, 'plot'):
+        raise HTTPException(status_code=500, detail=f"Plot class {plot_class.__name__} missing 'plot' method.")
+
+    plot_output = plot_instance.plot(plot_data)
+    if not all(k in plot_output for k in ('traces', 'layout', 'config')):
+        return {'traces': [], 'layout': {}, 'config': {}}
+    # Series are NumPy views; only the ones a plot used are copied, for serialization
+    return encode_arrays(plot_output)
+
 # Route uses file_id query parameter
 @router.get("/plot") 
 def get_plot_data(
+    request: Request,
     file_id: int = Query(...),
     plot_name: str = Query(...),
     parameters: Optional[str] = Query(None), # JSON string for parameters
     session: Session = Depends(get_db_session)
 ):
-    """Get plot data for a specific file ID and plot type."""
+    """
+    Get plot data for a specific file ID and plot type.
+    
+    The ETag is derived from the C3D file's size and modification time, so an
+    unchanged file is answered with 304 without reading it.
+    """
     try:
-        # Import needed here now
-        from plots import available_plots
-        
         file = get_file_or_404(file_id, session)
         
-        plot_class = next((p for p in available_plots if p.__name__ == plot_name), None)
+        plot_class = find_plot_class(plot_name)
         if not plot_class:
             raise HTTPException(status_code=404, detail=f"Plot '{plot_name}' not found")
         
@@ -67,52 +107,246 @@ def get_plot_data(
             else:
                 # In real-world applications, implement a cache or temp storage for files
                 raise HTTPException(status_code=404, detail=f"File not found at {file.filepath}")
+            
+            etag = file_etag(filepath, plot_name, parameters or "")
+            if is_not_modified(request, etag):
+                return Response(status_code=304, headers={"ETag": etag})
                 
-            # Load the C3D file with ezc3d
-            c3d = ezc3d.c3d(filepath)
-            c3d_processed_data = {
-                'points': c3d['data']['points'],
-                'meta_data': c3d['parameters'],
-                'analogs': c3d['data']['analogs'],
-                'header': c3d['header']
-            }
+            # Decoded once per file version; concurrent requests share the decode
+            plot_data = PlotData.from_trial(load_trial(filepath))
+        except TimeoutError as e:
+            raise HTTPException(status_code=504, detail=f"Timed out reading C3D file: {str(e)}")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error reading C3D file: {str(e)}")
         
-        # Create the plot
-        try:
-            plot_instance = plot_class()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error creating plot instance: {str(e)}")
-        
-        if hasattr(plot_instance, 'set_parameters'):
-            plot_instance.set_parameters(decoded_params)
-        
-        if hasattr(plot_instance, 'plot'):
-            plot_output = plot_instance.plot(c3d_processed_data)
-            
-            if not all(k in plot_output for k in ('traces', 'layout', 'config')):
-                return {'traces': [], 'layout': {}, 'config': {}}
-            return plot_output
-        else:
-             raise HTTPException(status_code=500, detail=f"Plot class {plot_name} missing 'plot' method.")
+        plot_response = json_response(render_plot(plot_class, decoded_params, plot_data))
+        plot_response.headers["ETag"] = etag
+        plot_response.headers["Cache-Control"] = "no-cache"
+        return plot_response
 
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating plot: {str(e)}")
 
-# Route uses file_id query parameter
-@router.get("/plot/markers")
-def get_marker_names(
-    file_id: int = Query(...),
+# Upper bound on files in one batch request
+MAX_BATCH_FILES = 50
+
+@router.post("/plots/batch")
+def get_plot_batch(
+    batch: PlotBatchRequest,
+    session: Session = Depends(get_db_session)
+):
+    """
+    Render several plots for one or more files in one request.
+
+    Each file is decoded once (files are loaded in parallel) and wrapped in
+    one PlotData, then every requested plot runs against it. Results
+    are returned per file in request order; a file or plot that fails carries
+    an `error` instead of failing the whole batch.
+    """
+    if len(batch.file_ids) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files per batch")
+
+    plot_classes = []
+    for plot in batch.plots:
+        plot_class = find_plot_class(plot.plot_name)
+        if not plot_class:
+            raise HTTPException(status_code=404, detail=f"Plot '{plot.plot_name}' not found")
+        plot_classes.append(plot_class)
+
+    file_ids = list(dict.fromkeys(batch.file_ids))
+    filepaths = dict(session.exec(
+        select(C3DFile.id, C3DFile.filepath).where(C3DFile.id.in_(file_ids))
+    ).all())
+
+    def load(file_id: int) -> Dict[str, Any]:
+        filepath = filepaths.get(file_id)
+        if filepath is None:
+            return {'error': f"File with id {file_id} not found"}
+        if not os.path.exists(filepath):
+            return {'error': f"File not found at {filepath}"}
+        try:
+            return {'plot_data': PlotData.from_trial(load_trial(filepath))}
+        except Exception as e:
+            return {'error': f"Error reading C3D file: {str(e)}"}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(file_ids), MAX_CONCURRENT_DECODES))) as executor:
+        loaded = dict(zip(file_ids, executor.map(load, file_ids)))
+
+    results = []
+    for file_id in file_ids:
+        entry = loaded[file_id]
+        if 'error' in entry:
+            results.append({'file_id': file_id, 'error': entry['error']})
+            continue
+        plots = []
+        for plot, plot_class in zip(batch.plots, plot_classes):
+            try:
+                plots.append({'plot_name': plot.plot_name, **render_plot(plot_class, plot.parameters, entry['plot_data'])})
+            except HTTPException as e:
+                plots.append({'plot_name': plot.plot_name, 'error': e.detail})
+            except Exception as e:
+                plots.append({'plot_name': plot.plot_name, 'error': f"Error generating plot: {str(e)}"})
+        results.append({'file_id': file_id, 'plots': plots})
+
+    return json_response({'results': results})
+
+# Upper bound on percentile bands in an ensemble plot
+MAX_ENSEMBLE_PERCENTILES = 10
+
+@router.get("/plot/ensemble")
+def get_ensemble_plot(
+    group_id: int = Query(..., description="Trial group to aggregate"),
+    marker: Optional[str] = Query(None, description="Marker to plot (canonical names match across labs)"),
+    axis: str = Query("z", description="Marker coordinate: x, y or z"),
+    channel: Optional[str] = Query(None, description="Analog channel to plot, instead of a marker"),
+    event: Optional[str] = Query(None, description="Event delimiting cycles (e.g. Foot Strike); whole trials when omitted"),
+    side: Optional[str] = Query(None, description="Use indexed gait cycles of this side (Left/Right) instead of an event"),
+    percentiles: Optional[str] = Query(None, description="Comma-separated percentile bands, e.g. 5,95"),
     session: Session = Depends(get_db_session)
 ):
+    """
+    Mean ± SD (and percentile bands) of one marker coordinate or channel over every cycle in a group.
+
+    Trials are loaded in parallel; each cycle between consecutive occurrences
+    of `event`, or each indexed gait cycle of `side`, is time-normalized to
+    0-100 % on the server, so only the aggregate curves are returned. Files that cannot be used are listed in
+    `skipped`.
+    """
+    if (marker is None) == (channel is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of marker or channel")
+    if event is not None and side is not None:
+        raise HTTPException(status_code=400, detail="Give at most one of event or side")
+    if axis not in ("x", "y", "z"):
+        raise HTTPException(status_code=400, detail="axis must be x, y or z")
+    try:
+        bands = [float(p) for p in split_names(percentiles)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be numbers between 0 and 100")
+    if any(not 0 <= p <= 100 for p in bands) or len(bands) > MAX_ENSEMBLE_PERCENTILES:
+        raise HTTPException(status_code=400, detail=f"Give at most {MAX_ENSEMBLE_PERCENTILES} percentiles between 0 and 100")
+
+    group = session.get(TrialGroup, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    files = session.exec(
+        select(C3DFile.id, C3DFile.filepath)
+        .where(C3DFile.id.in_(select(GroupFileLink.file_id).where(GroupFileLink.group_id == group_id)))
+        .order_by(C3DFile.id)
+    ).all()
+    event_times: Dict[int, List[float]] = {}
+    if event is not None:
+        for file_id, event_time in session.exec(
+            select(Event.file_id, Event.event_time)
+            .join(Label, Label.id == Event.label_id)
+            .where(
+                Event.file_id.in_(select(GroupFileLink.file_id).where(GroupFileLink.group_id == group_id)),
+                Label.kind == "event",
+                Label.canonical_name == canonical_label("event", event)
+            )
+        ).all():
+            event_times.setdefault(file_id, []).append(event_time)
+    cycle_frames: Dict[int, List[tuple]] = {}
+    if side is not None:
+        for file_id, start_frame, end_frame in session.exec(
+            select(GaitCycle.file_id, GaitCycle.start_frame, GaitCycle.end_frame)
+            .where(*cycle_filters(group_id=group_id, side=side))
+        ).all():
+            cycle_frames.setdefault(file_id, []).append((start_frame, end_frame))
+
+    kind, name = ("marker", marker) if marker is not None else ("channel", channel)
+
+    def file_curves(file_id: int, filepath: str):
+        """Normalized cycles of one file, or a reason to skip it."""
+        if event is not None and len(event_times.get(file_id, [])) < 2:
+            return f"fewer than two '{event}' events"
+        if side is not None and file_id not in cycle_frames:
+            return f"no {side} gait cycles"
+        if not os.path.exists(filepath):
+            return f"file not found at {filepath}"
+        try:
+            trial = load_trial(filepath)
+        except Exception as e:
+            return f"error reading C3D file: {str(e)}"
+
+        if kind == "marker":
+            index = series_index(trial.marker_labels, kind, name)
+            series, rate = (trial.points[:, index, "xyz".index(axis)] if index is not None else None), trial.point_rate
+        else:
+            index = series_index(trial.channel_labels, kind, name)
+            series, rate = (trial.analogs[:, index] if index is not None else None), trial.analog_rate
+        if series is None:
+            return f"no {kind} '{name}'"
+
+        if side is not None:
+            # Indexed cycles are in trial frames
+            cycles = np.array(cycle_frames[file_id], dtype=np.float64) / trial.point_rate if trial.point_rate else np.empty((0, 2))
+        elif event is None:
+            cycles = np.array([[0.0, (len(series) - 1) / rate]]) if rate else np.empty((0, 2))
+        else:
+            # Event times count from the start of capture; the trial starts at first_frame
+            offset = trial.first_frame / trial.point_rate if trial.point_rate else 0.0
+            cycles = event_cycles(event_times[file_id]) - offset
+        curves = normalize_cycles(series, rate, cycles)
+        return curves if len(curves) else "no complete cycles"
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DECODES) as executor:
+        outcomes = list(executor.map(lambda row: file_curves(*row), files))
+
+    skipped = [
+        {'file_id': file_id, 'reason': outcome}
+        for (file_id, _), outcome in zip(files, outcomes) if isinstance(outcome, str)
+    ]
+    curves = [outcome for outcome in outcomes if not isinstance(outcome, str)]
+    if not curves:
+        raise HTTPException(status_code=404, detail={"message": "No cycles found in the group", "skipped": skipped})
+    curves = np.concatenate(curves)
+    summary = summarize(curves, bands)
+
+    label = f"{name} {axis.upper()}" if kind == "marker" else name
+    return json_response(encode_arrays({
+        'traces': ensemble_traces(summary, label),
+        'layout': {
+            'title': f"{group.name}: {label} ({len(curves)} cycles)",
+            'xaxis': {'title': '% trial' if event is None and side is None else '% cycle'},
+            'yaxis': {'title': 'Position (mm)' if kind == "marker" else 'Value'},
+            'showlegend': True,
+            'height': 600
+        },
+        'config': {'responsive': True},
+        'summary': {**summary, 'cycles': len(curves), 'files': len(files) - len(skipped)},
+        'skipped': skipped
+    }))
+
+# The plot view requests markers and channels of a file at the same moment
+label_flights = SingleFlight()
+
+def get_file_label_names(file_id: int) -> Optional[Dict[str, List[str]]]:
+    """Marker and channel names of a file, or None if it does not exist; concurrent calls share one lookup."""
+    def lookup():
+        with Session(dependencies.engine) as session:
+            if not session.get(C3DFile, file_id):
+                return None
+            return {
+                'markers': session.exec(select(Marker.marker_name).where(Marker.file_id == file_id)).all(),
+                'channels': session.exec(select(AnalogChannel.channel_name).where(AnalogChannel.file_id == file_id)).all()
+            }
+    return label_flights.do(file_id, lookup)
+
+def get_label_names_or_404(file_id: int) -> Dict[str, List[str]]:
+    names = get_file_label_names(file_id)
+    if names is None:
+        raise HTTPException(status_code=404, detail=f"File with id {file_id} not found")
+    return names
+
+# Route uses file_id query parameter
+@router.get("/plot/markers")
+def get_marker_names(file_id: int = Query(...)):
     """Get available marker names for a given file ID."""
     try:
-        file = get_file_or_404(file_id, session)
-        markers = session.exec(select(Marker).where(Marker.file_id == file.id)).all()
-        return {'markers': [marker.marker_name for marker in markers]}
+        return {'markers': get_label_names_or_404(file_id)['markers']}
         
     except HTTPException as http_exc:
         raise http_exc
@@ -121,15 +355,10 @@ def get_marker_names(
 
 # Route uses file_id query parameter
 @router.get("/plot/channels")
-def get_channel_names(
-    file_id: int = Query(...),
-    session: Session = Depends(get_db_session)
-):
+def get_channel_names(file_id: int = Query(...)):
     """Get available analog channel names for a given file ID."""
     try:
-        file = get_file_or_404(file_id, session)
-        channels = session.exec(select(AnalogChannel).where(AnalogChannel.file_id == file.id)).all()
-        return {'channels': [channel.channel_name for channel in channels]}
+        return {'channels': get_label_names_or_404(file_id)['channels']}
         
     except HTTPException as http_exc:
         raise http_exc
@@ -1,61 +1,65 @@
-from fastapi import APIRouter, Depends, Query
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session
-from typing import Any
-from models.search import SearchQuery
-from models.response import FileRead
+from models.search import SearchQuery, FileQuery
 from app import get_db_session, load_analyses
+from serialization import json_response
+from caching import QueryCache, canonical_key
+from models.generation import read_generation
 from models.c3d_file import C3DFile
-from models.marker import Marker, MarkerRead
-from models.channel import AnalogChannel, ChannelRead
-from models.event import Event, EventRead
+from models.marker import Marker
+from models.channel import AnalogChannel
+from models.event import Event
 from sqlmodel import select, col
-from sqlalchemy.sql import func
-import re
+from models.base import id_list_subquery
+from models.closure import scoped_file_ids
+from models.label import Label, label_tables, canonical_label
+from models.label_index import label_index, split_label_term
+from models.parameter import matching_parameter_file_ids
+from signal_stats import CHANNEL_SUMMARY_STATS, MARKER_QUALITY_STATS, STAT_OPERATORS, parse_stat_filter
+from sqlalchemy.sql import func, exists, or_
 
 router = APIRouter()
 
-@router.post("/search/", response_model=dict)
-def advanced_search(
-    search_query: SearchQuery,
-    limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0),
-    session: Session = Depends(get_db_session)
-):
-    """Advanced search with request body."""
-    return search_files(
-        filename=search_query.filename,
-        filename_regex=search_query.filename_regex,
-        subject=search_query.subject,
-        subject_regex=search_query.subject_regex,
-        classification=search_query.classification,
-        classification_regex=search_query.classification_regex,
-        session_name=search_query.session_name,
-        session_regex=search_query.session_regex,
-        min_duration=search_query.min_duration,
-        max_duration=search_query.max_duration,
-        min_frame_count=search_query.min_frame_count,
-        max_frame_count=search_query.max_frame_count,
-        marker=search_query.marker,
-        marker_regex=search_query.marker_regex,
-        channel=search_query.channel,
-        channel_regex=search_query.channel_regex,
-        event=search_query.event,
-        event_regex=search_query.event_regex,
-        analysis_name=search_query.analysis_name,
-        analysis_params=search_query.analysis_params,
-        limit=limit,
-        offset=offset,
-        session=session
-    )
+# Search counts and pages for the current database generation
+search_cache = QueryCache(max_entries=256)
+
+# Columns selectable with `fields=`; duration is derived in SQL
+FILE_COLUMNS = {
+    "id": C3DFile.id,
+    "filename": C3DFile.filename,
+    "filepath": C3DFile.filepath,
+    "file_size": C3DFile.file_size,
+    "date_added": C3DFile.date_added,
+    "frame_count": C3DFile.frame_count,
+    "sample_rate": C3DFile.sample_rate,
+    "duration": func.coalesce(C3DFile.frame_count * 1.0 / func.nullif(C3DFile.sample_rate, 0), 0.0),
+    "classification": C3DFile.classification,
+    "subject_name": C3DFile.subject_name,
+    "session_name": C3DFile.session_name,
+    "file_metadata": C3DFile.file_metadata,
+}
+
+# Lean default: every scalar column, no JSON metadata and no relations
+DEFAULT_FILE_FIELDS = tuple(name for name in FILE_COLUMNS if name != "file_metadata")
+
+# Relations loadable with `include=`, as (model, columns returned per item)
+FILE_RELATIONS = {
+    "markers": (Marker, (Marker.marker_name, Marker.coverage, Marker.gap_count, Marker.longest_gap, Marker.mean_residual)),
+    "channels": (AnalogChannel, (
+        AnalogChannel.channel_name, AnalogChannel.minimum, AnalogChannel.maximum, AnalogChannel.mean,
+        AnalogChannel.rms, AnalogChannel.saturation_count, AnalogChannel.nan_count
+    )),
+    "events": (Event, (Event.event_name, Event.event_time, Event.context, Event.event_frame)),
+}
 
-@router.get("/files/", response_model=dict)
-def get_search_files(
+def file_query_params(
     filename: str | None = None,
     filename_regex: bool = False,
-    subject: str | None = None,
-    subject_regex: bool = False,
     classification: str | None = None,
     classification_regex: bool = False,
+    subject: str | None = None,
+    subject_regex: bool = False,
     session_name: str | None = None,
     session_regex: bool = False,
     min_duration: float | None = None,
@@ -69,19 +73,38 @@ def get_search_files(
     event: str | None = None,
     event_regex: bool = False,
     analysis_name: str | None = None,
-    limit: int = Query(100, ge=1, le=10000),
-    offset: int = Query(0, ge=0),
-    count_only: bool = False,
-    session: Session = Depends(get_db_session)
-):
-    """Search for C3D files with various filters via GET endpoint."""
-    return search_files(
+    analysis_params: str | None = Query(None, description="JSON object of analysis parameters"),
+    classification_id: int | None = None,
+    subject_id: int | None = None,
+    session_id: int | None = None,
+    parameter: str | None = Query(None, description='C3D parameter filter, e.g. "ANALOG:RATE=1000"'),
+    marker_quality: str | None = Query(None, description='Marker statistic filters, e.g. "RHEE:coverage>=98"'),
+    channel_stats: str | None = Query(None, description='Channel statistic filters, e.g. "Force.Fz1:maximum>800"'),
+    labels_all: str | None = None,
+    labels_any: str | None = None,
+    labels_none: str | None = None
+) -> FileQuery:
+    """
+    Query-string file filters shared by every endpoint that selects files.
+    
+    Declared once so /files/, /search/files/, exports, facets and archives
+    always accept the same filters; use as `query: FileQuery = Depends(file_query_params)`.
+    """
+    # Analysis parameters arrive as a JSON string; invalid JSON is ignored
+    parsed_analysis_params = None
+    if analysis_params:
+        try:
+            parsed_analysis_params = json.loads(analysis_params)
+        except ValueError:
+            pass
+    
+    return FileQuery(
         filename=filename,
         filename_regex=filename_regex,
-        subject=subject,
-        subject_regex=subject_regex,
         classification=classification,
         classification_regex=classification_regex,
+        subject=subject,
+        subject_regex=subject_regex,
         session_name=session_name,
         session_regex=session_regex,
         min_duration=min_duration,
@@ -95,180 +118,331 @@ def get_search_files(
         event=event,
         event_regex=event_regex,
         analysis_name=analysis_name,
-        analysis_params=None,  # No analysis params for GET request
+        analysis_params=parsed_analysis_params,
+        classification_id=classification_id,
+        subject_id=subject_id,
+        session_id=session_id,
+        parameter=parameter,
+        marker_quality=marker_quality,
+        channel_stats=channel_stats,
+        labels_all=labels_all,
+        labels_any=labels_any,
+        labels_none=labels_none
+    )
+
+@router.post("/search/", response_model=dict)
+def advanced_search(
+    search_query: SearchQuery,
+    fields: str | None = Query(None, description="Comma-separated file columns to return"),
+    include: str | None = Query(None, description="Comma-separated relations to load: markers, channels, events"),
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_db_session)
+):
+    """Advanced search with request body."""
+    return json_response(search_files(
+        search_query.to_file_query(),
+        fields=fields,
+        include=include,
         limit=limit,
         offset=offset,
-        count_only=count_only,
         session=session
-    )
+    ))
+
+@router.get("/search/cache/stats", response_model=dict)
+def get_search_cache_stats():
+    """Hit rate, latency and size of the in-memory search result cache."""
+    return search_cache.stats()
 
 def search_files(
-    filename: str | None = None,
-    filename_regex: bool = False,
-    subject: str | None = None,
-    subject_regex: bool = False,
-    classification: str | None = None,
-    classification_regex: bool = False,
-    session_name: str | None = None,
-    session_regex: bool = False,
-    min_duration: float | None = None,
-    max_duration: float | None = None,
-    min_frame_count: int | None = None,
-    max_frame_count: int | None = None,
-    marker: str | None = None,
-    marker_regex: bool = False,
-    channel: str | None = None,
-    channel_regex: bool = False,
-    event: str | None = None,
-    event_regex: bool = False,
-    analysis_name: str | None = None,
-    analysis_params: dict[str, Any] | None = None,
-    limit: int = Query(100, ge=1, le=10000),
-    offset: int = Query(0, ge=0),
+    query: FileQuery,
+    fields: str | None = None,
+    include: str | None = None,
+    limit: int = 100,
+    offset: int = 0,
     count_only: bool = False,
-    session: Session = Depends(get_db_session)
+    session: Session = None
 ):
-    """Search for C3D files with various filters."""
-    query = select(C3DFile)
+    """
+    Search for C3D files with various filters.
     
-    # Handle text search filters
-    if filename:
-        if filename_regex:
-            query = query.where(C3DFile.filename.regexp_match(filename))
-        else:
-            query = query.where(col(C3DFile.filename).contains(filename))
-    if subject:
-        # Special handling for 'Unknown' subject
-        if subject == "Unknown":
-            query = query.where(C3DFile.subject_name == "")
-        else:
-            if subject_regex:
-                query = query.where(C3DFile.subject_name.regexp_match(subject))
-            else:
-                query = query.where(col(C3DFile.subject_name).contains(subject))
-    if classification:
-        # Special handling for 'Uncategorized' classification
-        if classification == "Uncategorized":
-            query = query.where(C3DFile.classification == "")
-        else:
-            if classification_regex:
-                query = query.where(C3DFile.classification.regexp_match(classification))
-            else:
-                query = query.where(col(C3DFile.classification).contains(classification))
-    if session_name:
-        # Special handling for 'Default' session
-        if session_name == "Default":
-            query = query.where(C3DFile.session_name == "")
-        else:
-            if session_regex:
-                query = query.where(C3DFile.session_name.regexp_match(session_name))
-            else:
-                query = query.where(col(C3DFile.session_name).contains(session_name))
+    Only the columns named in `fields` (default: every scalar column) are
+    selected, and markers/channels/events are loaded only when named in `include`.
+    """
+    # Read before the label bitsets are used, so results computed from bitsets
+    # that lag behind the generation are never cached under a newer version
+    index_version = label_index.version
+    filters = build_file_filters(query)
+    columns, relations = parse_fieldset(fields, include)
     
-    # Handle numeric range filters
-    if min_frame_count is not None:
-        query = query.where(C3DFile.frame_count >= min_frame_count)
-    if max_frame_count is not None:
-        query = query.where(C3DFile.frame_count <= max_frame_count)
+    # Counts and pages are cached per generation; any committed write invalidates them
+    generation, _ = read_generation(session.connection())
+    query_key = (query.model_dump(exclude_defaults=True), index_version)
     
-    # If count_only is True, return just the count
-    count_query = select(func.count(C3DFile.filepath)).filter(*query._where_criteria)
-    total_count = session.exec(count_query).one()
+    # Count all matches; every filter is applied in SQL so the count is exact
+    total_count = search_cache.get_or_compute(
+        generation,
+        canonical_key("count", query_key),
+        lambda: session.exec(select(func.count(C3DFile.id)).where(*filters)).one()
+    )
     
     if count_only:
         return {"total": total_count}
     
-    # Execute base query with pagination
-    files = session.exec(query.order_by(C3DFile.classification, C3DFile.subject_name, C3DFile.session_name, C3DFile.filename).offset(offset).limit(limit)).all()
-    
-    # For marker, channel, event, and duration filters, we need to post-process
-    result_files = []
-    filtered_count = 0
-    
-    for file in files:
-        # Calculate duration
-        duration = file.frame_count / file.sample_rate if file.sample_rate else 0.0
-        
-        # Apply duration filters
-        if min_duration is not None and duration < min_duration:
-            continue
-        if max_duration is not None and duration > max_duration:
-            continue
-        
-        # Get associated data
-        markers = session.exec(select(Marker).where(Marker.file_id == file.filepath)).all()
-        channels = session.exec(select(AnalogChannel).where(AnalogChannel.file_id == file.filepath)).all()
-        events = session.exec(select(Event).where(Event.file_id == file.filepath)).all()
-        
-        # Apply marker filter
-        if marker:
-            if marker_regex:
-                pattern = re.compile(marker, re.IGNORECASE)
-                if not any(bool(pattern.search(m.marker_name)) for m in markers):
-                    continue
-            elif not any(marker.lower() in m.marker_name.lower() for m in markers):
-                continue
-            
-        # Apply channel filter
-        if channel:
-            if channel_regex:
-                pattern = re.compile(channel, re.IGNORECASE)
-                if not any(bool(pattern.search(c.channel_name)) for c in channels):
-                    continue
-            elif not any(channel.lower() in c.channel_name.lower() for c in channels):
-                continue
-            
-        # Apply event filter
-        if event:
-            if event_regex:
-                pattern = re.compile(event, re.IGNORECASE)
-                if not any(bool(pattern.search(e.event_name)) for e in events):
-                    continue
-            elif not any(event.lower() in e.event_name.lower() for e in events):
-                continue
-        
-        # # Apply analysis filter
-        # if analysis_name:
-        #     analyses = load_analyses()
-        #     if analysis_name not in analyses:
-        #         continue
-        #     analysis_class = analyses[analysis_name]
-        #     analysis = analysis_class(parameters=analysis_params or {})
-        #     c3d = ezc3d.c3d(file.filepath)
-        #     result = analysis.analyze(c3d)
-        #     if not result["result"]:
-        #         continue
-        
-        filtered_count += 1
-        
-        # Include file in results with its related data
-        result_files.append(
-            FileRead(
-                id=file.id,
-                filename=file.filename,
-                filepath=file.filepath,
-                file_size=file.file_size,
-                date_added=file.date_added,
-                duration=file.frame_count / file.sample_rate if file.sample_rate else 0.0,
-                frame_count=file.frame_count,
-                sample_rate=file.sample_rate,
-                subject_name=file.subject_name,
-                classification=file.classification,
-                session_name=file.session_name,
-                file_metadata=file.file_metadata,
-                markers=[MarkerRead(marker_name=m.marker_name) for m in markers],
-                channels=[ChannelRead(channel_name=c.channel_name) for c in channels],
-                events=[EventRead(event_name=e.event_name, event_time=e.event_time) for e in events]
-            )
-        )
+    result_files = search_cache.get_or_compute(
+        generation,
+        canonical_key("page", query_key, columns, relations, offset, limit),
+        lambda: fetch_file_rows(session, filters, columns, relations, offset=offset, limit=limit)
+    )
     
     # Return pagination metadata along with results
     return {
         "files": result_files,
         "pagination": {
             "total": total_count,
-            "filtered": filtered_count,
+            "filtered": len(result_files),
             "offset": offset,
             "limit": limit
         }
     }
+
+def fetch_file_rows(
+    session: Session,
+    filters: list,
+    columns: list[str],
+    relations: list[str],
+    offset: int | None = None,
+    limit: int | None = None
+) -> list[dict]:
+    """
+    Select file rows as plain dicts, projecting only the requested columns.
+    
+    Relations are loaded for the whole page with one query per table; no ORM
+    objects or response models are built, so the rows can be serialized as-is.
+    """
+    # Executed on the connection so a single selected column still yields rows, not scalars
+    rows = session.connection().execute(
+        select(*[FILE_COLUMNS[name].label(name) for name in columns])
+        .where(*filters)
+        .order_by(C3DFile.classification, C3DFile.subject_name, C3DFile.session_name, C3DFile.filename)
+        .offset(offset)
+        .limit(limit)
+    ).mappings().all()
+    result_files = [dict(row) for row in rows]
+    attach_relations(session, result_files, relations)
+    return result_files
+
+def attach_relations(session: Session, files: list[dict], relations: list[str]) -> None:
+    """Load the requested relations for a batch of file dicts, one query per table."""
+    if not relations or not files:
+        return
+    file_ids = [file["id"] for file in files]
+    for relation in relations:
+        model, relation_columns = FILE_RELATIONS[relation]
+        keys = [column.key for column in relation_columns]
+        related: dict[int, list] = {}
+        for file_id, *values in session.exec(
+            select(model.file_id, *relation_columns).where(model.file_id.in_(file_ids))
+        ):
+            related.setdefault(file_id, []).append(dict(zip(keys, values)))
+        for file in files:
+            file[relation] = related.get(file["id"], [])
+
+def parse_fieldset(fields: str | None, include: str | None) -> tuple[list[str], list[str]]:
+    """
+    Resolve comma-separated `fields` and `include` parameters.
+    
+    Returns:
+        tuple: (file columns to select, relations to load); `id` is always selected
+    """
+    columns = split_names(fields) or list(DEFAULT_FILE_FIELDS)
+    relations = split_names(include)
+    
+    unknown = [name for name in columns if name not in FILE_COLUMNS]
+    unknown += [name for name in relations if name not in FILE_RELATIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. "
+                   f"Available fields: {', '.join(FILE_COLUMNS)}; includes: {', '.join(FILE_RELATIONS)}"
+        )
+    
+    if "id" not in columns:
+        columns.insert(0, "id")
+    return columns, relations
+
+def split_names(value: str | None) -> list[str]:
+    """Split a comma-separated parameter into a de-duplicated list of names."""
+    if not value:
+        return []
+    return list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+
+def text_filter(column, value: str, use_regex: bool, ignore_case: bool = False):
+    """Build a substring (LIKE) or regex criterion on a text column."""
+    if use_regex:
+        # Inline flag: SQLite evaluates REGEXP with Python's re module
+        return column.regexp_match(f"(?i){value}" if ignore_case else value)
+    return col(column).contains(value)
+
+def matching_label_ids(kind: str, value: str, use_regex: bool):
+    """
+    Select the ids of dictionary labels of one kind matching a substring or regex.
+    
+    Plain values also match every label sharing their canonical name, so
+    `LHEE` finds `L_HEE` and `Subject1:LHEE` through the canonical name index.
+    """
+    criterion = text_filter(Label.name, value, use_regex, ignore_case=True)
+    if not use_regex:
+        criterion = or_(criterion, Label.canonical_name == canonical_label(kind, value))
+    return select(Label.id).where(Label.kind == kind, criterion)
+
+def label_term_exists(term: str):
+    """SQL criterion: the file has a label matching the term (see LabelBitmapIndex.label_ids)."""
+    kinds, term = split_label_term(term)
+    criteria = []
+    for kind in kinds:
+        model, _ = label_tables()[kind]
+        criteria.append(exists().where(
+            model.file_id == C3DFile.id,
+            model.label_id.in_(select(Label.id).where(
+                Label.kind == kind,
+                Label.canonical_name == canonical_label(kind, term)
+            ))
+        ))
+    return or_(*criteria)
+
+# Statistics stored per label row at ingest, filterable per kind
+LABEL_STATS = {
+    "marker": MARKER_QUALITY_STATS,
+    "channel": CHANNEL_SUMMARY_STATS,
+}
+
+def label_stat_exists(kind: str, expression: str):
+    """
+    SQL criterion: the file has a label of this kind, matched by canonical
+    name, whose stored statistic satisfies the expression (e.g.
+    `RHEE:coverage>=98` or `Force.Fz1:maximum>800`).
+    
+    Rows ingested before statistics were stored never match.
+    """
+    name, stat, operator, value = parse_stat_filter(expression, LABEL_STATS[kind])
+    model, _ = label_tables()[kind]
+    return exists().where(
+        model.file_id == C3DFile.id,
+        model.label_id.in_(select(Label.id).where(
+            Label.kind == kind,
+            Label.canonical_name == canonical_label(kind, name)
+        )),
+        STAT_OPERATORS[operator](getattr(model, stat), value)
+    )
+
+def label_set_filters(query: FileQuery) -> list:
+    """
+    Criteria for the all/any/none label presence predicates.
+    
+    The sets are evaluated on the label bitmap index and passed to SQL as one
+    JSON-encoded id list (see `id_list_subquery`); without a loaded index
+    they fall back to EXISTS joins.
+    """
+    all_terms = split_names(query.labels_all)
+    any_terms = split_names(query.labels_any)
+    none_terms = split_names(query.labels_none)
+    if not (all_terms or any_terms or none_terms):
+        return []
+    
+    if not label_index.loaded:
+        filters = [label_term_exists(term) for term in all_terms]
+        if any_terms:
+            filters.append(or_(*[label_term_exists(term) for term in any_terms]))
+        filters.extend(~label_term_exists(term) for term in none_terms)
+        return filters
+    
+    included, excluded = label_index.select(all_terms, any_terms, none_terms)
+    if included is not None:
+        return [C3DFile.id.in_(id_list_subquery(included))]
+    return [C3DFile.id.not_in(id_list_subquery(excluded))]
+
+def build_file_filters(query: FileQuery) -> list:
+    """
+    Translate a file query into SQL criteria on C3DFile.
+    
+    Every filter, including marker/channel/event content and duration, is
+    expressed in SQL so the criteria can be reused for counts, pagination and
+    server-side INSERT ... SELECT statements.
+    
+    Returns:
+        list: Criteria to pass to `.where(*filters)`
+    """
+    filters = []
+    
+    # Restrict to hierarchy subtrees via the closure table
+    for scope in scoped_file_ids(query.classification_id, query.subject_id, query.session_id):
+        filters.append(C3DFile.id.in_(scope))
+    
+    # Handle text search filters
+    if query.filename:
+        filters.append(text_filter(C3DFile.filename, query.filename, query.filename_regex))
+    if query.subject:
+        # Special handling for 'Unknown' subject
+        if query.subject == "Unknown":
+            filters.append(C3DFile.subject_name == "")
+        else:
+            filters.append(text_filter(C3DFile.subject_name, query.subject, query.subject_regex))
+    if query.classification:
+        # Special handling for 'Uncategorized' classification
+        if query.classification == "Uncategorized":
+            filters.append(C3DFile.classification == "")
+        else:
+            filters.append(text_filter(C3DFile.classification, query.classification, query.classification_regex))
+    if query.session_name:
+        # Special handling for 'Default' session
+        if query.session_name == "Default":
+            filters.append(C3DFile.session_name == "")
+        else:
+            filters.append(text_filter(C3DFile.session_name, query.session_name, query.session_regex))
+    
+    # Handle numeric range filters
+    if query.min_frame_count is not None:
+        filters.append(C3DFile.frame_count >= query.min_frame_count)
+    if query.max_frame_count is not None:
+        filters.append(C3DFile.frame_count <= query.max_frame_count)
+    duration = C3DFile.frame_count / C3DFile.sample_rate
+    if query.min_duration is not None:
+        filters.append(duration >= query.min_duration)
+    if query.max_duration is not None:
+        filters.append(duration <= query.max_duration)
+    
+    # Content filters match labels case-insensitively in the label dictionary,
+    # then select files by integer label id
+    content_filters = (
+        (Marker, "marker", query.marker, query.marker_regex),
+        (AnalogChannel, "channel", query.channel, query.channel_regex),
+        (Event, "event", query.event, query.event_regex),
+    )
+    for model, kind, value, use_regex in content_filters:
+        if value:
+            filters.append(exists().where(
+                model.file_id == C3DFile.id,
+                model.label_id.in_(matching_label_ids(kind, value, use_regex))
+            ))
+    
+    # Parameter filters are index lookups in the deduplicated parameter store
+    if query.parameter:
+        try:
+            filters.append(C3DFile.id.in_(matching_parameter_file_ids(query.parameter)))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    # Statistic filters are range scans over values stored per label at ingest
+    stat_filters = (("marker", query.marker_quality), ("channel", query.channel_stats))
+    for kind, expressions in stat_filters:
+        for expression in split_names(expressions):
+            try:
+                filters.append(label_stat_exists(kind, expression))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+    
+    filters.extend(label_set_filters(query))
+    
+    # Analysis filters are not evaluated in search yet (they require loading the C3D data)
+    return filters
@@ -9,6 +9,8 @@ from models import (
     Subject, SubjectCreate, SubjectUpdate, SubjectRead,
     Classification, Session as SessionModel
 )
+from models.closure import reparent_subject, scoped_file_ids
+from routers.groups import refresh_smart_groups
 
 router = APIRouter(
     prefix="/subjects",
@@ -88,7 +90,7 @@ def get_subject(
     session_count = db.exec(
         select(func.count()).where(SessionModel.subject_id == subject.id)
     ).one()
-    subject_dict["session_count"] = session_count[0]
+    subject_dict["session_count"] = session_count
     
     return subject_dict
 
@@ -114,9 +116,19 @@ def update_subject(
     
     # Update attributes from the request
     update_data = subject_update.dict(exclude_unset=True)
+    reparented = (
+        "classification_id" in update_data
+        and update_data["classification_id"] != db_subject.classification_id
+    )
     for key, value in update_data.items():
         setattr(db_subject, key, value)
     
+    # Move the subject's trials to the new classification in the closure table
+    if reparented:
+        reparent_subject(db, subject_id, update_data["classification_id"])
+        file_ids = db.exec(scoped_file_ids(subject_id=subject_id)[0]).all()
+        refresh_smart_groups(db, list(file_ids))
+    
     db.add(db_subject)
     db.commit()
     db.refresh(db_subject)
@@ -126,7 +138,7 @@ def update_subject(
     session_count = db.exec(
         select(func.count()).where(SessionModel.subject_id == subject_id)
     ).one()
-    subject_dict["session_count"] = session_count[0]
+    subject_dict["session_count"] = session_count
     
     return subject_dict
 
@@ -144,7 +156,7 @@ def delete_subject(
     session_count = db.exec(
         select(func.count()).where(SessionModel.subject_id == subject_id)
     ).one()
-    if session_count[0] > 0:
+    if session_count > 0:
         raise HTTPException(
             status_code=400, 
             detail="Cannot delete subject with associated sessions. Remove sessions first."
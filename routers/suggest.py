@@ -0,0 +1,34 @@
+"""
+Router for autocompleting marker, channel, event and subject names.
+"""
+from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from models.label_index import label_index
+from models.suggestion import subject_index
+
+router = APIRouter(
+    prefix="/suggest",
+    tags=["suggest"],
+)
+
+SUGGESTION_KINDS = ("marker", "channel", "event", "subject")
+
+@router.get("/", response_model=List[dict])
+def get_suggestions(
+    kind: str = Query(..., description="Vocabulary: marker, channel, event or subject"),
+    prefix: str = Query("", description="Case-insensitive name prefix"),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Complete a name prefix from the in-memory vocabulary.
+
+    Suggestions are ranked by the number of files using each name; no database
+    query is run, so this is cheap enough to call on every keystroke.
+    """
+    if kind not in SUGGESTION_KINDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown kind '{kind}'. Available kinds: {', '.join(SUGGESTION_KINDS)}"
+        )
+    index = subject_index if kind == "subject" else label_index.vocabularies[kind]
+    return index.complete(prefix, limit)
@@ -7,14 +7,21 @@ from sqlmodel import Session, select, func
 from dependencies import get_db_session
 from models import (
     Trial, TrialCreate, TrialUpdate, TrialRead,
-    Session as SessionModel, C3DFile
+    Session as SessionModel, C3DFile, HierarchyClosure
 )
+from models.closure import index_trial, update_trial_file, remove_trial
+from routers.groups import refresh_smart_groups
+from pydantic import TypeAdapter
+from serialization import validated_response
 
 router = APIRouter(
     prefix="/trials",
     tags=["trials"],
 )
 
+# Built once; validates and serializes whole trial lists in pydantic-core
+TRIAL_LIST_ADAPTER = TypeAdapter(List[TrialRead])
+
 @router.post("/", response_model=TrialRead)
 def create_trial(
     trial: TrialCreate,
@@ -40,6 +47,11 @@ def create_trial(
         )
     
     db.add(db_trial)
+    db.flush()  # Assign the trial id for the closure rows
+    
+    # Register the trial under its session, subject and classification
+    index_trial(db, db_trial)
+    refresh_smart_groups(db, [db_trial.c3d_file_id])
     db.commit()
     db.refresh(db_trial)
     
@@ -52,12 +64,33 @@ def get_trials(
     name: Optional[str] = Query(None, description="Filter by name"),
     session_id: Optional[int] = Query(None, description="Filter by session ID"),
     c3d_file_id: Optional[int] = Query(None, description="Filter by C3D file ID"),
+    subject_id: Optional[int] = Query(None, description="Filter by subject ID (across all sessions)"),
+    classification_id: Optional[int] = Query(None, description="Filter by classification ID (across all subjects)"),
     has_results: Optional[bool] = Query(None, description="Filter by presence of results"),
     db: Session = Depends(get_db_session)
 ):
     """Get a list of trials with optional filtering."""
     query = select(Trial)
     
+    # Resolve subtree scopes with a single join on the closure table
+    if classification_id is not None or subject_id is not None:
+        ancestor_type, ancestor_id = (
+            ("subject", subject_id) if subject_id is not None
+            else ("classification", classification_id)
+        )
+        query = query.join(HierarchyClosure, HierarchyClosure.trial_id == Trial.id).where(
+            HierarchyClosure.ancestor_type == ancestor_type,
+            HierarchyClosure.ancestor_id == ancestor_id
+        )
+        # Both given: the subject must also sit under the requested classification
+        if subject_id is not None and classification_id is not None:
+            query = query.where(Trial.id.in_(
+                select(HierarchyClosure.trial_id).where(
+                    HierarchyClosure.ancestor_type == "classification",
+                    HierarchyClosure.ancestor_id == classification_id
+                )
+            ))
+    
     # Apply filters
     if name:
         query = query.where(Trial.name.contains(name))
@@ -73,7 +106,7 @@ def get_trials(
     
     trials = db.exec(query.offset(skip).limit(limit)).all()
     
-    return [trial.dict() for trial in trials]
+    return validated_response(TRIAL_LIST_ADAPTER, trials)
 
 @router.get("/{trial_id}", response_model=TrialRead)
 def get_trial(
@@ -112,23 +145,25 @@ def update_trial(
     
     # Special handling for nested JSON fields (parameters, results)
     if "parameters" in update_data and update_data["parameters"] is not None:
-        # Merge existing parameters with new ones
-        if db_trial.parameters is None:
-            db_trial.parameters = {}
-        db_trial.parameters.update(update_data["parameters"])
+        # Merge existing parameters with new ones; assign a new dict so the change is tracked
+        db_trial.parameters = {**(db_trial.parameters or {}), **update_data["parameters"]}
         del update_data["parameters"]
         
     if "results" in update_data and update_data["results"] is not None:
-        # Merge existing results with new ones
-        if db_trial.results is None:
-            db_trial.results = {}
-        db_trial.results.update(update_data["results"])
+        # Merge existing results with new ones; assign a new dict so the change is tracked
+        db_trial.results = {**(db_trial.results or {}), **update_data["results"]}
         del update_data["results"]
     
     # Update remaining fields
+    previous_file_id = db_trial.c3d_file_id
     for key, value in update_data.items():
         setattr(db_trial, key, value)
     
+    if "c3d_file_id" in update_data and update_data["c3d_file_id"] is not None:
+        update_trial_file(db, trial_id, update_data["c3d_file_id"])
+        # Both files may have entered or left hierarchy-scoped smart groups
+        refresh_smart_groups(db, [previous_file_id, update_data["c3d_file_id"]])
+    
     db.add(db_trial)
     db.commit()
     db.refresh(db_trial)
@@ -146,10 +181,8 @@ def update_trial_results(
     if not db_trial:
         raise HTTPException(status_code=404, detail="Trial not found")
     
-    # Merge existing results with new ones
-    if db_trial.results is None:
-        db_trial.results = {}
-    db_trial.results.update(results)
+    # Merge existing results with new ones; assign a new dict so the change is tracked
+    db_trial.results = {**(db_trial.results or {}), **results}
     
     db.add(db_trial)
     db.commit()
@@ -167,7 +200,9 @@ def delete_trial(
     if not db_trial:
         raise HTTPException(status_code=404, detail="Trial not found")
     
+    remove_trial(db, trial_id)
     db.delete(db_trial)
+    refresh_smart_groups(db, [db_trial.c3d_file_id])
     db.commit()
     
     return None 
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Fast response serialization helpers.
+
+List endpoints return plain dicts built straight from SQL rows. Returning a
+`Response` instance skips FastAPI's `jsonable_encoder` pass, and orjson
+serializes datetimes and NumPy values natively. Where a response model is
+still validated, pre-built `TypeAdapter`s validate and dump the whole list in
+pydantic-core in one call.
+
+`encode_arrays` prepares NumPy arrays nested in a response: orjson writes
+C-contiguous arrays directly, without building per-element Python lists.
+
+`ChunkSink` lets writers that expect a file object (Arrow, zipfile) feed a
+streaming response chunk by chunk.
+"""
+import io
+from typing import Any, Iterable
+import numpy as np
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson  # noqa: F401  (ORJSONResponse imports it lazily)
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+    HAS_ORJSON = True
+except ImportError:
+    FastJSONResponse = JSONResponse
+    HAS_ORJSON = False
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    """Serialize plain dicts/lists without a `jsonable_encoder` pass when orjson is available."""
+    if not HAS_ORJSON:
+        content = jsonable_encoder(content)
+    return FastJSONResponse(content, status_code=status_code)
+
+def encode_arrays(content: Any) -> Any:
+    """
+    Make NumPy arrays and scalars nested in dicts and lists serializable by `json_response`.
+
+    With orjson, arrays only need to be C-contiguous (views are copied);
+    otherwise they become lists with NaN written as None.
+    """
+    if isinstance(content, np.ndarray):
+        if HAS_ORJSON and content.dtype.kind in "biuf":
+            return np.ascontiguousarray(content)
+        if content.dtype.kind == "f":
+            values = content.astype(object)
+            values[np.isnan(content)] = None
+            return values.tolist()
+        return content.tolist()
+    if isinstance(content, np.generic):
+        return content.item()
+    if isinstance(content, dict):
+        return {key: encode_arrays(value) for key, value in content.items()}
+    if isinstance(content, (list, tuple)):
+        return [encode_arrays(value) for value in content]
+    return content
+
+def validated_response(adapter: TypeAdapter, items: Iterable[Any]) -> Response:
+    """Validate ORM objects or dicts against a pre-built list adapter and dump them to JSON bytes."""
+    validated = adapter.validate_python(list(items), from_attributes=True)
+    return Response(content=adapter.dump_json(validated), media_type="application/json")
+
+class ChunkSink(io.RawIOBase):
+    """Unseekable writable file object collecting written bytes until drained."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self.chunks.append(chunk)
+        return len(chunk)
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain."""
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
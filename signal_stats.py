@@ -0,0 +1,177 @@
+"""
+Per-label signal statistics computed once at ingest.
+
+Statistics are computed for every marker or analog channel of a trial at
+once from the arrays the ingest extractor already holds in memory, and
+stored alongside the per-file label rows so search can filter on them with
+range predicates instead of opening C3D files.
+"""
+import operator
+import re
+import warnings
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Marker quality statistics, as stored on Marker rows
+MARKER_QUALITY_STATS = ("coverage", "gap_count", "longest_gap", "mean_residual")
+
+# Analog channel summary statistics, as stored on AnalogChannel rows
+CHANNEL_SUMMARY_STATS = ("minimum", "maximum", "mean", "rms", "saturation_count", "nan_count")
+
+# Comparison operators accepted in statistic filters
+STAT_OPERATORS = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    "!=": operator.ne,
+    "=": operator.eq,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+_STAT_FILTER = re.compile(r"^\s*(.+?)\s*:\s*(\w+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$")
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+def marker_quality(points: np.ndarray, residuals: Optional[np.ndarray] = None) -> List[Dict[str, object]]:
+    """
+    Quality statistics for every marker of a trial.
+
+    A frame is valid when all three coordinates are finite and the residual,
+    if present, is not negative (the C3D convention for an invalid sample).
+    A gap is a run of consecutive invalid frames, including runs at the start
+    or end of the trial.
+
+    Args:
+        points: (3 or 4, markers, frames) coordinates as returned by ezc3d
+        residuals: (markers, frames) residuals, or None if unavailable
+
+    Returns:
+        list: Per marker, {coverage (% valid frames), gap_count, longest_gap
+              (frames), mean_residual (over valid frames, None without any)}
+    """
+    points = np.asarray(points, dtype=np.float64)
+    markers, frames = points.shape[1], points.shape[2]
+    valid = np.isfinite(points[:3]).all(axis=0)
+    if residuals is not None:
+        residuals = np.asarray(residuals, dtype=np.float64).reshape(markers, frames)
+        valid &= ~(residuals < 0)
+
+    # Gap boundaries: +1 where an invalid run starts, -1 just after it ends
+    edges = np.diff(np.pad((~valid).astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    start_rows, start_frames = np.nonzero(edges == 1)
+    _, end_frames = np.nonzero(edges == -1)
+    lengths = end_frames - start_frames
+    gap_count = np.bincount(start_rows, minlength=markers)
+    longest_gap = np.zeros(markers, dtype=np.int64)
+    np.maximum.at(longest_gap, start_rows, lengths)
+
+    valid_count = valid.sum(axis=1)
+    coverage = valid_count * 100.0 / frames if frames else np.full(markers, np.nan)
+    mean_residual = np.full(markers, np.nan)
+    if residuals is not None:
+        totals = np.where(valid, residuals, 0.0).sum(axis=1)
+        np.divide(totals, valid_count, out=mean_residual, where=valid_count > 0)
+
+    return [
+        {
+            "coverage": _optional(coverage[index]),
+            "gap_count": int(gap_count[index]),
+            "longest_gap": int(longest_gap[index]),
+            "mean_residual": _optional(mean_residual[index]),
+        }
+        for index in range(markers)
+    ]
+
+def analog_saturation_limits(parameters, channels: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Scaled (low, high) values at which each analog channel is saturated.
+
+    Analog values are stored as (raw - OFFSET) * SCALE * GEN_SCALE, so the
+    ends of the ADC range follow from ANALOG:BITS and ANALOG:FORMAT; the
+    limits sit half an ADC step inside them to absorb rounding. Files without
+    ANALOG:BITS (typically stored as floats) have no meaningful ADC range
+    and return None.
+    """
+    group = parameters.get("ANALOG", {})
+    bits = np.asarray(group.get("BITS", {}).get("value", []), dtype=np.float64).ravel()
+    if not bits.size or not channels:
+        return None
+
+    def per_channel(name: str, default: float) -> np.ndarray:
+        values = np.asarray(group.get(name, {}).get("value", []), dtype=np.float64).ravel()
+        return np.resize(values, channels) if values.size else np.full(channels, default)
+
+    formats = group.get("FORMAT", {}).get("value", [])
+    unsigned = bool(formats) and str(formats[0]).strip().upper() == "UNSIGNED"
+    raw_low, raw_high = (0.0, 2.0 ** bits[0] - 1) if unsigned else (-(2.0 ** (bits[0] - 1)), 2.0 ** (bits[0] - 1) - 1)
+    gain = per_channel("SCALE", 1.0) * per_channel("GEN_SCALE", 1.0)[0]
+    offset = per_channel("OFFSET", 0.0)
+    ends = np.stack(((raw_low - offset) * gain, (raw_high - offset) * gain))
+    half_step = np.abs(gain) / 2
+    return ends.min(axis=0) + half_step, ends.max(axis=0) - half_step
+
+def analog_summary(
+    analogs: np.ndarray,
+    limits: Optional[Tuple[np.ndarray, np.ndarray]] = None
+) -> List[Dict[str, object]]:
+    """
+    Summary statistics for every analog channel of a trial.
+
+    Args:
+        analogs: (channels, samples) scaled analog values
+        limits: Per-channel (low, high) saturation values (see
+                `analog_saturation_limits`); without them saturation_count is None
+
+    Returns:
+        list: Per channel, {minimum, maximum, mean, rms, saturation_count,
+              nan_count}; value statistics ignore NaN samples and are None
+              for channels without any finite sample
+    """
+    analogs = np.asarray(analogs, dtype=np.float64)
+    with warnings.catch_warnings():
+        # All-NaN channels reduce to NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        minimum = np.nanmin(analogs, axis=1) if analogs.shape[1] else np.full(len(analogs), np.nan)
+        maximum = np.nanmax(analogs, axis=1) if analogs.shape[1] else np.full(len(analogs), np.nan)
+        mean = np.nanmean(analogs, axis=1)
+        rms = np.sqrt(np.nanmean(np.square(analogs), axis=1))
+    nan_count = np.isnan(analogs).sum(axis=1)
+
+    saturation_count = None
+    if limits is not None:
+        low, high = limits
+        saturation_count = ((analogs <= low[:, None]) | (analogs >= high[:, None])).sum(axis=1)
+
+    return [
+        {
+            "minimum": _optional(minimum[index]),
+            "maximum": _optional(maximum[index]),
+            "mean": _optional(mean[index]),
+            "rms": _optional(rms[index]),
+            "saturation_count": int(saturation_count[index]) if saturation_count is not None else None,
+            "nan_count": int(nan_count[index]),
+        }
+        for index in range(len(analogs))
+    ]
+
+def parse_stat_filter(expression: str, stats: Sequence[str]) -> Tuple[str, str, str, float]:
+    """
+    Split a filter such as `RHEE:coverage>=98` into (label, statistic, operator, value).
+
+    Raises:
+        ValueError: If the expression is not LABEL:STAT<op>NUMBER with a statistic in `stats`
+    """
+    match = _STAT_FILTER.match(expression)
+    if not match:
+        raise ValueError(
+            f"Invalid statistic filter '{expression}', expected LABEL:STAT<op>NUMBER "
+            f"with one of {', '.join(STAT_OPERATORS)}"
+        )
+    name, stat, op, value = match.groups()
+    if stat.lower() not in stats:
+        raise ValueError(f"Unknown statistic '{stat}', expected one of {', '.join(stats)}")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"Statistic filter '{expression}' requires a numeric value")
+    return name, stat.lower(), op, number
@@ -27,6 +27,13 @@ document.addEventListener('DOMContentLoaded', function() {
                     analysis_name: '',
                     analysis_params: '{}'
                 },
+                // Autocomplete suggestions per filter input (see fetchSuggestions)
+                suggestions: {
+                    subject: [],
+                    marker: [],
+                    channel: [],
+                    event: []
+                },
                 classifications: [],
                 subjects: [],
                 sessions: [],
@@ -346,6 +353,24 @@ document.addEventListener('DOMContentLoaded', function() {
                 
                 return tree;
             },
+            fetchSuggestions(kind, prefix) {
+                // Suggestions are literal names; skip them while typing a regex
+                if (this.searchFilters[kind].use_regex) {
+                    this.suggestions[kind] = [];
+                    return;
+                }
+                fetch(`/api/suggest/?kind=${kind}&prefix=${encodeURIComponent(prefix)}&limit=10`)
+                    .then(response => response.json())
+                    .then(data => {
+                        // Ignore responses for a prefix the user has already typed past
+                        if (this.searchFilters[kind].value === prefix) {
+                            this.suggestions[kind] = data;
+                        }
+                    })
+                    .catch(error => {
+                        console.error(`Error fetching ${kind} suggestions:`, error);
+                    });
+            },
             toggleRegex(field) {
                 if (this.searchFilters[field]) {
                     this.searchFilters[field].use_regex = !this.searchFilters[field].use_regex;
@@ -503,7 +528,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 this.fileDetailsModal.show();
                 
                 // Check if we were passed a file object directly
-                if (typeof fileIdOrObject === 'object' && fileIdOrObject !== null) {
+                if (typeof fileIdOrObject === 'object' && fileIdOrObject !== null && fileIdOrObject.markers) {
                     // We have the file object already - no need to fetch
                     const file = fileIdOrObject;
                     this.renderFileDetails(file, modalTitle, modalBody, downloadBtn);
@@ -511,7 +536,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
                 
                 // Otherwise, treat it as a file ID
-                const fileId = fileIdOrObject;
+                const fileId = typeof fileIdOrObject === 'object' && fileIdOrObject !== null
+                    ? fileIdOrObject.id : fileIdOrObject;
                 
                 // Try to get the file from our file cache first (files or groupFiles)
                 let targetFile = null;
@@ -522,8 +548,9 @@ document.addEventListener('DOMContentLoaded', function() {
                     targetFile = this.files.find(f => f.id === fileId);
                 }
                 
-                // If we found the file in our cache, use it directly 
-                if (targetFile) {
+                // If we found the file in our cache, use it directly; list rows
+                // carry no markers/channels/events unless requested with `include`
+                if (targetFile && targetFile.markers && targetFile.channels && targetFile.events) {
                     this.renderFileDetails(targetFile, modalTitle, modalBody, downloadBtn);
                     return;
                 }
@@ -554,6 +581,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Helper method to render file details
             renderFileDetails(file, modalTitle, modalBody, downloadBtn) {
+                file = { ...file, markers: file.markers || [], channels: file.channels || [], events: file.events || [] };
                 modalTitle.innerText = file.filename;
                 const markerBadges = file.markers.map(m => 
                     `<span class="badge bg-secondary marker-badge">${m.marker_name}</span>`
@@ -615,7 +643,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     </div>
                 `;
                 downloadBtn.style.display = 'block';
-                downloadBtn.href = `/api/files/download?path=${encodeURIComponent(file.filepath)}`;
+                downloadBtn.href = `/api/files/${file.id}/download`;
             },
             deleteFile(fileId) {
                 if (!confirm('Are you sure you want to delete this file? This action cannot be undone.')) {
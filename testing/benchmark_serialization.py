@@ -0,0 +1,158 @@
+"""
+Benchmark the file list response paths at large page sizes.
+
+Compares the previous path (ORM rows -> FileRead/MarkerRead/... models ->
+jsonable_encoder -> json) with the current one (projected SQL rows -> dicts
+-> orjson), and times the HTTP endpoints end to end.
+
+Usage (from the repository root):
+    python testing/benchmark_serialization.py [--rows 10000] [--repeat 5]
+
+The database is copied to a temporary file and padded with duplicated file
+rows until it holds `--rows` files, so c3d_database.db is never modified.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlmodel import Session, create_engine, select, func, text
+
+import app as app_module
+import dependencies
+from models.c3d_file import C3DFile
+from models.marker import Marker, MarkerRead
+from models.channel import AnalogChannel, ChannelRead
+from models.event import Event, EventRead
+from models.response import FileRead
+from routers.search import fetch_file_rows, FILE_COLUMNS, FILE_RELATIONS, DEFAULT_FILE_FIELDS
+from serialization import HAS_ORJSON
+
+def pad_database(engine, rows: int) -> int:
+    """Duplicate file rows (with their markers, channels and events) until `rows` files exist."""
+    with Session(engine) as session:
+        count = session.exec(select(func.count(C3DFile.id))).one()
+        if not count:
+            raise SystemExit("The database has no files to duplicate; scan a directory first")
+        copy = 0
+        while count < rows:
+            copy += 1
+            suffix = f"#copy{copy}"
+            session.exec(text(
+                f"INSERT INTO {C3DFile.__tablename__} "
+                "(filename, file_size, date_added, frame_count, sample_rate, filepath, "
+                " classification, session_name, subject_name, file_metadata) "
+                "SELECT filename, file_size, date_added, frame_count, sample_rate, filepath || :suffix, "
+                " classification, session_name, subject_name, file_metadata "
+                f"FROM {C3DFile.__tablename__} WHERE filepath NOT LIKE '%#copy%' LIMIT :remaining"
+            ).bindparams(suffix=suffix, remaining=rows - count))
+            for model, columns in (
+                (Marker, "marker_name, label_id"),
+                (AnalogChannel, "channel_name, label_id"),
+                (Event, "event_name, event_time, label_id"),
+            ):
+                session.exec(text(
+                    f"INSERT INTO {model.__tablename__} (file_id, {columns}) "
+                    f"SELECT copy.id, {', '.join('item.' + c.strip() for c in columns.split(','))} "
+                    f"FROM {C3DFile.__tablename__} copy "
+                    f"JOIN {C3DFile.__tablename__} original ON copy.filepath = original.filepath || :suffix "
+                    f"JOIN {model.__tablename__} item ON item.file_id = original.id"
+                ).bindparams(suffix=suffix))
+            count = session.exec(select(func.count(C3DFile.id))).one()
+        session.commit()
+        return count
+
+def legacy_page(session: Session, limit: int) -> bytes:
+    """Previous path: ORM objects, response models, jsonable_encoder and json."""
+    files = session.exec(
+        select(C3DFile)
+        .order_by(C3DFile.classification, C3DFile.subject_name, C3DFile.session_name, C3DFile.filename)
+        .limit(limit)
+    ).all()
+    file_ids = [file.id for file in files]
+    related = {}
+    for model in (Marker, AnalogChannel, Event):
+        for row in session.exec(select(model).where(model.file_id.in_(file_ids))).all():
+            related.setdefault((model, row.file_id), []).append(row)
+    result = [
+        FileRead(
+            id=file.id,
+            filename=file.filename,
+            filepath=file.filepath,
+            file_size=file.file_size,
+            date_added=file.date_added,
+            frame_count=file.frame_count,
+            sample_rate=file.sample_rate,
+            subject_name=file.subject_name,
+            classification=file.classification,
+            session_name=file.session_name,
+            file_metadata=file.file_metadata,
+            markers=[MarkerRead(marker_name=m.marker_name) for m in related.get((Marker, file.id), [])],
+            channels=[ChannelRead(channel_name=c.channel_name) for c in related.get((AnalogChannel, file.id), [])],
+            events=[EventRead(event_name=e.event_name, event_time=e.event_time) for e in related.get((Event, file.id), [])]
+        )
+        for file in files
+    ]
+    return json.dumps(jsonable_encoder({"files": result})).encode()
+
+def fast_page(session: Session, limit: int, columns, relations) -> bytes:
+    """Current path: projected rows as dicts, serialized by orjson when available."""
+    rows = fetch_file_rows(session, [], list(columns), list(relations), limit=limit)
+    if HAS_ORJSON:
+        import orjson
+        return orjson.dumps({"files": rows})
+    return json.dumps(jsonable_encoder({"files": rows})).encode()
+
+def timed(label: str, repeat: int, func_):
+    """Run `func_` `repeat` times and print the best time and payload size."""
+    best, size = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(func_())
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<48} {best * 1000:9.1f} ms {size / 1024:10.1f} KiB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="files in the padded database and page size")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (best is reported)")
+    parser.add_argument("--database", default="c3d_database.db", help="database to copy")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "benchmark.db")
+        shutil.copyfile(args.database, database)
+        engine = create_engine(f"sqlite:///{database}")
+
+        # Point the app at the copy before its lifespan runs
+        app_module.engine = engine
+        dependencies.engine = engine
+
+        with TestClient(app_module.app) as client:
+            total = pad_database(engine, args.rows)
+            print(f"{total} files, limit={args.rows}, orjson={'yes' if HAS_ORJSON else 'no'}\n")
+
+            with Session(engine) as session:
+                timed("legacy: FileRead + jsonable_encoder (full)", args.repeat,
+                      lambda: legacy_page(session, args.rows))
+                timed("fast: dict rows + orjson (full)", args.repeat,
+                      lambda: fast_page(session, args.rows, FILE_COLUMNS, FILE_RELATIONS))
+                timed("fast: dict rows + orjson (lean default)", args.repeat,
+                      lambda: fast_page(session, args.rows, DEFAULT_FILE_FIELDS, []))
+
+            timed("GET /api/files/ (lean default)", args.repeat,
+                  lambda: client.get("/api/files/", params={"limit": args.rows}).content)
+            timed("GET /api/files/ (include=markers,channels,events)", args.repeat,
+                  lambda: client.get("/api/files/", params={
+                      "limit": args.rows, "include": "markers,channels,events"
+                  }).content)
+
+if __name__ == "__main__":
+    main()
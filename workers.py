@@ -0,0 +1,233 @@
+"""
+Warm worker processes for CPU-heavy C3D work.
+
+ezc3d decoding and analyses hold the GIL, so running them in the FastAPI
+threadpool stalls every other request. They run instead in a pool of worker
+processes started with the application, with ezc3d and NumPy already
+imported. Decoded arrays come back through shared memory rather than being
+pickled: the worker copies them into a `SharedMemory` block and returns only
+its name and the array shapes.
+
+Callers wait with a timeout and can give up early (for example when the
+client disconnects); work still queued is cancelled, and shared memory
+produced by abandoned work is released when it completes.
+"""
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from multiprocessing import shared_memory
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+import anyio.from_thread
+import numpy as np
+from c3d_loader import TrialData, decode_trial, trial_cache
+
+# Worker processes; decodes beyond this queue in the pool
+WORKER_COUNT = min(4, os.cpu_count() or 1)
+
+# Seconds a request waits for a decode or an analysis
+DECODE_TIMEOUT = 60.0
+ANALYSIS_TIMEOUT = 300.0
+
+# Seconds between cancellation checks while waiting
+POLL_INTERVAL = 0.1
+
+_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _warm() -> None:
+    """Worker initializer: import the heavy modules once per process."""
+    import ezc3d  # noqa: F401
+    import numpy  # noqa: F401
+
+def _ready() -> int:
+    return os.getpid()
+
+def get_pool() -> concurrent.futures.ProcessPoolExecutor:
+    """The worker pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver avoids forking a process that already runs threads
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=WORKER_COUNT,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_warm
+            )
+        return _pool
+
+def start_workers() -> None:
+    """Start and warm the pool, and decode trials for the trial cache in it."""
+    pool = get_pool()
+    for future in [pool.submit(_ready) for _ in range(WORKER_COUNT)]:
+        future.result()
+    trial_cache.decoder = decode_trial_in_worker
+
+def stop_workers() -> None:
+    """Shut the pool down, cancelling queued work."""
+    global _pool
+    trial_cache.decoder = decode_trial
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _reset_pool(pool: concurrent.futures.ProcessPoolExecutor) -> None:
+    """Drop a pool broken by a crashed worker; the next call starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def run_in_worker(
+    fn: Callable[..., Any],
+    *args,
+    timeout: Optional[float] = None,
+    is_cancelled: Optional[Callable[[], bool]] = None,
+    discard: Optional[Callable[[Any], None]] = None
+) -> Any:
+    """
+    Run `fn(*args)` in a worker process and wait for its result.
+
+    Args:
+        fn: Picklable module-level function
+        timeout: Seconds to wait before raising TimeoutError
+        is_cancelled: Polled while waiting; when it returns True, raise CancelledError
+        discard: Called with the result if the call is abandoned but still completes,
+                 to release resources such as shared memory
+
+    Raises:
+        TimeoutError, concurrent.futures.CancelledError, or the worker's exception
+    """
+    pool = get_pool()
+    try:
+        future = pool.submit(fn, *args)
+    except concurrent.futures.process.BrokenProcessPool:
+        _reset_pool(pool)
+        raise
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    while True:
+        wait = POLL_INTERVAL if is_cancelled is not None else None
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0)
+            wait = remaining if wait is None else min(wait, remaining)
+        try:
+            return future.result(timeout=wait)
+        except concurrent.futures.TimeoutError:
+            pass
+        except concurrent.futures.process.BrokenProcessPool:
+            _reset_pool(pool)
+            raise
+
+        if deadline is not None and time.monotonic() >= deadline:
+            _abandon(future, discard)
+            raise TimeoutError(f"Worker call did not finish within {timeout:g} s")
+        if is_cancelled is not None and is_cancelled():
+            _abandon(future, discard)
+            raise concurrent.futures.CancelledError("Caller gave up waiting")
+
+def _abandon(future: concurrent.futures.Future, discard: Optional[Callable[[Any], None]]) -> None:
+    """Cancel queued work; release the result of work already running once it completes."""
+    if future.cancel() or discard is None:
+        return
+
+    def release(done: concurrent.futures.Future):
+        if not done.cancelled() and done.exception() is None:
+            discard(done.result())
+
+    future.add_done_callback(release)
+
+def client_disconnected(request) -> Callable[[], bool]:
+    """Cancellation check for `run_in_worker` from a sync endpoint running in the threadpool."""
+    return lambda: anyio.from_thread.run(request.is_disconnected)
+
+# --- Shared memory transfer ---
+
+@dataclass
+class SharedArrays:
+    """Float32 arrays laid out back to back in a named shared memory block."""
+    name: str
+    shapes: List[Tuple[int, ...]]
+
+def to_shared(arrays: Sequence[np.ndarray]) -> SharedArrays:
+    """Copy arrays into a new shared memory block (in the worker)."""
+    arrays = [np.ascontiguousarray(array, dtype=np.float32) for array in arrays]
+    block = shared_memory.SharedMemory(create=True, size=max(sum(array.nbytes for array in arrays), 1))
+    offset = 0
+    for array in arrays:
+        np.ndarray(array.shape, dtype=np.float32, buffer=block.buf, offset=offset)[...] = array
+        offset += array.nbytes
+    block.close()
+    return SharedArrays(name=block.name, shapes=[array.shape for array in arrays])
+
+def from_shared(shared: SharedArrays) -> List[np.ndarray]:
+    """Copy the arrays out of a shared memory block and free it (in the parent)."""
+    block = shared_memory.SharedMemory(name=shared.name)
+    try:
+        arrays = []
+        offset = 0
+        for shape in shared.shapes:
+            view = np.ndarray(shape, dtype=np.float32, buffer=block.buf, offset=offset)
+            arrays.append(view.copy())
+            offset += view.nbytes
+            del view
+        return arrays
+    finally:
+        block.close()
+        block.unlink()
+
+def release_shared(shared: SharedArrays) -> None:
+    """Free a shared memory block without reading it."""
+    try:
+        block = shared_memory.SharedMemory(name=shared.name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+# --- Worker tasks ---
+
+def _decode_shared(filepath: str) -> Tuple[TrialData, SharedArrays]:
+    trial = decode_trial(filepath)
+    shared = to_shared([trial.points, trial.analogs])
+    return replace(trial, points=None, analogs=None), shared
+
+def _release_decoded(result: Tuple[TrialData, SharedArrays]) -> None:
+    release_shared(result[1])
+
+def decode_trial_in_worker(filepath: str) -> TrialData:
+    """`decode_trial` in a worker process, with arrays returned through shared memory."""
+    trial, shared = run_in_worker(
+        _decode_shared,
+        filepath,
+        timeout=DECODE_TIMEOUT,
+        discard=_release_decoded
+    )
+    points, analogs = from_shared(shared)
+    return replace(trial, points=points, analogs=analogs)
+
+def _analyze(analysis_class, parameters: dict, filepath: str) -> dict:
+    import ezc3d
+    analysis = analysis_class(parameters=parameters)
+    return analysis.analyze(ezc3d.c3d(filepath))
+
+def run_analysis_in_worker(
+    analysis_class,
+    parameters: dict,
+    filepath: str,
+    is_cancelled: Optional[Callable[[], bool]] = None
+) -> dict:
+    """Run an analysis class on a C3D file in a worker process."""
+    return run_in_worker(
+        _analyze,
+        analysis_class,
+        parameters,
+        filepath,
+        timeout=ANALYSIS_TIMEOUT,
+        is_cancelled=is_cancelled
+    )